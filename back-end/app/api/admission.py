@@ -0,0 +1,276 @@
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, Optional, List, Callable, Set
+
+from fastapi import HTTPException
+
+from app.config import Config, _parse_weights
+
+
+class ClientState:
+    """Token bucket and fair-queuing bookkeeping for one client key"""
+
+    __slots__ = ("key", "weight", "tokens", "updated", "finish_tag", "active", "queued")
+
+    def __init__(self, key: str, weight: float, tokens: float, now: float):
+        self.key = key
+        self.weight = weight
+        self.tokens = tokens
+        self.updated = now
+        self.finish_tag = 0.0
+        self.active = 0
+        self.queued = 0
+
+
+def rejection(status_code: int, detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(status_code=status_code, detail=detail,
+                         headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class FairAdmission:
+    """Per-client token buckets in front of a weighted fair queue over `capacity` analysis slots.
+
+    take_token() rate-limits requests per client (429 + Retry-After). slot()
+    holds one of the node's analysis slots; when all are busy, waiters are
+    served in start-time fair queuing order, so a client with many queued
+    analyses only gets its weighted share while others keep their latency.
+    Client state lives in memory, LRU-bounded to max_clients (idle clients
+    are evicted first).
+    """
+
+    def __init__(self, capacity: Optional[int] = None, rate: Optional[float] = None,
+                 burst: Optional[float] = None, max_clients: Optional[int] = None,
+                 max_queued: Optional[int] = None, queue_timeout: Optional[float] = None,
+                 weights: Optional[Dict[str, float]] = None, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity or Config.ADMISSION_CONCURRENCY or Config.STAGE_EXECUTOR_WORKERS
+        self.rate = Config.ADMISSION_RATE if rate is None else rate
+        self.burst = Config.ADMISSION_BURST if burst is None else burst
+        self.max_clients = max_clients or Config.ADMISSION_MAX_CLIENTS
+        self.max_queued = Config.ADMISSION_MAX_QUEUED if max_queued is None else max_queued
+        self.queue_timeout = Config.ADMISSION_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self.weights = _parse_weights(Config.ADMISSION_CLIENT_WEIGHTS) if weights is None else weights
+        self.clock = clock
+        self.clients: "OrderedDict[str, ClientState]" = OrderedDict()
+        self.active = 0
+        self.virtual_time = 0.0
+        self._waiters: List[Any] = []
+        self._seq = itertools.count()
+        self.stats = {"admitted": 0, "queued": 0, "rate_limited": 0, "queue_full": 0, "timed_out": 0,
+                      "too_large": 0, "cancelled": 0}
+
+    def client(self, key: str) -> ClientState:
+        state = self.clients.get(key)
+        if state is not None:
+            self.clients.move_to_end(key)
+            return state
+        state = ClientState(key, float(self.weights.get(key, 1.0)), float(self.burst), self.clock())
+        self.clients[key] = state
+        if len(self.clients) > self.max_clients:
+            self._evict()
+        return state
+
+    def _evict(self) -> None:
+        # Least recently seen idle clients go first; busy ones are kept even past the bound
+        for key in list(self.clients):
+            if len(self.clients) <= self.max_clients:
+                return
+            state = self.clients[key]
+            if not state.active and not state.queued:
+                del self.clients[key]
+
+    def take_token(self, key: str, count: float = 1.0) -> None:
+        """Charge `count` requests to the client's bucket or raise 429 with Retry-After (413 past the burst)"""
+        if self.rate <= 0:
+            return
+        state = self.client(key)
+        now = self.clock()
+        state.tokens = min(float(self.burst), state.tokens + (now - state.updated) * self.rate)
+        state.updated = now
+        if count > self.burst:
+            # Could never be paid, however long the client waits: not a rate limit, so no Retry-After
+            self.stats["too_large"] += 1
+            raise HTTPException(status_code=413, detail=f"Request of {count:g} analyses exceeds "
+                                                        f"the per-client burst of {self.burst:g}")
+        if state.tokens >= count:
+            state.tokens -= count
+            return
+        self.stats["rate_limited"] += 1
+        raise rejection(429, "Rate limit exceeded", (count - state.tokens) / self.rate)
+
+    async def acquire(self, key: str, cost: float = 1.0, cancel_token: Optional[Any] = None) -> ClientState:
+        """Take a slot, queuing fairly when none is free; a fired `cancel_token` abandons the wait"""
+        state = self.client(key)
+        start = max(self.virtual_time, state.finish_tag)
+        if self.active < self.capacity and not self._waiters:
+            state.finish_tag = start + cost / state.weight
+            self._grant(state, start)
+            return state
+        if state.queued >= self.max_queued:
+            self.stats["queue_full"] += 1
+            raise rejection(429, "Too many queued analyses for this client", self._expected_wait())
+        state.finish_tag = start + cost / state.weight
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (start, next(self._seq), state, future))
+        state.queued += 1
+        self.stats["queued"] += 1
+        try:
+            await self._wait(future, cancel_token)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as we gave up: hand it on
+                self.release(state)
+            else:
+                future.cancel()
+                state.queued -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["timed_out"] += 1
+                raise rejection(503, "Analysis capacity exhausted, retry later", self._expected_wait())
+            raise
+        return state
+
+    async def _wait(self, future: "asyncio.Future", cancel_token: Optional[Any]) -> None:
+        if cancel_token is None:
+            await asyncio.wait_for(future, self.queue_timeout)
+            return
+        # The token is a thread-safe flag, not awaitable: poll it between short waits
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        while not future.done():
+            if cancel_token.cancelled:
+                self.stats["cancelled"] += 1
+                cancel_token.raise_if_cancelled()
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            await asyncio.wait({future}, timeout=min(remaining, Config.DISCONNECT_POLL_INTERVAL))
+
+    def release(self, state: ClientState) -> None:
+        self.active -= 1
+        state.active -= 1
+        while self._waiters and self.active < self.capacity:
+            start, _, waiter, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # timed out or cancelled while queued
+            waiter.queued -= 1
+            self._grant(waiter, start)
+            future.set_result(True)
+
+    def _grant(self, state: ClientState, start: float) -> None:
+        self.virtual_time = max(self.virtual_time, start)
+        self.active += 1
+        state.active += 1
+        self.stats["admitted"] += 1
+
+    def _expected_wait(self) -> float:
+        # Rough: one analysis slot turnover per queued waiter ahead, per slot
+        return max(1.0, len(self._waiters) / float(self.capacity))
+
+    @asynccontextmanager
+    async def slot(self, key: Optional[str], cost: float = 1.0, cancel_token: Optional[Any] = None):
+        """Hold one analysis slot for `key`; None bypasses admission (internal callers).
+
+        With a `cancel_token`, a request cancelled while queued leaves the queue,
+        and one cancelled by the time its slot is granted hands it straight on.
+        """
+        if key is None:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            yield
+            return
+        state = await self.acquire(key, cost, cancel_token)
+        try:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            yield
+        finally:
+            self.release(state)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "queued": sum(1 for w in self._waiters if not w[3].done()),
+            "clients": len(self.clients),
+            **self.stats,
+        }
+
+
+class ServiceTimes:
+    """In-flight analyses and an EWMA of their service time (admission wait excluded).
+
+    Thread-safe: batch and scanner analyses finish on worker threads.
+    """
+
+    def __init__(self, alpha: Optional[float] = None, clock: Callable[[], float] = time.perf_counter):
+        self.alpha = Config.STATUS_EWMA_ALPHA if alpha is None else alpha
+        self.clock = clock
+        self.in_flight = 0
+        self.completed = 0
+        self.service_time = 0.0  # seconds per analysis
+        self.frame_time = 0.0  # seconds per frame
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, frames: int):
+        with self._lock:
+            self.in_flight += 1
+        start = self.clock()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            # Failed and cancelled analyses say nothing about the normal service time
+            if ok:
+                self.record(self.clock() - start, frames)
+
+    def record(self, seconds: float, frames: int) -> None:
+        per_frame = seconds / max(1, frames)
+        with self._lock:
+            if self.completed == 0:
+                self.service_time, self.frame_time = seconds, per_frame
+            else:
+                self.service_time += self.alpha * (seconds - self.service_time)
+                self.frame_time += self.alpha * (per_frame - self.frame_time)
+            self.completed += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "service_time_ewma": round(self.service_time, 4),
+                "frame_time_ewma": round(self.frame_time, 4),
+            }
+
+
+def api_keys() -> Set[str]:
+    """API keys accepted as client identities (ADMISSION_API_KEYS plus weighted key: entries)"""
+    keys = {k.strip() for k in Config.ADMISSION_API_KEYS.split(",") if k.strip()}
+    keys.update(name[4:] for name in _parse_weights(Config.ADMISSION_CLIENT_WEIGHTS) if name.startswith("key:"))
+    return keys
+
+
+def client_key(headers: Any, host: Optional[str]) -> str:
+    """Configured API key when present, else the client address (X-Forwarded-For behind a trusted proxy)
+
+    Unknown keys are ignored so fresh keys cannot mint new rate-limit buckets. Behind
+    the router only the last X-Forwarded-For entry is trusted: it is the address the
+    router appended, everything before it was written by the client.
+    """
+    api_key = headers.get(Config.ADMISSION_API_KEY_HEADER)
+    if api_key and api_key in api_keys():
+        return f"key:{api_key}"
+    if Config.ADMISSION_TRUST_FORWARDED:
+        forwarded = headers.get("X-Forwarded-For")
+        if forwarded:
+            return f"ip:{forwarded.split(',')[-1].strip()}"
+    return f"ip:{host or 'unknown'}"
@@ -0,0 +1,180 @@
+# Wire format and per-connection state for the /api/ws frame channel.
+#
+# Each binary WebSocket message carries one encoded frame:
+#   [4-byte big-endian header length][UTF-8 JSON header][JPEG/PNG bytes]
+# Header: {"request_id": str, "video_id": str, "frame": int, "count": int, "profile": str?}
+# Once all `count` frames of a request_id have arrived the analysis starts;
+# several request_ids may be in flight on the same connection.
+import io
+import json
+import struct
+import threading
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+from app.config import Config
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_HEADER_LEN = struct.Struct(">I")
+MAX_HEADER_BYTES = 4096
+MAX_FRAMES_PER_ANALYSIS = 5
+
+
+def encode_frame_message(header: Dict[str, Any], payload: bytes) -> bytes:
+    """Build one binary frame message (used by clients and tests)"""
+    raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return _HEADER_LEN.pack(len(raw)) + raw + payload
+
+
+def parse_frame_message(data: bytes) -> Tuple[Dict[str, Any], memoryview]:
+    """Split a binary message into (header, payload view) without copying the payload"""
+    if len(data) < _HEADER_LEN.size:
+        raise ValueError("Frame message too short")
+    (header_len,) = _HEADER_LEN.unpack_from(data)
+    if header_len > MAX_HEADER_BYTES or _HEADER_LEN.size + header_len > len(data):
+        raise ValueError("Invalid frame header length")
+    try:
+        header = json.loads(bytes(data[_HEADER_LEN.size:_HEADER_LEN.size + header_len]))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Frame header is not valid JSON")
+    if not isinstance(header, dict):
+        raise ValueError("Frame header must be a JSON object")
+    payload = memoryview(data)[_HEADER_LEN.size + header_len:]
+    if not payload.nbytes:
+        raise ValueError("Frame message has no image payload")
+    if payload.nbytes > Config.MAX_FILE_SIZE:
+        raise ValueError(f"Frame is too large (max {Config.MAX_FILE_SIZE} bytes)")
+    return header, payload
+
+
+class FrameBufferPool:
+    """Reusable RGB frame arrays keyed by shape; videos in one tab repeat the same resolution."""
+
+    def __init__(self, max_buffers: Optional[int] = None):
+        self.max_buffers = max_buffers or Config.WS_BUFFER_POOL_SIZE
+        self._free: Dict[tuple, List["np.ndarray"]] = {}
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, shape: tuple) -> "np.ndarray":
+        with self._lock:
+            free = self._free.get(shape)
+            if free:
+                self.reuses += 1
+                return free.pop()
+            self.allocations += 1
+        import numpy as np
+
+        return np.empty(shape, dtype=np.uint8)
+
+    def release(self, buffer: "np.ndarray") -> None:
+        with self._lock:
+            if sum(len(v) for v in self._free.values()) < self.max_buffers:
+                self._free.setdefault(buffer.shape, []).append(buffer)
+
+
+class FrameLease:
+    """Decodes one analysis' frames into pooled buffers and hands them back afterwards."""
+
+    def __init__(self, pool: FrameBufferPool):
+        self.pool = pool
+        self.buffers: List["np.ndarray"] = []
+
+    def decode(self, blobs: List[Any], names: List[str], max_side: Optional[int] = None) -> List["np.ndarray"]:
+        import cv2  # type: ignore
+        import numpy as np
+        from PIL import Image  # type: ignore
+
+        images = []
+        for blob, name in zip(blobs, names):
+            try:
+                # Header-only parse to pick a reduced-size JPEG decode (like PIL's draft mode)
+                width, height = Image.open(io.BytesIO(blob)).size
+                flags = cv2.IMREAD_COLOR
+                if max_side:
+                    for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                            (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                        if max(width, height) / factor >= max_side:
+                            flags = reduced
+                            break
+                # Match the PIL path used by /api/analyze, which ignores EXIF orientation
+                bgr = cv2.imdecode(np.frombuffer(blob, dtype=np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+                if bgr is None:
+                    raise ValueError("could not decode image")
+            except Exception as e:
+                raise ValueError(f"Invalid image file {name}: {e}")
+            buffer = self.pool.acquire(bgr.shape)
+            cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=buffer)
+            self.buffers.append(buffer)
+            images.append(buffer)
+        return images
+
+    def release(self) -> None:
+        for buffer in self.buffers:
+            self.pool.release(buffer)
+        self.buffers = []
+
+
+class PendingAnalysis:
+    def __init__(self, request_id: str, video_id: Optional[str], profile: Optional[str], count: int):
+        self.request_id = request_id
+        self.video_id = video_id
+        self.profile = profile
+        self.count = count
+        self.frames: Dict[int, bytes] = {}
+
+    @property
+    def blobs(self) -> List[bytes]:
+        return [self.frames[i] for i in range(self.count)]
+
+    @property
+    def names(self) -> List[str]:
+        return [f"{self.request_id}#{i}" for i in range(self.count)]
+
+
+class FrameChannelSession:
+    """Per-connection state: partially received analyses and the decode buffer pool."""
+
+    def __init__(self, max_pending: Optional[int] = None, pool: Optional[FrameBufferPool] = None):
+        self.max_pending = max_pending or Config.WS_MAX_PENDING
+        self.pool = pool or FrameBufferPool()
+        self.pending: Dict[str, PendingAnalysis] = {}
+
+    def add_frame(self, data: bytes) -> Optional[PendingAnalysis]:
+        """Record one frame message; returns the analysis once all its frames have arrived."""
+        header, payload = parse_frame_message(data)
+        video_id = header.get("video_id") or header.get("videoId")
+        request_id = str(header.get("request_id") or video_id or "")
+        if not request_id:
+            raise ValueError("Frame header needs a request_id or video_id")
+        try:
+            index = int(header.get("frame", 0))
+            count = int(header.get("count", 1))
+        except (TypeError, ValueError):
+            raise ValueError("Frame header 'frame' and 'count' must be integers")
+        if not 1 <= count <= MAX_FRAMES_PER_ANALYSIS:
+            raise ValueError(f"Please provide 1-{MAX_FRAMES_PER_ANALYSIS} frames per analysis")
+        if not 0 <= index < count:
+            raise ValueError(f"Frame index {index} out of range for count {count}")
+
+        pending = self.pending.get(request_id)
+        if pending is None:
+            if len(self.pending) >= self.max_pending:
+                raise ValueError("Too many incomplete analyses on this connection")
+            pending = PendingAnalysis(request_id, str(video_id)[:64] if video_id else None,
+                                      header.get("profile"), count)
+            self.pending[request_id] = pending
+        elif pending.count != count:
+            raise ValueError(f"Frame count changed for request {request_id}")
+        pending.frames[index] = bytes(payload)
+        if len(pending.frames) < pending.count:
+            return None
+        return self.pending.pop(request_id)
+
+    def discard(self, request_id: str) -> None:
+        self.pending.pop(request_id, None)
+
+    def lease(self) -> FrameLease:
+        return FrameLease(self.pool)
@@ -1,94 +1,850 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from typing import List, Dict, Any
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, Request, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional, Set, Tuple, Union, TYPE_CHECKING
+import asyncio
+import json
+import math
 import time
 import logging
-import numpy as np
 # Lazy imports will be done inside functions to avoid heavy import at module load
+# (NumPy, OpenCV and PIL load with the first analysis; see python -m app.coldstart)
+if TYPE_CHECKING:
+    import numpy as np
 
 from app.config import Config
+from app.api.admission import FairAdmission, ServiceTimes, client_key
+from app.api.frame_channel import FrameChannelSession, PendingAnalysis
 from app.models.ai_adapter import create_ai_model
+from app.models.lifecycle import ModelRegistry
+from app.models.executor import StageExecutor, build_analysis_details, collect_frame_features
+from app.models.registry import AnalysisCancelled, AnalysisContext, CancellationToken, default_registry
+from app.utils import profiler
+from app.utils.profiler import profile_stage
+from app.utils.result_store import get_result_store, content_hash, frame_hash, combine_frame_hashes
+from app.utils.traffic_capture import get_traffic_capture
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
-# Lazy-initialized AI model adapter (real or mock depending on config)
-_ai_model = None
+# Single AI model adapter per worker (real or mock depending on config), built and warmed at startup
+model_registry = ModelRegistry(lambda: create_ai_model(use_real=Config.USE_REAL_AI_MODEL))
 
 def get_ai_model():
-    global _ai_model
-    if _ai_model is None:
-        _ai_model = create_ai_model(use_real=Config.USE_REAL_AI_MODEL)
-    return _ai_model
+    return model_registry.get()
+
+# Detector DAG executor shared by all requests
+stage_executor = StageExecutor(default_registry)
+# Batch items run in parallel with each other, so their stages run inline
+batch_executor = StageExecutor(default_registry, max_workers=1)
+# Per-client rate limits and fair sharing of this worker's analysis slots
+admission = FairAdmission()
+# In-flight count and service-time EWMA behind GET /analyze/status
+service_times = ServiceTimes()
 
 router = APIRouter()
 
+# nginx convention for "client closed the connection before the response was sent"
+CLIENT_CLOSED_REQUEST = 499
+
 
 @router.post("/analyze")
-async def analyze_images(files: List[UploadFile] = File(...)):
+async def analyze_images(request: Request, files: List[UploadFile] = File(...),
+                         execution_profile: Optional[str] = Query(None, alias="profile")):
     """Analyze 2-3 image frames for AI-generated content detection."""
     start_time = time.time()
+    options = resolve_execution_profile(execution_profile)
+    profile = None
+    if profiler.should_profile(request.headers.get(Config.PROFILING_HEADER)):
+        profile = profiler.begin_profile("analyze")
+    # Stop detector work as soon as the client goes away
+    cancel_token = CancellationToken()
+    watcher = asyncio.create_task(watch_disconnect(request, cancel_token))
     
     try:
-        # Lazy import heavy dependencies
-        from PIL import Image  # type: ignore
-        import io
-        import numpy as np
-
         # Validate input
-        if len(files) < 1 or len(files) > 5:
-            raise HTTPException(
-                status_code=400, 
-                detail="Please provide 1-5 image files (2-3 recommended)"
-            )
+        validate_file_count(files)
+        client = request_client(request)
+        admit(client)
         
         # Process uploaded files
-        images = []
-        for file in files:
-            if not file.content_type or not file.content_type.startswith('image/'):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File {file.filename} is not an image"
-                )
-            
-            contents = await file.read()
-            # Enforce size limit
-            if len(contents) > Config.MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File {file.filename} is too large (max {Config.MAX_FILE_SIZE} bytes)"
-                )
+        with profile_stage(profile, "read"):
+            blobs = await read_upload_blobs(files)
+        
+        video_id = request_video_id(request)
+        result = await analyze_blobs(blobs, [f.filename for f in files], options,
+                                     video_id=video_id, profile=profile,
+                                     cancel_token=cancel_token, client=client)
+        result["total_processing_time"] = time.time() - start_time
+        # Sampled requests are written to the replay capture after the response is sent
+        capture = get_traffic_capture()
+        background = None
+        if capture is not None and capture.should_sample():
+            background = BackgroundTask(capture_request, capture, blobs, files, options, video_id,
+                                        client, start_time, result)
+        return JSONResponse(content=result, background=background)
+        
+    except HTTPException:
+        raise
+    except AnalysisCancelled as e:
+        logger.info(f"Analysis cancelled: {e}")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    except Exception as e:
+        logger.error(f"Unexpected error in analysis: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        watcher.cancel()
+        if profile is not None:
+            profiler.end_profile(profile)
+
+
+@router.post("/analyze/stream")
+async def analyze_images_stream(request: Request, files: List[UploadFile] = File(...),
+                                execution_profile: Optional[str] = Query(None, alias="profile")):
+    """Analyze frames like /analyze, streaming each stage's result as a Server-Sent Event.
+    
+    Emits one `stage` event per completed detector stage (with the running
+    ai_probability, stages still pending counted as neutral), then a final
+    `result` event carrying the same body /analyze returns, or an `error` event.
+    """
+    start_time = time.time()
+    options = resolve_execution_profile(execution_profile)
+    validate_file_count(files)
+    client = request_client(request)
+    admit(client)
+    blobs = await read_upload_blobs(files)
+    names = [f.filename for f in files]
+    video_id = request_video_id(request)
+    
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancel_token = CancellationToken()
+    total_stages = len(default_registry.active_stages(options))
+    
+    def on_stage_complete(name: str, stage_result: Any) -> None:
+        # Called from executor threads; hand the result over to the event loop
+        loop.call_soon_threadsafe(events.put_nowait, (name, stage_result))
+    
+    async def event_stream():
+        task = asyncio.create_task(analyze_blobs(blobs, names, options, video_id=video_id,
+                                                 cancel_token=cancel_token,
+                                                 on_stage_complete=on_stage_complete, client=client))
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        partial: Dict[str, Any] = {}
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                name, stage_result = item
+                partial[name] = stage_result
+                yield sse_event("stage", {
+                    "stage": name,
+                    "detail_key": default_registry.stages[name].detail_key,
+                    "result": stage_result,
+                    "completed": len(partial),
+                    "total": total_stages,
+                    "ai_probability": round(default_registry.score(partial, options), 3),
+                })
             try:
-                pil_image = Image.open(io.BytesIO(contents))
-                if pil_image.mode != 'RGB':
-                    pil_image = pil_image.convert('RGB')
-                image_array = np.array(pil_image)
-                images.append(image_array)
+                result = task.result()
+            except HTTPException as e:
+                yield sse_event("error", {"error": e.detail, "status_code": e.status_code})
+                return
             except Exception as e:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid image file {file.filename}: {str(e)}"
-                )
+                logger.error(f"Unexpected error in streamed analysis: {e}")
+                yield sse_event("error", {"error": "Internal server error", "status_code": 500})
+                return
+            result["total_processing_time"] = time.time() - start_time
+            yield sse_event("result", result)
+        finally:
+            # Reached early when the client disconnects mid-stream
+            if not task.done():
+                cancel_token.cancel("client disconnected")
+                task.add_done_callback(_discard_task_result)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _discard_task_result(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+def validate_file_count(files: List[Any]) -> None:
+    if len(files) < 1 or len(files) > 5:
+        raise HTTPException(
+            status_code=400, 
+            detail="Please provide 1-5 image files (2-3 recommended)"
+        )
+
+
+async def analyze_blobs(blobs: List[bytes], names: List[str], options: Dict[str, Any],
+                        video_id: Optional[str] = None,
+                        profile: Optional[profiler.RequestProfile] = None,
+                        cancel_token: Optional[CancellationToken] = None,
+                        on_stage_complete=None, decode=None,
+                        client: Optional[str] = None,
+                        executor: Optional[StageExecutor] = None) -> Dict[str, Any]:
+    """Store lookup, decode, analysis and persistence for already-read uploads
+
+    decode(blobs, names, max_side) replaces decode_upload_images, e.g. to
+    decode into the WebSocket channel's pooled buffers. With a client key the
+    decode and analysis wait for that client's fair share of analysis slots.
+    executor replaces stage_executor (batch items use the inline batch_executor).
+    """
+    # Frames past the profile's cap are never analyzed, so they stay out of the store key too
+    # (matching the key /analyze/negotiate builds from the capped hash list)
+    blobs = cap_frames(blobs, options)
+    names = names[:len(blobs)]
+    # Serve repeated uploads from the persistent result store
+    store = get_result_store()
+    result_key = None
+    if store is not None:
+        with profile_stage(profile, "store_lookup"):
+            result_key, cached = await run_in_threadpool(lookup_result, store, blobs, options)
+        if cached is not None:
+            return cached
+    
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    frame_features = [] if store is not None else None
+    async with admission.slot(client, len(blobs), cancel_token):
+        with profile_stage(profile, "decode"):
+            images = await run_in_threadpool(profiler.call_profiled, profile, decode or decode_upload_images,
+                                             blobs, names, options.get("analysis_size"))
         
         # Perform analysis
-        result = await perform_analysis(images)
-        total_time = time.time() - start_time
-        result["total_processing_time"] = total_time
+        result = await perform_analysis(images, profile=profile, options=options,
+                                        frame_features=frame_features, cancel_token=cancel_token,
+                                        on_stage_complete=on_stage_complete, executor=executor)
+    result["cached"] = False
+    if store is not None:
+        with profile_stage(profile, "store_write"):
+            await run_in_threadpool(persist_result, store, video_id, result_key, blobs,
+                                    options["name"], result, frame_features)
+    if profile is not None:
+        profile.metadata.update({
+            "frame_count": len(images),
+            "frame_shapes": [list(img.shape) for img in images],
+            "ai_probability": result["ai_probability"],
+        })
+        result["profile_id"] = profile.profile_id
+    return result
+
+
+@router.websocket("/ws")
+async def analyze_websocket(websocket: WebSocket):
+    """Long-lived frame channel: binary frames in, JSON results out (see app.api.frame_channel).
+
+    Results arrive as {"type": "result", "request_id", "video_id", "result"} or
+    {"type": "error", "request_id", "error", "status_code"}; a text message
+    {"type": "cancel", "request_id"} stops an in-flight analysis.
+    """
+    await websocket.accept()
+    client = request_client(websocket)
+    session = FrameChannelSession()
+    send_lock = asyncio.Lock()
+    slots = asyncio.Semaphore(Config.WS_MAX_IN_FLIGHT)
+    in_flight: Dict[str, CancellationToken] = {}
+    # Strong references: the loop only keeps weak ones to running tasks
+    tasks: Set[asyncio.Task] = set()
+    
+    async def send(message: Dict[str, Any]) -> None:
+        async with send_lock:
+            try:
+                await websocket.send_json(message)
+            except Exception:
+                # Client already gone; its analyses are cancelled below
+                pass
+    
+    async def send_error(request_id: Optional[str], status_code: int, error: str, **extra: Any) -> None:
+        await send({"type": "error", "request_id": request_id, "error": error, "status_code": status_code,
+                    **extra})
+    
+    async def run(analysis: PendingAnalysis, token: CancellationToken) -> None:
+        start_time = time.time()
+        lease = session.lease()
+        try:
+            options = resolve_execution_profile(analysis.profile)
+            admit(client)
+            async with slots:
+                result = await analyze_blobs(analysis.blobs, analysis.names, options,
+                                             video_id=analysis.video_id, cancel_token=token,
+                                             decode=lease.decode, client=client)
+            result["total_processing_time"] = time.time() - start_time
+            await send({"type": "result", "request_id": analysis.request_id,
+                        "video_id": analysis.video_id, "result": result})
+        except AnalysisCancelled:
+            await send_error(analysis.request_id, CLIENT_CLOSED_REQUEST, "Analysis cancelled")
+        except HTTPException as e:
+            retry_after = (e.headers or {}).get("Retry-After")
+            if retry_after is not None:
+                await send_error(analysis.request_id, e.status_code, e.detail, retry_after=int(retry_after))
+            else:
+                await send_error(analysis.request_id, e.status_code, e.detail)
+        except ValueError as e:
+            await send_error(analysis.request_id, 400, str(e))
+        except Exception as e:
+            logger.error(f"Unexpected error in WebSocket analysis: {e}")
+            await send_error(analysis.request_id, 500, "Internal server error")
+        finally:
+            lease.release()
+            in_flight.pop(analysis.request_id, None)
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                try:
+                    analysis = session.add_frame(message["bytes"])
+                except ValueError as e:
+                    await send_error(None, 400, str(e))
+                    continue
+                if analysis is None:
+                    continue
+                if analysis.request_id in in_flight:
+                    await send_error(analysis.request_id, 409, "Analysis already in progress")
+                    continue
+                token = CancellationToken()
+                in_flight[analysis.request_id] = token
+                task = asyncio.create_task(run(analysis, token))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            elif message.get("text") is not None:
+                try:
+                    command = json.loads(message["text"])
+                except json.JSONDecodeError:
+                    command = {}
+                if isinstance(command, dict) and command.get("type") == "cancel":
+                    request_id = str(command.get("request_id"))
+                    session.discard(request_id)
+                    if request_id in in_flight:
+                        in_flight[request_id].cancel("cancelled by client")
+                else:
+                    await send_error(None, 400, "Unknown command")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for token in list(in_flight.values()):
+            token.cancel("client disconnected")
+        # Wait for the analyses so sends and buffer-lease releases finish before the handler returns
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@router.post("/analyze/batch")
+async def analyze_images_batch(request: Request, manifest: str = Form(...), files: List[UploadFile] = File(...),
+                               execution_profile: Optional[str] = Query(None, alias="profile")):
+    """Analyze many (videoId, frames) groups in one request; per-item errors do not fail the batch.
+
+    manifest is a JSON list [{"video_id": str, "frames": n}, ...] and files
+    holds every group's frames back to back in manifest order.
+    """
+    start_time = time.time()
+    options = resolve_execution_profile(execution_profile)
+    entries = parse_batch_manifest(manifest, len(files))
+    client = request_client(request)
+    admit(client, len(entries))
+    
+    groups = []
+    offset = 0
+    budget = UploadBudget()
+    for entry in entries:
+        group_files = files[offset:offset + entry["frames"]]
+        offset += entry["frames"]
+        group: Dict[str, Any] = {"video_id": entry.get("video_id"), "names": [f.filename for f in group_files]}
+        try:
+            group["frames"] = await read_upload_blobs(group_files, budget)
+        except HTTPException as e:
+            # An oversized request fails as a whole; other upload errors stay with their item
+            if budget.exceeded:
+                raise
+            group["error"] = (e.status_code, e.detail)
+        groups.append(group)
+    
+    items = await analyze_batch(groups, options, client=client)
+    return {
+        "items": items,
+        "count": len(items),
+        "failed": sum(1 for item in items if item["status"] != "ok"),
+        "execution_profile": options["name"],
+        "total_processing_time": time.time() - start_time,
+    }
+
+
+def parse_batch_manifest(manifest: str, file_count: int) -> List[Dict[str, Any]]:
+    try:
+        entries = json.loads(manifest)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="manifest must be a JSON list")
+    if not isinstance(entries, list) or not entries:
+        raise HTTPException(status_code=400, detail="manifest must be a non-empty JSON list")
+    if len(entries) > Config.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many batch items (max {Config.BATCH_MAX_ITEMS})")
+    for entry in entries:
+        if not isinstance(entry, dict) or not isinstance(entry.get("frames"), int) or entry["frames"] < 0:
+            raise HTTPException(status_code=400, detail="Each manifest entry needs an integer 'frames' count")
+    if sum(entry["frames"] for entry in entries) != file_count:
+        raise HTTPException(status_code=400, detail="manifest frame counts do not match the uploaded files")
+    return entries
+
+
+async def analyze_batch(groups: List[Dict[str, Any]],
+                        options: Optional[Dict[str, Any]] = None,
+                        client: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Analyze groups of {"video_id", "frames": [encoded bytes], "names"?} concurrently
+
+    Returns one entry per group in input order: {"index", "video_id",
+    "status": "ok", "result"} or {"index", "video_id", "status": "error",
+    "error", "status_code"}.
+    """
+    if options is None:
+        options = Config.get_execution_profile()
+    slots = asyncio.Semaphore(Config.BATCH_CONCURRENCY or Config.STAGE_EXECUTOR_WORKERS)
+    
+    async def run_one(index: int, group: Dict[str, Any]) -> Dict[str, Any]:
+        video_id = group.get("video_id")
+        entry: Dict[str, Any] = {"index": index, "video_id": video_id}
+        try:
+            if group.get("error"):
+                raise HTTPException(status_code=group["error"][0], detail=group["error"][1])
+            blobs = group.get("frames") or []
+            validate_file_count(blobs)
+            names = group.get("names") or [f"{video_id or index}#{i}" for i in range(len(blobs))]
+            start_time = time.time()
+            async with slots:
+                result = await analyze_blobs(blobs, names, options, video_id=video_id, client=client,
+                                             executor=batch_executor)
+            result["total_processing_time"] = time.time() - start_time
+            entry.update(status="ok", result=result)
+        except HTTPException as e:
+            entry.update(status="error", error=e.detail, status_code=e.status_code)
+        except Exception as e:
+            logger.error(f"Unexpected error in batch item {index}: {e}")
+            entry.update(status="error", error="Internal server error", status_code=500)
+        return entry
+    
+    return list(await asyncio.gather(*(run_one(i, group) for i, group in enumerate(groups))))
+
+
+def analyze_group(model, store, video_id: Optional[str], blobs: List[bytes], names: List[str],
+                  options: Dict[str, Any]) -> Dict[str, Any]:
+    """Synchronous analyze_blobs for worker processes without an event loop (app.scanner)"""
+    start_time = time.time()
+    blobs = cap_frames(blobs, options)
+    names = names[:len(blobs)]
+    result_key = None
+    if store is not None:
+        result_key, result = lookup_result(store, blobs, options)
+        if result is not None:
+            result["total_processing_time"] = time.time() - start_time
+            return result
+    
+    images = decode_upload_images(blobs, names, options.get("analysis_size"))
+    result, frame_features = analyze_decoded(model, images, options)
+    result["cached"] = False
+    if store is not None:
+        persist_result(store, video_id, result_key, blobs, options["name"], result, frame_features)
+    result["total_processing_time"] = time.time() - start_time
+    return result
+
+
+def lookup_result(store, blobs: List[bytes], options: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Store key of already-capped blobs and a copy of the stored result for it, if any"""
+    result_key = content_hash(blobs)
+    cached = store.get_result(result_key, options["name"])
+    if cached is None:
+        return result_key, None
+    result = dict(cached)
+    result["cached"] = True
+    return result_key, result
+
+
+def analyze_decoded(model, images: List["np.ndarray"],
+                    options: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Run the stage DAG inline on decoded RGB frames; returns (result, per-frame features)"""
+    images = prepare_images(images, options)
+    context = AnalysisContext(model, images, options)
+    frame_features: List[Dict[str, Any]] = []
+    with service_times.track(len(images)):
+        stage_results = run_stages(batch_executor, model, images, options, context, frame_features)
+    result = empty_result()
+    result["execution_profile"] = options.get("name")
+    score_result(result, stage_results, options)
+    return result, frame_features
+
+
+def run_stages(executor: StageExecutor, model, images, options: Dict[str, Any], context: AnalysisContext,
+               frame_features: Optional[List[Dict[str, Any]]] = None, **kwargs) -> Dict[str, Any]:
+    """Run the stage DAG, collect per-frame features and return the context's product buffers
+
+    Runs start to finish on one thread, so the buffers go back to the pool only
+    after every stage is done with them, even when the awaiting request is cancelled.
+    """
+    try:
+        stage_results = executor.run(model, images, options, context=context, **kwargs)
+        if frame_features is not None:
+            frame_features.extend(collect_frame_features(stage_results, context))
+        return stage_results
+    finally:
+        context.release()
+
+
+class FrameNegotiation(BaseModel):
+    hashes: List[str]
+    video_id: Optional[str] = None
+
+
+@router.post("/analyze/negotiate")
+async def negotiate_frames(negotiation: FrameNegotiation,
+                           execution_profile: Optional[str] = Query(None, alias="profile")):
+    """Step 1 of content-addressed upload: report which frame hashes (sha256) the server already knows.
+
+    Returns the full result when the exact frame set was analyzed before;
+    otherwise the client uploads only `missing` frames to /analyze/assemble.
+    """
+    options = resolve_execution_profile(execution_profile)
+    hashes = validate_frame_hashes(negotiation.hashes, options)
+    store = get_result_store()
+    if store is None:
+        return {"store_enabled": False, "result": None, "known": [], "missing": hashes}
+    
+    cached = await run_in_threadpool(store.get_result, combine_frame_hashes(hashes), options["name"])
+    if cached is not None:
+        result = dict(cached)
+        result["cached"] = True
+        return {"store_enabled": True, "result": result, "known": hashes, "missing": []}
+    
+    stored = await run_in_threadpool(reusable_frame_features, store, hashes, options)
+    return {
+        "store_enabled": True,
+        "result": None,
+        "known": [h for h in hashes if h in stored],
+        "missing": [h for h in hashes if h not in stored],
+    }
+
+
+@router.post("/analyze/assemble")
+async def assemble_analysis(request: Request, hashes: str = Form(...),
+                            files: List[UploadFile] = File(default=[]),
+                            execution_profile: Optional[str] = Query(None, alias="profile")):
+    """Step 2: analyze the ordered frame set `hashes` (comma-separated) from stored features plus uploads.
+
+    Only frames reported missing by /analyze/negotiate need to be uploaded;
+    responds 409 with the still-missing hashes if the store no longer has them.
+    """
+    start_time = time.time()
+    options = resolve_execution_profile(execution_profile)
+    frame_hashes = validate_frame_hashes([h.strip() for h in hashes.split(",") if h.strip()], options)
+    client = request_client(request)
+    admit(client)
+    video_id = request_video_id(request)
+    blobs = await read_upload_blobs(files)
+    uploaded = {frame_hash(blob): blob for blob in blobs}
+    unexpected = [h for h in uploaded if h not in frame_hashes]
+    if unexpected:
+        raise HTTPException(status_code=400, detail=f"Uploaded frames not listed in hashes: {unexpected}")
+    
+    # Stop decoding and detector work as soon as the client goes away, as /analyze does
+    cancel_token = CancellationToken()
+    watcher = asyncio.create_task(watch_disconnect(request, cancel_token))
+    try:
+        result = await assemble_frames(frame_hashes, uploaded, options, video_id, client, cancel_token)
+    except AnalysisCancelled as e:
+        logger.info(f"Analysis cancelled: {e}")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    finally:
+        watcher.cancel()
+    result["total_processing_time"] = time.time() - start_time
+    return JSONResponse(content=result)
+
+
+async def assemble_frames(frame_hashes: List[str], uploaded: Dict[str, bytes], options: Dict[str, Any],
+                          video_id: Optional[str], client: Optional[str],
+                          cancel_token: CancellationToken) -> Dict[str, Any]:
+    """Result for the ordered frame set from stored per-frame features plus the uploaded frames"""
+    store = get_result_store()
+    if store is None or not any(h not in uploaded for h in frame_hashes):
+        # Nothing to reuse: plain analysis of the full frame set
+        ordered = [uploaded[h] for h in frame_hashes if h in uploaded]
+        if len(ordered) < len(frame_hashes):
+            raise HTTPException(status_code=409, detail={"message": "Result store is disabled; upload every frame",
+                                                         "missing": [h for h in frame_hashes if h not in uploaded]})
+        return await analyze_blobs(ordered, [f"{h[:12]}.jpg" for h in frame_hashes], options,
+                                   video_id=video_id, cancel_token=cancel_token, client=client)
+    
+    features = await run_in_threadpool(reusable_frame_features, store,
+                                       [h for h in frame_hashes if h not in uploaded], options)
+    missing = [h for h in frame_hashes if h not in uploaded and h not in features]
+    if missing:
+        raise HTTPException(status_code=409, detail={"message": "Some frames are unknown; upload them",
+                                                     "missing": missing})
+    
+    new_hashes = list(uploaded)
+    if new_hashes:
+        # Only the uploaded frames are decoded; their per-frame features join the stored ones
+        new_features: List[Dict[str, Any]] = []
+        async with admission.slot(client, len(new_hashes), cancel_token):
+            images = await run_in_threadpool(decode_upload_images, [uploaded[h] for h in new_hashes], new_hashes,
+                                             options.get("analysis_size"))
+            await perform_analysis(images, options=options, frame_features=new_features, cancel_token=cancel_token)
+        keys = default_registry.frame_feature_keys(options) or set()
+        if len(new_features) < len(new_hashes) or not all(keys <= f.keys() for f in new_features):
+            raise HTTPException(status_code=409, detail={"message": "This model cannot assemble partial uploads; "
+                                                                    "upload every frame",
+                                                         "missing": [h for h in frame_hashes if h not in uploaded]})
+        features.update(zip(new_hashes, new_features))
+        await run_in_threadpool(store.put_frame_features, video_id, options["name"],
+                                {h: features[h] for h in new_hashes})
+    
+    stage_results = default_registry.results_from_features([features[h] for h in frame_hashes], options)
+    result = empty_result()
+    result["execution_profile"] = options.get("name")
+    score_result(result, stage_results, options)
+    result["cached"] = False
+    result["reused_frames"] = len(frame_hashes) - len(new_hashes)
+    await run_in_threadpool(persist_result, store, video_id, combine_frame_hashes(frame_hashes), [],
+                            options["name"], result, None)
+    return result
+
+
+def cap_frames(frames: List[Any], options: Dict[str, Any]) -> List[Any]:
+    """Apply the profile's max_frames to uploaded blobs or frame hashes"""
+    max_frames = options.get("max_frames")
+    return frames[:max_frames] if max_frames else frames
+
+
+def validate_frame_hashes(hashes: List[str], options: Dict[str, Any]) -> List[str]:
+    """Normalize client-sent sha256 frame hashes, applying the profile's frame cap"""
+    hashes = [h.lower() for h in hashes]
+    if len(hashes) < 1 or len(hashes) > 5:
+        raise HTTPException(status_code=400, detail="Please provide 1-5 frame hashes")
+    if not all(len(h) == 64 and all(c in "0123456789abcdef" for c in h) for h in hashes):
+        raise HTTPException(status_code=400, detail="Frame hashes must be hex-encoded sha256 digests")
+    return cap_frames(hashes, options)
+
+
+def reusable_frame_features(store, hashes: List[str], options: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Stored features for the hashes that carry everything the profile's stages need"""
+    keys = default_registry.frame_feature_keys(options)
+    if keys is None:
+        return {}
+    stored = store.get_frame_features(hashes, options["name"])
+    return {h: f for h, f in stored.items() if keys <= f.keys()}
+
+
+async def watch_disconnect(request: Request, token: CancellationToken) -> None:
+    """Poll the connection and fire the cancellation token once the client disconnects"""
+    while not token.cancelled:
+        if await request.is_disconnected():
+            token.cancel("client disconnected")
+            return
+        await asyncio.sleep(Config.DISCONNECT_POLL_INTERVAL)
+
+
+def resolve_execution_profile(name: Optional[str]) -> Dict[str, Any]:
+    """Look up an execution profile by name, mapping unknown names to a 400"""
+    try:
+        return Config.get_execution_profile(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def request_client(connection: Any) -> Optional[str]:
+    """Admission key for an HTTP request or WebSocket; None when admission is disabled"""
+    if not Config.ADMISSION_ENABLED:
+        return None
+    return client_key(connection.headers, connection.client.host if connection.client else None)
+
+
+def admit(client: Optional[str], count: int = 1) -> None:
+    """Charge the client's rate limit (429 with Retry-After when exhausted, 413 past the burst)"""
+    if client is not None:
+        admission.take_token(client, count)
+
+
+def capture_request(capture, blobs: List[bytes], files: List[UploadFile], options: Dict[str, Any],
+                    video_id: Optional[str], client: Optional[str], start_time: float,
+                    result: Dict[str, Any]) -> None:
+    """Write one served /analyze request to the traffic capture ring (see python -m app.replay)"""
+    try:
+        capture.record("/api/analyze", blobs, [f.filename for f in files], [f.content_type for f in files],
+                       options["name"], video_id, client, start_time, result["total_processing_time"], 200, result)
+    except Exception as e:
+        # Capture is diagnostics; never let it disturb serving
+        logger.warning(f"Could not capture request: {e}")
+
+
+def request_video_id(request: Request) -> Optional[str]:
+    """videoId from the query string or X-Video-Id header (cheap to read for routers too)"""
+    video_id = request.query_params.get("video_id") or request.headers.get("X-Video-Id")
+    return video_id[:64] if video_id else None
+
+
+def persist_result(store, video_id: Optional[str], result_key: str, blobs: List[bytes],
+                   profile_name: str, result: Dict[str, Any],
+                   frame_features: Optional[List[Dict[str, Any]]]) -> None:
+    """Write the analysis result and per-frame features to the result store"""
+    try:
+        store.put_result(video_id, result_key, profile_name, result)
+        if frame_features:
+            features = {frame_hash(blob): feats for blob, feats in zip(blobs, frame_features) if feats}
+            store.put_frame_features(video_id, profile_name, features)
+    except Exception as e:
+        # The store is an optimization; a failed write must not fail the request
+        logger.warning(f"Could not persist analysis result: {e}")
+
+
+class UploadBudget:
+    """Running byte total of one request's uploads, capped at MAX_REQUEST_SIZE"""
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit or Config.MAX_REQUEST_SIZE
+        self.used = 0
+        self.exceeded = False
+
+    def charge(self, size: int) -> None:
+        self.used += size
+        if self.used > self.limit:
+            self.exceeded = True
+            raise HTTPException(
+                status_code=413,
+                detail=f"Uploads are too large in total (max {self.limit} bytes per request)"
+            )
+
+
+async def read_upload_blobs(files: List[UploadFile], budget: Optional[UploadBudget] = None) -> List[bytes]:
+    """Validate uploaded files and return their raw bytes
+
+    Bytes are counted against budget (a fresh per-request one by default) as
+    each file is read, so an oversized request stops buffering at the limit.
+    """
+    budget = budget or UploadBudget()
+    blobs = []
+    for file in files:
+        if not file.content_type or not file.content_type.startswith('image/'):
+            raise HTTPException(
+                status_code=400,
+                detail=f"File {file.filename} is not an image"
+            )
+        
+        contents = await file.read()
+        # Enforce size limit
+        if len(contents) > Config.MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File {file.filename} is too large (max {Config.MAX_FILE_SIZE} bytes)"
+            )
+        budget.charge(len(contents))
+        blobs.append(contents)
+    return blobs
+
+
+def decode_upload_images(blobs: List[bytes], names: List[str],
+                         max_side: Optional[int] = None) -> List["np.ndarray"]:
+    """Decode raw image bytes into RGB arrays"""
+    # Lazy import heavy dependencies
+    from PIL import Image  # type: ignore
+    import numpy as np
+    import io
+
+    images = []
+    for contents, name in zip(blobs, names):
+        try:
+            pil_image = Image.open(io.BytesIO(contents))
+            if max_side:
+                # Let the JPEG decoder downscale by 1/2..1/8 instead of decoding full size
+                pil_image.draft('RGB', (max_side, max_side))
+            if pil_image.mode != 'RGB':
+                pil_image = pil_image.convert('RGB')
+            image_array = np.array(pil_image)
+            images.append(image_array)
+        except Exception as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid image file {name}: {str(e)}"
+            )
+    return images
+
+
+def prepare_images(images: List["np.ndarray"], options: Dict[str, Any]) -> Union["np.ndarray", List["np.ndarray"]]:
+    """Apply the execution profile's frame cap and analysis resolution.
+
+    Frames come back as one contiguous (N, H, W, C) stack so detectors can run
+    cross-frame operations (gray conversion, temporal diff, statistics) in one pass,
+    or as a list when their aspect ratios differ (see ImageProcessor.stack_frames).
+    """
+    max_frames = options.get("max_frames")
+    if max_frames:
+        images = images[:max_frames]
+    if not len(images):
+        return images
+    from app.utils.image_processor import ImageProcessor
+
+    return ImageProcessor.stack_frames(images, options.get("analysis_size"))
+
+
+async def perform_analysis(images: List["np.ndarray"],
+                           profile: Optional[profiler.RequestProfile] = None,
+                           options: Optional[Dict[str, Any]] = None,
+                           frame_features: Optional[List[Dict[str, Any]]] = None,
+                           cancel_token: Optional[CancellationToken] = None,
+                           on_stage_complete=None,
+                           executor: Optional[StageExecutor] = None) -> Dict[str, Any]:
+    """Perform comprehensive AI detection analysis
+
+    When frame_features is given it is filled with per-frame features that
+    can be persisted and reused (see app.utils.result_store). Firing
+    cancel_token stops the detectors and raises AnalysisCancelled;
+    on_stage_complete(name, result) is called as each stage finishes.
+    """
+    if options is None:
+        options = Config.get_execution_profile()
+    executor = executor or stage_executor
+    result = empty_result()
+    
+    try:
+        ai_model = get_ai_model()
+        with profile_stage(profile, "prepare"):
+            images = prepare_images(images, options)
+        result["execution_profile"] = options.get("name")
+
+        # 1-4. Run the detector stage DAG (shared gray/edge/face products, independent stages overlap)
+        context = AnalysisContext(ai_model, images, options, cancel_token=cancel_token)
+        with service_times.track(len(images)):
+            # Off the event loop so disconnect watchers and other requests keep running;
+            # a profiled request is CPU-profiled on the worker thread as well
+            stage_results = await run_in_threadpool(profiler.call_profiled, profile, run_stages, executor,
+                                                    ai_model, images, options, context, frame_features,
+                                                    profile=profile, on_stage_complete=on_stage_complete)
         
-        return JSONResponse(content=result)
+        # 5-7. Overall probability, confidence level and recommendations
+        with profile_stage(profile, "scoring"):
+            score_result(result, stage_results, options)
         
-    except HTTPException:
+        return result
+    except AnalysisCancelled:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in analysis: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+        logger.error(f"Error during analysis: {e}")
+        raise
 
 
-async def perform_analysis(images: List[np.ndarray]) -> Dict[str, Any]:
-    """Perform comprehensive AI detection analysis"""
-    # Lazy import of typing inside function for type hints compatibility
-    from typing import Dict as _Dict
-    result: _Dict[str, Any] = {
+def empty_result() -> Dict[str, Any]:
+    """Response skeleton shared by every analysis path"""
+    return {
         "is_ai_generated": False,
         "ai_probability": 0.0,
         "confidence_level": "low",
@@ -101,72 +857,38 @@ async def perform_analysis(images: List[np.ndarray]) -> Dict[str, Any]:
             "Animal content detection is heuristic-based"
         ]
     }
-    
-    try:
-        ai_model = get_ai_model()
-        # 1. Face consistency analysis
-        face_analysis = ai_model.analyze_face_consistency(images)
-        result["analysis_details"]["face_analysis"] = face_analysis
-        
-        # 2. Frame difference analysis
-        frame_analysis = ai_model.analyze_frame_differences(images)
-        result["analysis_details"]["frame_analysis"] = frame_analysis
-        
-        # 3. AI artifact detection
-        artifact_analysis = ai_model.detect_ai_artifacts(images)
-        result["analysis_details"]["artifact_analysis"] = artifact_analysis
-        
-        # 4. Check for animal content
-        is_animal = ai_model.is_animal_content(images)
-        result["analysis_details"]["is_animal_content"] = is_animal
-        
-        # 5. Calculate overall AI probability
-        ai_probability = calculate_ai_probability(
-            face_analysis, frame_analysis, artifact_analysis, is_animal
-        )
-        
-        result["ai_probability"] = round(ai_probability, 3)
-        result["is_ai_generated"] = ai_probability > 0.6
-        
-        # 6. Set confidence level
-        if ai_probability < 0.3:
-            result["confidence_level"] = "low"
-        elif ai_probability < 0.7:
-            result["confidence_level"] = "medium"
-        else:
-            result["confidence_level"] = "high"
-        
-        # 7. Generate recommendations
-        result["recommendations"] = generate_recommendations(result)
-        
-        return result
-    except Exception as e:
-        logger.error(f"Error during analysis: {e}")
-        raise
 
 
-def calculate_ai_probability(face_analysis, frame_analysis, artifact_analysis, is_animal):
-    """Calculate overall AI generation probability"""
-    weights = {
-        "face_consistency": 0.25,
-        "temporal_consistency": 0.30,
-        "ai_artifacts": 0.35,
-        "animal_penalty": 0.10
-    }
+def score_result(result: Dict[str, Any], stage_results: Dict[str, Any], options: Dict[str, Any]) -> None:
+    """Fill details, AI probability, confidence level and recommendations from stage results"""
+    result["analysis_details"] = build_analysis_details(stage_results)
+    
+    # 5. Calculate overall AI probability
+    ai_probability = default_registry.score(stage_results, options)
     
-    face_consistency_score = 1.0 - face_analysis.get("face_consistency", 0.5)
-    temporal_consistency_score = frame_analysis.get("temporal_consistency", 0.5)
-    artifact_score = artifact_analysis.get("ai_artifact_score", 0.0)
-    animal_penalty = 0.0 if is_animal else 1.0
+    result["ai_probability"] = round(ai_probability, 3)
+    result["is_ai_generated"] = ai_probability > Config.AI_DETECTION_THRESHOLD
     
-    ai_probability = (
-        face_consistency_score * weights["face_consistency"] +
-        temporal_consistency_score * weights["temporal_consistency"] +
-        artifact_score * weights["ai_artifacts"] +
-        animal_penalty * weights["animal_penalty"]
-    )
+    # 6. Set confidence level
+    if ai_probability < 0.3:
+        result["confidence_level"] = "low"
+    elif ai_probability < 0.7:
+        result["confidence_level"] = "medium"
+    else:
+        result["confidence_level"] = "high"
     
-    return min(max(ai_probability, 0.0), 1.0)
+    # 7. Generate recommendations
+    result["recommendations"] = generate_recommendations(result)
+
+
+def calculate_ai_probability(face_analysis, frame_analysis, artifact_analysis, is_animal):
+    """Calculate overall AI generation probability from the four core stage results"""
+    return default_registry.score({
+        "face_analysis": face_analysis,
+        "frame_analysis": frame_analysis,
+        "artifact_analysis": artifact_analysis,
+        "animal_check": is_animal,
+    })
 
 
 def generate_recommendations(result):
@@ -186,15 +908,103 @@ def generate_recommendations(result):
     return recommendations
 
 
+def warm_up_model(model) -> None:
+    """Run synthetic frames through every registered stage under every execution profile"""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, 640, dtype=np.float32)[None, :, None]
+    frames = [
+        np.clip(gradient + rng.normal(0, 25, (360, 640, 3)), 0, 255).astype(np.uint8)
+        for _ in range(3)
+    ]
+    for name in Config.EXECUTION_PROFILES:
+        options = Config.get_execution_profile(name)
+        options["stages"] = None
+        options["stage_weights"] = {stage: 1.0 for stage in default_registry.stages}
+        stage_executor.run(model, prepare_images(frames, options), options)
+
+
 @router.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    try:
-        model_loaded = get_ai_model() is not None
-    except Exception as e:
-        model_loaded = False
-        logger.error(f"Health check error: {e}")
-    return {"status": "healthy", "model_loaded": model_loaded}
+    """Health check endpoint; ready only once the model is built and warmed up"""
+    status = model_registry.status()
+    return {
+        "status": "healthy",
+        "ready": status["ready"],
+        "model_loaded": status["model_loaded"],
+        "model_state": status["state"],
+        "warmup_time": status["warmup_time"],
+    }
+
+
+@router.get("/analyze/status")
+async def analyze_status():
+    """Cheap readiness and load report for load balancers and clients (no model work).
+
+    503 with Retry-After until the model is ready. suggested_backoff is how long
+    a client should wait before sending (0 when there is headroom) and
+    suggested_frames shrinks from the default profile's max_frames towards
+    STATUS_MIN_FRAMES as the node fills up.
+    """
+    model = model_registry.status()
+    service = service_times.snapshot()
+    queue = admission.snapshot()
+    capacity = admission.capacity
+    in_flight, queued = service["in_flight"], queue["queued"]
+    utilization = (in_flight + queued) / float(capacity)
+    saturated = in_flight >= capacity or queued > 0
+    # Queued analyses drain `capacity` at a time, each taking about one service time
+    expected_wait = queued / float(capacity) * service["service_time_ewma"]
+    if not model["ready"]:
+        backoff = Config.STATUS_UNREADY_BACKOFF
+    elif saturated:
+        backoff = expected_wait + service["service_time_ewma"]
+    else:
+        backoff = 0.0
+    max_frames = Config.get_execution_profile().get("max_frames") or 5
+    min_frames = min(Config.STATUS_MIN_FRAMES, max_frames)
+    headroom = max(0.0, 1.0 - utilization)
+    body = {
+        "status": "ready" if model["ready"] else "unavailable",
+        "ready": model["ready"],
+        "model_state": model["state"],
+        "warmup_time": model["warmup_time"],
+        "capacity": capacity,
+        "in_flight": in_flight,
+        "queued": queued,
+        "utilization": round(utilization, 3),
+        "saturated": saturated,
+        "service_time_ewma": service["service_time_ewma"],
+        "frame_time_ewma": service["frame_time_ewma"],
+        "completed": service["completed"],
+        "expected_wait": round(expected_wait, 3),
+        "suggested_backoff": round(backoff, 3),
+        "suggested_frames": min_frames + int(round((max_frames - min_frames) * headroom)),
+    }
+    if not model["ready"]:
+        return JSONResponse(status_code=503, content=body,
+                            headers={"Retry-After": str(max(1, math.ceil(backoff)))})
+    return body
+
+
+@router.get("/debug/profiles")
+async def list_profiles():
+    """List recently captured request profiles (newest first)"""
+    if not Config.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return {"profiles": profiler.profile_store.list()}
+
+
+@router.get("/debug/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Return the full stage timeline, CPU profile and peak memory of one request"""
+    if not Config.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    profile = profiler.profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return profile.to_dict()
 
 
 @router.get("/")
@@ -205,6 +1015,7 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/analyze": "POST - Analyze images for AI-generated content",
+            "/analyze/status": "GET - Readiness, load and suggested backoff",
             "/health": "GET - Health check"
         }
     }
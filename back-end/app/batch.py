@@ -0,0 +1,18 @@
+# Python API for bulk analysis (moderation backfills, feed thumbnail scoring):
+#
+#   from app.batch import analyze_batch
+#   items = analyze_batch([{"video_id": "abc", "frames": [jpeg_bytes, ...]}, ...], profile="fast")
+#
+# Runs the same pipeline as POST /api/analyze/batch in-process, without HTTP.
+import asyncio
+from typing import List, Dict, Any, Optional
+
+from app.config import Config
+
+
+def analyze_batch(groups: List[Dict[str, Any]], profile: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Analyze (video_id, frames) groups; returns per-item results, failed items carry an error."""
+    from app.api import routes
+
+    options = Config.get_execution_profile(profile)
+    return asyncio.run(routes.analyze_batch(groups, options))
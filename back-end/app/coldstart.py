@@ -0,0 +1,147 @@
+"""Cold-start profiler: time-to-first-request of a fresh worker, broken down by import.
+
+Starts a new interpreter under ``-X importtime``, imports ``main``, runs the
+startup hooks and sends one /api/analyze request, so nothing already cached
+in this process skews the numbers:
+
+    python -m app.coldstart              # LAZY_STARTUP=true (the cold-start mode)
+    python -m app.coldstart --eager      # regular startup: model build + warm-up
+    python -m app.coldstart --json --budget 2.5
+
+Exits non-zero when time-to-first-request exceeds the budget
+(COLD_START_BUDGET_SECONDS by default).
+"""
+import argparse
+import json
+import os
+import re
+import struct
+import subprocess
+import sys
+import time
+import zlib
+from typing import Dict, Any, List, Optional
+
+from app.config import Config
+
+HEAVY_MODULES = ("numpy", "cv2", "PIL")
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_MARKER = "COLDSTART_REPORT "
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\s*)(\S+)\s*$")
+
+# Runs in the fresh interpreter; the request frame is passed in as hex so the probe needs no PIL
+_PROBE = r"""
+import json, sys, time
+heavy = {heavy!r}
+frame = bytes.fromhex({frame!r})
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+heavy_after_import = [m for m in heavy if m in sys.modules]
+from fastapi.testclient import TestClient
+t2 = time.perf_counter()
+client = TestClient(main.app)
+client.__enter__()
+t3 = time.perf_counter()
+heavy_after_startup = [m for m in heavy if m in sys.modules]
+files = [("files", ("frame%d.png" % i, frame, "image/png")) for i in range(3)]
+response = client.post("/api/analyze", files=files)
+t4 = time.perf_counter()
+heavy_after_request = [m for m in heavy if m in sys.modules]
+client.__exit__(None, None, None)
+print({marker!r} + json.dumps({{
+    "import_seconds": t1 - t0,
+    "startup_seconds": t3 - t2,
+    "first_request_seconds": t4 - t3,
+    "status_code": response.status_code,
+    "heavy_after_import": heavy_after_import,
+    "heavy_after_startup": heavy_after_startup,
+    "heavy_after_request": heavy_after_request,
+}}))
+"""
+
+
+def probe_png(width: int = 64, height: int = 48) -> bytes:
+    """A small RGB gradient PNG built with zlib only"""
+    rows = b"".join(
+        b"\x00" + bytes(v for x in range(width) for v in ((x * 4) % 256, (y * 5) % 256, 128))
+        for y in range(height)
+    )
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Self import time (seconds) per top-level package from -X importtime output"""
+    totals: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        package = match.group(4).split(".")[0]
+        totals[package] = totals.get(package, 0.0) + int(match.group(1)) / 1e6
+    return totals
+
+
+def measure(lazy: bool = True, env: Optional[Dict[str, str]] = None, timeout: float = 120.0) -> Dict[str, Any]:
+    """Profile one fresh worker process and return the cold-start report"""
+    script = _PROBE.format(heavy=HEAVY_MODULES, frame=probe_png().hex(), marker=_MARKER)
+    child_env = dict(os.environ if env is None else env)
+    child_env["LAZY_STARTUP"] = "true" if lazy else "false"
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=_BACKEND_DIR,
+                          env=child_env, capture_output=True, text=True, timeout=timeout)
+    process_seconds = time.perf_counter() - start
+    lines = [line for line in proc.stdout.splitlines() if line.startswith(_MARKER)]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"Cold-start probe failed (exit {proc.returncode}): {proc.stderr[-2000:]}")
+    report = json.loads(lines[-1][len(_MARKER):])
+    report["lazy"] = lazy
+    report["time_to_first_request"] = (report["import_seconds"] + report["startup_seconds"]
+                                       + report["first_request_seconds"])
+    report["process_seconds"] = process_seconds
+    report["imports"] = parse_importtime(proc.stderr)
+    return report
+
+
+def format_report(report: Dict[str, Any], top: int = 15) -> str:
+    lines: List[str] = [
+        f"mode                   {'lazy' if report['lazy'] else 'eager'}",
+        f"import main            {report['import_seconds']:.3f}s",
+        f"startup                {report['startup_seconds']:.3f}s",
+        f"first /api/analyze     {report['first_request_seconds']:.3f}s (HTTP {report['status_code']})",
+        f"time to first request  {report['time_to_first_request']:.3f}s",
+        f"process wall time      {report['process_seconds']:.3f}s",
+        f"heavy after import     {', '.join(report['heavy_after_import']) or '-'}",
+        f"heavy after startup    {', '.join(report['heavy_after_startup']) or '-'}",
+        f"heavy after request    {', '.join(report['heavy_after_request']) or '-'}",
+        "",
+        "slowest imports (self time per top-level package):",
+    ]
+    ranked = sorted(report["imports"].items(), key=lambda item: item[1], reverse=True)[:top]
+    lines.extend(f"  {package:<24} {seconds:.3f}s" for package, seconds in ranked)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure worker cold start and time-to-first-request")
+    parser.add_argument("--eager", action="store_true", help="Profile the regular startup instead of LAZY_STARTUP")
+    parser.add_argument("--budget", type=float, default=Config.COLD_START_BUDGET_SECONDS,
+                        help="Fail when time-to-first-request exceeds this many seconds")
+    parser.add_argument("--top", type=int, default=15, help="Packages to list in the import breakdown")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    report = measure(lazy=not args.eager)
+    print(json.dumps(report, indent=2) if args.json else format_report(report, args.top))
+    if report["time_to_first_request"] > args.budget:
+        sys.exit(f"Cold start {report['time_to_first_request']:.3f}s exceeds budget {args.budget:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,17 @@
 import os
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    """"face_analysis=0.3,frame_analysis=0.2" -> {"face_analysis": 0.3, ...}"""
+    weights = {}
+    for item in value.split(","):
+        if item.strip():
+            name, weight = item.split("=", 1)
+            weights[name.strip()] = float(weight)
+    return weights
+
 
 class Config:
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
@@ -8,14 +19,174 @@ class Config:
     PORT = int(os.getenv("PORT", 8000))
 
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+    # All files of one request together (the batch endpoint carries many items)
+    MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", 64 * 1024 * 1024))
     ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
 
-    AI_DETECTION_THRESHOLD = 0.6
+    AI_DETECTION_THRESHOLD = float(os.getenv("AI_DETECTION_THRESHOLD", 0.6))
     ANALYSIS_TIMEOUT = 2.0  # seconds
     USE_REAL_AI_MODEL = os.getenv("USE_REAL_AI_MODEL", "False").lower() == "true"
+    MODEL_WARMUP = os.getenv("MODEL_WARMUP", "True").lower() == "true"
+    # Cold-start mode: skip model build and warm-up at startup so NumPy/OpenCV/PIL load on
+    # first use; python -m app.coldstart reports time-to-first-request against the budget.
+    LAZY_STARTUP = os.getenv("LAZY_STARTUP", "False").lower() == "true"
+    COLD_START_BUDGET_SECONDS = float(os.getenv("COLD_START_BUDGET_SECONDS", 3.0))
+
+    # Synthetic-latency model for load-testing the serving layer (app.models.simulated).
+    # SIMULATED_MODEL=true replaces the detector; latencies are per reference-size request.
+    SIMULATED_MODEL = os.getenv("SIMULATED_MODEL", "False").lower() == "true"
+    SIM_LATENCY_DISTRIBUTION = os.getenv("SIM_LATENCY_DISTRIBUTION", "lognormal")  # fixed|lognormal|trace
+    SIM_LATENCY_MEDIAN_MS = float(os.getenv("SIM_LATENCY_MEDIAN_MS", 20.0))
+    SIM_LATENCY_SIGMA = float(os.getenv("SIM_LATENCY_SIGMA", 0.5))
+    SIM_LATENCY_TRACE = os.getenv("SIM_LATENCY_TRACE", "")  # recorded /api/debug/profiles dumps
+    SIM_LATENCY_MODE = os.getenv("SIM_LATENCY_MODE", "sleep")  # sleep|cpu
+    SIM_SEED = int(os.getenv("SIM_SEED")) if os.getenv("SIM_SEED") else None
+    SIM_REFERENCE_FRAMES = 3
+    SIM_REFERENCE_PIXELS = 640 * 360
+
+    # Named execution profiles selectable per request (?profile=fast|balanced|standard|thorough).
+    # analysis_size caps the longest frame side in pixels (None keeps the upload size).
+    # The default "standard" profile is the original full-resolution pipeline, so callers that do not
+    # pick a profile keep their ai_probability; "balanced" downscales to 640px and scores can shift.
+    DEFAULT_EXECUTION_PROFILE = os.getenv("DEFAULT_EXECUTION_PROFILE", "standard")
+    EXECUTION_PROFILES: Dict[str, Dict[str, Any]] = {
+        "fast": {
+            "analysis_size": 320,
+            "max_frames": 2,
+            "stages": ["face_analysis", "frame_analysis", "artifact_analysis"],
+            "face_scale_factor": 1.3,
+            "face_min_neighbors": 3,
+            "face_min_size": 24,
+            "diff_size": 128,
+        },
+        "balanced": {
+            "analysis_size": 640,
+            "max_frames": 5,
+            "stages": ["face_analysis", "frame_analysis", "artifact_analysis", "animal_check"],
+            "face_scale_factor": 1.2,
+            "face_min_neighbors": 3,
+            "face_min_size": 30,
+            "diff_size": 256,
+        },
+        "standard": {
+            "analysis_size": None,
+            "max_frames": 5,
+            "stages": ["face_analysis", "frame_analysis", "artifact_analysis", "animal_check"],
+            "face_scale_factor": 1.2,
+            "face_min_neighbors": 3,
+            "face_min_size": 30,
+            "diff_size": 256,
+        },
+        "thorough": {
+            "analysis_size": None,
+            "max_frames": 5,
+            "stages": ["face_analysis", "frame_analysis", "artifact_analysis", "animal_check",
+                       "pattern_analysis", "texture_analysis"],
+            "face_scale_factor": 1.1,
+            "face_min_neighbors": 4,
+            "face_min_size": 24,
+            "diff_size": 512,
+            # Frames larger than this are scored tile by tile (0/absent = whole frame at once)
+            "artifact_tile_size": 512,
+            # pattern/texture carry no weight in STAGE_WEIGHTS (so they never run elsewhere);
+            # this override takes precedence over STAGE_WEIGHTS for thorough requests
+            "stage_weights": {"pattern_analysis": 0.1, "texture_analysis": 0.1},
+        },
+    }
+
+    # Detector stage weights for the overall AI probability; zero-weight stages are not executed.
+    # STAGE_WEIGHTS="face_analysis=0.3,..." overrides individual weights (see python -m app.tuning).
+    STAGE_WEIGHTS: Dict[str, float] = {
+        "face_analysis": 0.25,
+        "frame_analysis": 0.30,
+        "artifact_analysis": 0.35,
+        "animal_check": 0.10,
+        "pattern_analysis": 0.0,
+        "texture_analysis": 0.0,
+    }
+    STAGE_WEIGHTS.update(_parse_weights(os.getenv("STAGE_WEIGHTS", "")))
+    STAGE_EXECUTOR_WORKERS = int(os.getenv("STAGE_EXECUTOR_WORKERS", 4))
+    # Threads scoring artifact tiles of one frame in parallel (profiles with artifact_tile_size)
+    ARTIFACT_TILE_WORKERS = int(os.getenv("ARTIFACT_TILE_WORKERS", 4))
+    # Reusable detector work arrays per thread (app.utils.scratch), bounded by total bytes
+    SCRATCH_POOL_BYTES = int(os.getenv("SCRATCH_POOL_BYTES", 128 * 1024 * 1024))
+    # Free per-request product arrays (gray/edge/thumbnail stacks) kept for reuse, bounded by total bytes
+    PRODUCT_POOL_BYTES = int(os.getenv("PRODUCT_POOL_BYTES", 256 * 1024 * 1024))
+    # How often an in-flight analysis checks whether its client has disconnected (seconds)
+    DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", 0.05))
+
+    # Per-client admission (app.api.admission): token bucket per IP / API key in front of a
+    # weighted fair queue over ADMISSION_CONCURRENCY analysis slots (0 = STAGE_EXECUTOR_WORKERS)
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+    ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", 20.0))  # requests/s per client, 0 disables
+    ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", 60.0))
+    ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", 0))
+    ADMISSION_MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", 32))  # per client
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 30.0))
+    ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", 10000))
+    ADMISSION_CLIENT_WEIGHTS = os.getenv("ADMISSION_CLIENT_WEIGHTS", "")  # "key:<api key>=2,ip:10.0.0.5=0.5"
+    ADMISSION_API_KEY_HEADER = "X-API-Key"
+    # Only these keys (and the key:<api key> entries of ADMISSION_CLIENT_WEIGHTS) identify a client;
+    # requests with any other X-API-Key are limited by address
+    ADMISSION_API_KEYS = os.getenv("ADMISSION_API_KEYS", "")
+    ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "False").lower() == "true"
+
+    # GET /api/analyze/status: service-time EWMA smoothing, backoff while not ready, and the
+    # lower end of suggested_frames (the upper end is the default profile's max_frames)
+    STATUS_EWMA_ALPHA = float(os.getenv("STATUS_EWMA_ALPHA", 0.2))
+    STATUS_UNREADY_BACKOFF = float(os.getenv("STATUS_UNREADY_BACKOFF", 2.0))
+    STATUS_MIN_FRAMES = 2
+
+    # Multi-video batch analysis (/api/analyze/batch); items run in parallel, 0 = STAGE_EXECUTOR_WORKERS
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 256))
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 0))
+
+    # Persistent WebSocket frame channel (/api/ws), limits are per connection
+    WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", 4))
+    WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", 16))
+    WS_BUFFER_POOL_SIZE = int(os.getenv("WS_BUFFER_POOL_SIZE", 16))
+
+    # Persistent result store shared by all workers on a node (empty path disables it)
+    RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", "")
+    RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_BYTES", 512 * 1024 * 1024))
+    RESULT_STORE_WARM_START = int(os.getenv("RESULT_STORE_WARM_START", 1000))
+
+    # Opt-in traffic capture for replay (python -m app.replay): a sampled fraction of /api/analyze
+    # requests (frames, metadata, latency, result) in a bounded SQLite ring. Empty path disables it.
+    CAPTURE_PATH = os.getenv("CAPTURE_PATH", "")
+    CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", 0.01))
+    CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", 256 * 1024 * 1024))
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 1024))
+
+    # Consistent-hash routing front (python main.py --router --backends URL,URL)
+    ROUTER_BACKENDS = [b for b in os.getenv("ROUTER_BACKENDS", "").split(",") if b]
+    ROUTER_VNODES = int(os.getenv("ROUTER_VNODES", 160))
+    ROUTER_LOAD_FACTOR = float(os.getenv("ROUTER_LOAD_FACTOR", 1.25))
+    ROUTER_HEALTH_PATH = "/api/health"
+    ROUTER_HEALTH_INTERVAL = float(os.getenv("ROUTER_HEALTH_INTERVAL", 2.0))
+    ROUTER_FAILURE_THRESHOLD = 3
+    ROUTER_DOWN_SECONDS = 10.0
+    ROUTER_MAX_ATTEMPTS = 3
+    ROUTER_TIMEOUT = 30.0
+
+    # Multi-worker launcher (python -m app.launcher); 0 cores means all available
+    LAUNCH_CORES = int(os.getenv("LAUNCH_CORES", 0))
+    LAUNCH_THREADS_PER_WORKER = int(os.getenv("LAUNCH_THREADS_PER_WORKER", 2))
+    # Crashed workers restart after an exponential backoff; a worker that keeps dying within
+    # LAUNCH_MIN_UPTIME seconds more than LAUNCH_MAX_RESTARTS times in a row stops the launcher
+    LAUNCH_MIN_UPTIME = float(os.getenv("LAUNCH_MIN_UPTIME", 10.0))
+    LAUNCH_MAX_RESTARTS = int(os.getenv("LAUNCH_MAX_RESTARTS", 5))
+    LAUNCH_RESTART_BACKOFF_MAX = float(os.getenv("LAUNCH_RESTART_BACKOFF_MAX", 30.0))
 
     LOG_LEVEL = logging.INFO if not DEBUG else logging.DEBUG
 
+    # Opt-in per-request profiling (header or sampling), exposed under /api/debug/profiles
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILING_HEADER = "X-AITUBE-Profile"
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0.0))
+    PROFILING_RING_SIZE = int(os.getenv("PROFILING_RING_SIZE", 32))
+    PROFILING_TOP_FUNCTIONS = 30
+
     @classmethod
     def get_config(cls) -> Dict[str, Any]:
         return {
@@ -23,7 +194,27 @@ class Config:
             "host": cls.HOST,
             "port": cls.PORT,
             "max_file_size": cls.MAX_FILE_SIZE,
+            "max_request_size": cls.MAX_REQUEST_SIZE,
             "ai_threshold": cls.AI_DETECTION_THRESHOLD,
             "timeout": cls.ANALYSIS_TIMEOUT,
             "use_real_ai_model": cls.USE_REAL_AI_MODEL,
+            "simulated_model": cls.SIMULATED_MODEL,
+            "default_execution_profile": cls.DEFAULT_EXECUTION_PROFILE,
+            "execution_profiles": sorted(cls.EXECUTION_PROFILES),
+            "result_store_enabled": bool(cls.RESULT_STORE_PATH),
+            "capture_enabled": bool(cls.CAPTURE_PATH),
+            "profiling_enabled": cls.PROFILING_ENABLED,
+            "profiling_sample_rate": cls.PROFILING_SAMPLE_RATE,
         }
+
+    @classmethod
+    def get_execution_profile(cls, name: Optional[str] = None) -> Dict[str, Any]:
+        """Return a copy of the named execution profile (default profile when name is None)."""
+        name = name or cls.DEFAULT_EXECUTION_PROFILE
+        if name not in cls.EXECUTION_PROFILES:
+            raise ValueError(
+                f"Unknown execution profile '{name}' (available: {', '.join(sorted(cls.EXECUTION_PROFILES))})"
+            )
+        profile = dict(cls.EXECUTION_PROFILES[name])
+        profile["name"] = name
+        return profile
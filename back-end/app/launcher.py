@@ -0,0 +1,206 @@
+# Production launcher: python -m app.launcher --cores 8 --threads-per-worker 2 --pin
+# Thread-count environment variables must be set before NumPy/OpenCV are imported,
+# so the application is only imported after they are configured.
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import List, Dict, Any, Optional
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Environment variables read by the BLAS/OpenMP runtimes NumPy and OpenCV link against
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_workers(cores: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                 workers: Optional[int] = None, cpus: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """Split a core budget into workers: [{"index", "threads", "cpus"}, ...]."""
+    cpus = list(cpus) if cpus is not None else available_cpus()
+    cores = min(cores or len(cpus), len(cpus))
+    if workers:
+        threads = max(1, cores // workers)
+    else:
+        threads = max(1, min(threads_per_worker or Config.LAUNCH_THREADS_PER_WORKER, cores))
+        workers = max(1, cores // threads)
+    plan = []
+    for index in range(workers):
+        start = (index * threads) % len(cpus)
+        assigned = [cpus[(start + i) % len(cpus)] for i in range(threads)]
+        plan.append({"index": index, "threads": threads, "cpus": assigned})
+    return plan
+
+
+def configure_thread_env(threads: int) -> None:
+    """Pin BLAS/OpenMP pool sizes; only effective before NumPy/OpenCV are imported."""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+
+def apply_worker_settings(worker: Dict[str, Any], pin: bool = False) -> None:
+    """Per-worker runtime settings applied right after fork."""
+    import cv2  # type: ignore
+
+    cv2.setNumThreads(worker["threads"])
+    Config.STAGE_EXECUTOR_WORKERS = worker["threads"]
+    Config.ARTIFACT_TILE_WORKERS = worker["threads"]
+    if pin and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(worker["cpus"]))
+
+
+def size_worker_pools(worker: Dict[str, Any]) -> None:
+    """Resize what routes built at import time in the parent to this worker's thread budget."""
+    from app.api import routes
+
+    routes.stage_executor.max_workers = worker["threads"]
+    routes.admission.capacity = Config.ADMISSION_CONCURRENCY or worker["threads"]
+
+
+def preload_application():
+    """Import the app and build/warm the model once in the parent process."""
+    import cv2  # type: ignore
+
+    # Keep OpenCV single-threaded in the parent: its thread pool does not survive fork
+    cv2.setNumThreads(1)
+    import main  # noqa: E402
+    from app.api import routes
+
+    routes.model_registry.startup(warm_up=routes.warm_up_model if Config.MODEL_WARMUP else None)
+    # Worker threads do not survive fork either; children recreate the pool lazily
+    routes.stage_executor.shutdown()
+    return main.app
+
+
+def restart_delay(worker: Dict[str, Any], now: float) -> Optional[float]:
+    """Seconds to wait before respawning an exited worker, or None when it is crash-looping.
+
+    Exits within LAUNCH_MIN_UPTIME of the start count as consecutive failures and
+    double the delay (0.5s up to LAUNCH_RESTART_BACKOFF_MAX); a longer run resets it.
+    """
+    if now - worker.get("started", now) >= Config.LAUNCH_MIN_UPTIME:
+        worker["failures"] = 0
+    worker["failures"] = worker.get("failures", 0) + 1
+    if worker["failures"] > Config.LAUNCH_MAX_RESTARTS:
+        return None
+    return min(Config.LAUNCH_RESTART_BACKOFF_MAX, 0.5 * 2 ** (worker["failures"] - 1))
+
+
+def _serve(app, sock: socket.socket, worker: Dict[str, Any], pin: bool) -> None:
+    import uvicorn  # type: ignore
+
+    apply_worker_settings(worker, pin)
+    size_worker_pools(worker)
+    config = uvicorn.Config(app, log_level="info" if not Config.DEBUG else "debug")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def run(cores: Optional[int] = None, threads_per_worker: Optional[int] = None,
+        workers: Optional[int] = None, pin: bool = False,
+        host: str = Config.HOST, port: int = Config.PORT) -> None:
+    plan = plan_workers(cores, threads_per_worker, workers)
+    configure_thread_env(plan[0]["threads"])
+    app = preload_application()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    logger.info(f"Launching {len(plan)} workers x {plan[0]['threads']} threads on {host}:{port} (pin={pin})")
+
+    children: Dict[int, Dict[str, Any]] = {}
+    stopping = False
+    failed = False
+
+    def spawn(worker: Dict[str, Any]) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                _serve(app, sock, worker, pin)
+            finally:
+                os._exit(0)
+        worker["started"] = time.monotonic()
+        children[pid] = worker
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for worker in plan:
+        spawn(worker)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        worker = children.pop(pid, None)
+        if worker is None or stopping:
+            continue
+        delay = restart_delay(worker, time.monotonic())
+        if delay is None:
+            logger.error(f"Worker {worker['index']} keeps crashing ({worker['failures'] - 1} quick exits in a row); "
+                         f"stopping")
+            stop(None, None)
+            failed = True
+            continue
+        logger.warning(f"Worker {worker['index']} (pid {pid}) exited with status {status}; "
+                       f"restarting in {delay:.1f}s")
+        time.sleep(delay)
+        if not stopping:
+            spawn(worker)
+    sock.close()
+    if failed:
+        sys.exit(1)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Launch pre-forked AITUBE workers within a CPU budget")
+    parser.add_argument("--cores", type=int, default=Config.LAUNCH_CORES or None,
+                        help="CPU cores to use (default: all available)")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="cv2/BLAS threads per worker process")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (overrides --threads-per-worker)")
+    parser.add_argument("--pin", action="store_true", help="Pin each worker to its own CPUs")
+    parser.add_argument("--host", default=Config.HOST)
+    parser.add_argument("--port", type=int, default=Config.PORT)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=Config.LOG_LEVEL,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not hasattr(os, "fork"):
+        sys.exit("app.launcher requires a platform with fork(); use 'python main.py' instead")
+    run(args.cores, args.threads_per_worker, args.workers, args.pin, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,78 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from abc import ABC, abstractmethod
 
-# Real AIModel implementation (heavy dependencies) import path
-try:
-    from app.models.ai_detector import AIModel
-except Exception:
-    AIModel = None  # Will be loaded lazily if real model is requested
+# Real AIModel implementation (heavy dependencies: OpenCV, NumPy), imported on first use
+# so the mock and simulated models start without them. None = not available here.
+_NOT_LOADED = object()
+AIModel: Any = _NOT_LOADED
+
+
+def load_ai_model_class() -> Any:
+    global AIModel
+    if AIModel is _NOT_LOADED:
+        try:
+            from app.models.ai_detector import AIModel as model_class
+        except Exception:
+            model_class = None
+        AIModel = model_class
+    return AIModel
 
 
 class AIModelInterface(ABC):
     @abstractmethod
-    def analyze_face_consistency(self, images: List[Any]) -> Dict[str, Any]:
+    def analyze_face_consistency(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                 context: Any = None) -> Dict[str, Any]:
         pass
 
     @abstractmethod
-    def analyze_frame_differences(self, images: List[Any]) -> Dict[str, Any]:
+    def analyze_frame_differences(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                  context: Any = None) -> Dict[str, Any]:
         pass
 
     @abstractmethod
-    def detect_ai_artifacts(self, images: List[Any]) -> Dict[str, Any]:
+    def detect_ai_artifacts(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                            context: Any = None) -> Dict[str, Any]:
         pass
 
     @abstractmethod
-    def is_animal_content(self, images: List[Any]) -> bool:
+    def is_animal_content(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                          context: Any = None) -> bool:
         pass
 
+    def analyze_repetitive_patterns(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                    context: Any = None) -> Dict[str, Any]:
+        return {"pattern_score": 0.0, "individual_scores": [], "analysis_time": 0.0}
+
+    def analyze_texture_patterns(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                 context: Any = None) -> Dict[str, Any]:
+        return {"texture_uniformity": 0.0, "individual_scores": [], "analysis_time": 0.0}
+
+    # Pool lending product arrays to each request (see AnalysisContext.buffer); None = plain allocation
+    product_pool: Any = None
+
+    def compute_product(self, name: str, context: Any) -> Any:
+        """Shared intermediate for the stage executor; None means stages compute their own."""
+        return None
+
     def cleanup(self) -> None:
         pass
 
 
 class MockAIModelAdapter(AIModelInterface):
-    def analyze_face_consistency(self, images: List[Any]) -> Dict[str, Any]:
+    def analyze_face_consistency(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                 context: Any = None) -> Dict[str, Any]:
         return {"face_consistency": 0.8, "face_count": [1, 1], "analysis_time": 0.1}
 
-    def analyze_frame_differences(self, images: List[Any]) -> Dict[str, Any]:
+    def analyze_frame_differences(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                  context: Any = None) -> Dict[str, Any]:
         return {"frame_diff_score": 15.0, "temporal_consistency": 0.85, "analysis_time": 0.1}
 
-    def detect_ai_artifacts(self, images: List[Any]) -> Dict[str, Any]:
+    def detect_ai_artifacts(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                            context: Any = None) -> Dict[str, Any]:
         return {"ai_artifact_score": 0.3, "individual_scores": [0.2, 0.4], "analysis_time": 0.1}
 
-    def is_animal_content(self, images: List[Any]) -> bool:
+    def is_animal_content(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                          context: Any = None) -> bool:
         return False
 
     def cleanup(self) -> None:
@@ -49,21 +82,39 @@ class MockAIModelAdapter(AIModelInterface):
 class RealAIModelAdapter(AIModelInterface):
     def __init__(self):
         # Lazily instantiate real model if available
-        if AIModel is None:
+        model_class = load_ai_model_class()
+        if model_class is None:
             raise RuntimeError("Real AIModel class is not available in this environment.")
-        self.impl = AIModel()
+        self.impl = model_class()
+        self.product_pool = getattr(self.impl, "product_pool", None)
+
+    def analyze_face_consistency(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                 context: Any = None) -> Dict[str, Any]:
+        return self.impl.analyze_face_consistency(images, options, context=context)
+
+    def analyze_frame_differences(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                  context: Any = None) -> Dict[str, Any]:
+        return self.impl.analyze_frame_differences(images, options, context=context)
 
-    def analyze_face_consistency(self, images: List[Any]) -> Dict[str, Any]:
-        return self.impl.analyze_face_consistency(images)
+    def detect_ai_artifacts(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                            context: Any = None) -> Dict[str, Any]:
+        return self.impl.detect_ai_artifacts(images, options, context=context)
 
-    def analyze_frame_differences(self, images: List[Any]) -> Dict[str, Any]:
-        return self.impl.analyze_frame_differences(images)
+    def is_animal_content(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                          context: Any = None) -> bool:
+        return self.impl.is_animal_content(images, options, context=context)
 
-    def detect_ai_artifacts(self, images: List[Any]) -> Dict[str, Any]:
-        return self.impl.detect_ai_artifacts(images)
+    def analyze_repetitive_patterns(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                    context: Any = None) -> Dict[str, Any]:
+        return self.impl.analyze_repetitive_patterns(images, options, context=context)
 
-    def is_animal_content(self, images: List[Any]) -> bool:
-        return self.impl.is_animal_content(images)
+    def analyze_texture_patterns(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                 context: Any = None) -> Dict[str, Any]:
+        return self.impl.analyze_texture_patterns(images, options, context=context)
+
+    def compute_product(self, name: str, context: Any) -> Any:
+        compute = getattr(self.impl, "compute_product", None)
+        return compute(name, context) if compute is not None else None
 
     def cleanup(self) -> None:
         try:
@@ -72,7 +123,14 @@ class RealAIModelAdapter(AIModelInterface):
             pass
 
 
-def create_ai_model(use_real: bool = False) -> AIModelInterface:
+def create_ai_model(use_real: bool = False, simulated: Optional[bool] = None) -> AIModelInterface:
+    """Real or mock model; the synthetic-latency model when simulated (default: Config.SIMULATED_MODEL)"""
+    from app.config import Config
+
+    if Config.SIMULATED_MODEL if simulated is None else simulated:
+        from app.models.simulated import SimulatedAIModelAdapter
+
+        return SimulatedAIModelAdapter.from_config()
     if use_real:
         return RealAIModelAdapter()
     else:
@@ -1,24 +1,84 @@
 import numpy as np
 import cv2
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
+import os
+import threading
 from concurrent.futures import ThreadPoolExecutor
 import time
 
+from app.config import Config
+from app.utils.image_processor import ImageProcessor
+from app.utils.scratch import BufferPool, ScratchPool
+from app.models import features
+
 logger = logging.getLogger(__name__)
 
+FACE_CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
 class AIModel:
     def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self._cascades = threading.local()
+        # Product arrays (gray/edge/thumbnail stacks) lent to each request until it finishes
+        self.product_pool = BufferPool()
         self.executor = ThreadPoolExecutor(max_workers=2)
+        self._tile_pool: Optional[ThreadPoolExecutor] = None
+        self._tile_pool_key: Optional[tuple] = None
+        # Per-thread work arrays for temporaries that do not outlive one call
+        self.scratch = ScratchPool()
+    
+    @property
+    def face_cascade(self) -> cv2.CascadeClassifier:
+        """This thread's classifier: detectMultiScale is not safe to call concurrently on one instance."""
+        cascade = getattr(self._cascades, "cascade", None)
+        if cascade is None:
+            cascade = self._cascades.cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+        return cascade
     
-    def analyze_face_consistency(self, images: List[np.ndarray]) -> Dict[str, Any]:
+    def compute_product(self, name: str, context) -> Any:
+        """Provide shared intermediates for the stage executor (see app.models.registry)."""
+        images, options = context.images, context.options
+        if name == "gray":
+            if features.is_stack(images) and images.ndim == 4:
+                # One conversion over the whole contiguous (N, H, W, C) stack
+                n, h, w, c = images.shape
+                gray = cv2.cvtColor(images.reshape(n * h, w, c), cv2.COLOR_RGB2GRAY, dst=context.buffer((n * h, w)))
+                return gray.reshape(n, h, w)
+            return self._per_frame(context, lambda img: cv2.cvtColor(img, cv2.COLOR_RGB2GRAY,
+                                                                     dst=context.buffer(img.shape[:2])), images)
+        if name == "edges":
+            grays = context.product("gray")
+            if features.is_stack(grays):
+                # Canny hysteresis is not separable across frames: per frame, into one stack
+                return self._per_frame_into(context, lambda gray, out: cv2.Canny(gray, 50, 150, edges=out),
+                                            grays, grays.shape[1:])
+            return self._per_frame(context, lambda gray: cv2.Canny(gray, 50, 150, edges=context.buffer(gray.shape)),
+                                   grays)
+        if name == "faces":
+            return self._per_frame(context, lambda gray: self._detect_faces_gray(gray, options),
+                                   context.product("gray"))
+        if name == "thumbnails":
+            diff_size = options.get("diff_size", 256)
+            if features.is_stack(images):
+                return self._per_frame_into(context,
+                                            lambda img, out: cv2.resize(img, (diff_size, diff_size), dst=out),
+                                            images, (diff_size, diff_size) + images.shape[3:])
+            return self._per_frame(context, lambda img: cv2.resize(
+                img, (diff_size, diff_size), dst=context.buffer((diff_size, diff_size) + img.shape[2:])), images)
+        return None
+    
+    def analyze_face_consistency(self, images: List[np.ndarray],
+                                 options: Optional[Dict[str, Any]] = None,
+                                 context=None) -> Dict[str, Any]:
         start_time = time.time()
         
-        face_results = []
-        for img in images:
-            faces = self._detect_faces_fast(img)
-            face_results.append(faces)
+        face_results = self._shared(context, "faces")
+        if face_results is None:
+            face_results = []
+            for img in images:
+                self._check(context)
+                faces = self._detect_faces_fast(img, options)
+                face_results.append(faces)
         
         # Analyze face consistency across frames
         consistency_score = self._calculate_face_consistency(face_results)
@@ -30,125 +90,283 @@ class AIModel:
             "analysis_time": analysis_time
         }
     
-    def analyze_frame_differences(self, images: List[np.ndarray]) -> Dict[str, Any]:
+    def analyze_frame_differences(self, images: List[np.ndarray],
+                                  options: Optional[Dict[str, Any]] = None,
+                                  context=None) -> Dict[str, Any]:
         if len(images) < 2:
             return {"frame_diff_score": 0.0, "temporal_consistency": 1.0}
         
         start_time = time.time()
+        diff_size = (options or {}).get("diff_size", 256)
+        thumbnails = self._shared(context, "thumbnails")
         differences = []
+        if features.is_stack(thumbnails) and len(thumbnails) > 1:
+            out = self.scratch.get("stack_diff", (len(thumbnails) - 1, thumbnails[0].size))
+            differences = features.stack_differences(thumbnails, out=out)
         
-        for i in range(len(images) - 1):
-            diff = self._calculate_frame_difference(images[i], images[i + 1])
+        for i in range(len(differences), len(images) - 1):
+            self._check(context)
+            if thumbnails is not None:
+                diff = features.thumbnail_difference(thumbnails[i], thumbnails[i + 1],
+                                                     out=self.scratch.get("diff", thumbnails[i].shape))
+            else:
+                diff = self._calculate_frame_difference(images[i], images[i + 1], diff_size)
             differences.append(diff)
         
-        avg_diff = np.mean(differences)
-        consistency = 1.0 - min(avg_diff / 100.0, 1.0)
-        
-        analysis_time = time.time() - start_time
-        return {
-            "frame_diff_score": float(avg_diff),
-            "temporal_consistency": float(consistency),
-            "analysis_time": analysis_time
-        }
+        result = features.temporal_consistency(differences)
+        result["analysis_time"] = time.time() - start_time
+        return result
     
-    def detect_ai_artifacts(self, images: List[np.ndarray]) -> Dict[str, Any]:
+    def detect_ai_artifacts(self, images: List[np.ndarray],
+                            options: Optional[Dict[str, Any]] = None,
+                            context=None) -> Dict[str, Any]:
         start_time = time.time()
         
+        tile_size = (options or {}).get("artifact_tile_size") or 0
+        grays = self._shared(context, "gray")
+        edges = self._shared(context, "edges")
+        # Edge density and texture statistics for the whole stack at once
+        densities = stds = None
+        if features.is_stack(grays) and features.is_stack(edges):
+            densities = features.edge_densities(edges)
+            stds = features.gray_stds(grays)
         artifact_scores = []
-        for img in images:
-            score = self._analyze_single_image_artifacts(img)
+        tile_maps = []
+        for i, img in enumerate(images):
+            self._check(context)
+            if grays is not None and edges is not None:
+                gray, edge_map = grays[i], edges[i]
+            else:
+                gray = self._gray(img)
+                edge_map = self._edges(gray)
+            if tile_size and max(gray.shape) > tile_size:
+                score, tile_map = self._tiled_artifact_score(gray, edge_map, tile_size)
+            elif densities is not None:
+                score = features.artifact_score(self._laplacian_var(gray), densities[i], stds[i])
+                tile_map = None
+            else:
+                score, tile_map = self._artifact_score(gray, edge_map), None
             artifact_scores.append(score)
+            tile_maps.append(tile_map)
         
         avg_artifact_score = np.mean(artifact_scores)
         
         analysis_time = time.time() - start_time
-        return {
+        result = {
             "ai_artifact_score": float(avg_artifact_score),
             "individual_scores": [float(s) for s in artifact_scores],
             "analysis_time": analysis_time
         }
+        if any(m is not None for m in tile_maps):
+            # Per-tile artifact scores (rows x cols) so localized artifacts are visible
+            result["tile_scores"] = [m.tolist() if m is not None else None for m in tile_maps]
+        return result
+    
+    def analyze_repetitive_patterns(self, images: List[np.ndarray],
+                                    options: Optional[Dict[str, Any]] = None,
+                                    context=None) -> Dict[str, Any]:
+        start_time = time.time()
+        grays = self._shared(context, "gray")
+        if grays is None:
+            grays = (self._gray(img) for img in images)
+        scores = self._per_frame(context, ImageProcessor.repetitive_pattern_score, grays)
+        return {
+            "pattern_score": float(np.mean(scores)) if scores else 0.0,
+            "individual_scores": scores,
+            "analysis_time": time.time() - start_time
+        }
+    
+    def analyze_texture_patterns(self, images: List[np.ndarray],
+                                 options: Optional[Dict[str, Any]] = None,
+                                 context=None) -> Dict[str, Any]:
+        start_time = time.time()
+        grays = self._shared(context, "gray")
+        if grays is None:
+            grays = (self._gray(img) for img in images)
+        uniformity = []
+        for gray in grays:
+            self._check(context)
+            hist = ImageProcessor.lbp_histogram(gray).astype(np.float64)
+            p = hist / max(hist.sum(), 1.0)
+            p = p[p > 0]
+            entropy = float(-(p * np.log2(p)).sum())
+            # Low LBP entropy means repetitive, uniform micro-texture
+            uniformity.append(1.0 - min(entropy / 8.0, 1.0))
+        return {
+            "texture_uniformity": float(np.mean(uniformity)) if uniformity else 0.0,
+            "individual_scores": uniformity,
+            "analysis_time": time.time() - start_time
+        }
+    
+    @staticmethod
+    def _shared(context, name: str) -> Any:
+        return context.product(name) if context is not None else None
     
-    def _detect_faces_fast(self, image: np.ndarray) -> List:
+    @staticmethod
+    def _check(context) -> None:
+        """Stop between frames once the request has been cancelled."""
+        if context is not None:
+            context.raise_if_cancelled()
+    
+    def _per_frame(self, context, fn, items) -> List[Any]:
+        results = []
+        for item in items:
+            self._check(context)
+            results.append(fn(item))
+        return results
+    
+    def _per_frame_into(self, context, fn, items, frame_shape: tuple) -> np.ndarray:
+        """Like _per_frame, but fn(item, out) writes each frame into one contiguous uint8 stack."""
+        stack = context.buffer((len(items),) + tuple(frame_shape))
+        for i, item in enumerate(items):
+            self._check(context)
+            fn(item, stack[i])
+        return stack
+    
+    def _gray(self, image: np.ndarray) -> np.ndarray:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY, dst=self.scratch.get("gray", image.shape[:2]))
+    
+    def _edges(self, gray: np.ndarray) -> np.ndarray:
+        return cv2.Canny(gray, 50, 150, edges=self.scratch.get("edges", gray.shape))
+    
+    def _detect_faces_fast(self, image: np.ndarray, options: Optional[Dict[str, Any]] = None) -> List:
         try:
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            # Use optimized parameters for speed
+            gray = self._gray(image)
+        except:
+            return []
+        return self._detect_faces_gray(gray, options)
+    
+    def _detect_faces_gray(self, gray: np.ndarray, options: Optional[Dict[str, Any]] = None) -> List:
+        options = options or {}
+        try:
+            # Use optimized parameters for speed (overridable per execution profile)
+            min_size = options.get("face_min_size", 30)
             faces = self.face_cascade.detectMultiScale(
-                gray, 
-                scaleFactor=1.2, 
-                minNeighbors=3,
-                minSize=(30, 30)
+                gray,
+                scaleFactor=options.get("face_scale_factor", 1.2),
+                minNeighbors=options.get("face_min_neighbors", 3),
+                minSize=(min_size, min_size)
             )
             return faces.tolist()
         except:
             return []
     
     def _calculate_face_consistency(self, face_results: List[List]) -> float:
-        if not face_results or not any(face_results):
-            return 0.5  # Neutral score for no faces
-        
         # Simple consistency check based on face count
-        face_counts = [len(faces) for faces in face_results]
-        if len(face_counts) <= 1:
-            return 1.0
-        
-        std_count = np.std(face_counts)
-        max_count = max(face_counts)
-        
-        if max_count == 0:
-            return 1.0
-        
-        consistency = 1.0 - (std_count / max_count)
-        return float(consistency)
+        return features.face_consistency([len(faces) for faces in face_results])
     
-    def _calculate_frame_difference(self, img1: np.ndarray, img2: np.ndarray) -> float:
+    def _calculate_frame_difference(self, img1: np.ndarray, img2: np.ndarray, diff_size: int = 256) -> float:
         # Resize for consistent comparison
-        size = (256, 256)
-        img1_resized = cv2.resize(img1, size)
-        img2_resized = cv2.resize(img2, size)
+        size = (diff_size, diff_size)
+        shape = (diff_size, diff_size) + img1.shape[2:]
+        img1_resized = cv2.resize(img1, size, dst=self.scratch.get("resize_a", shape, img1.dtype))
+        img2_resized = cv2.resize(img2, size, dst=self.scratch.get("resize_b", shape, img2.dtype))
         
         # Calculate structural similarity index (simplified)
-        diff = cv2.absdiff(img1_resized, img2_resized)
+        diff = cv2.absdiff(img1_resized, img2_resized, dst=self.scratch.get("diff", shape, img1.dtype))
         diff_score = np.mean(diff)
         
         return float(diff_score)
     
     def _analyze_single_image_artifacts(self, image: np.ndarray) -> float:
+        gray = self._gray(image)
+        return self._artifact_score(gray, self._edges(gray))
+    
+    def _artifact_score(self, gray: np.ndarray, edges: np.ndarray) -> float:
         # Multiple artifact detection methods
         
         # 1. Blur detection (AI images often have artificial blur)
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        blur_score = min(laplacian_var / 500.0, 1.0)  # Normalize
+        laplacian_var = self._laplacian_var(gray)
         
         # 2. Edge detection (AI images often have unusual edge patterns)
-        edges = cv2.Canny(gray, 50, 150)
-        edge_density = np.sum(edges > 0) / (gray.shape[0] * gray.shape[1])
-        edge_score = min(edge_density * 10, 1.0)  # Normalize
+        edge_density = features.edge_density(edges)
         
         # 3. Texture uniformity (AI images often have uniform textures)
-        texture_std = np.std(gray)
-        texture_score = 1.0 - min(texture_std / 100.0, 1.0)
+        texture_std = float(cv2.meanStdDev(gray)[1][0, 0])
         
-        # Combined artifact score
-        artifact_score = (blur_score + edge_score + texture_score) / 3.0
+        return features.artifact_score(laplacian_var, edge_density, texture_std)
+    
+    def _laplacian_var(self, gray: np.ndarray) -> float:
+        laplacian = cv2.Laplacian(gray, cv2.CV_64F, dst=self.scratch.get("laplacian", gray.shape, np.float64))
+        return float(cv2.meanStdDev(laplacian)[1][0, 0]) ** 2
+    
+    def _tiled_artifact_score(self, gray: np.ndarray, edges: np.ndarray, tile_size: int):
+        """Whole-frame artifact score merged from per-tile statistics, plus the per-tile score map."""
+        h, w = gray.shape[:2]
+        tiles = [(y, x) for y in range(0, h, tile_size) for x in range(0, w, tile_size)]
+        stats = list(self._get_tile_pool().map(
+            lambda yx: self._tile_stats(gray, edges, yx[0], yx[1], tile_size, self.scratch), tiles))
+        
+        # Sums and sums of squares merge exactly into the whole-frame variance / std
+        stats_arr = np.array(stats, dtype=np.float64)
+        n, lap_sum, lap_sq, gray_sum, gray_sq, edge_count = stats_arr.sum(axis=0)
+        laplacian_var = lap_sq / n - (lap_sum / n) ** 2
+        texture_std = np.sqrt(max(gray_sq / n - (gray_sum / n) ** 2, 0.0))
+        score = features.artifact_score(laplacian_var, edge_count / n, texture_std)
         
-        return artifact_score
+        tile_scores = np.empty(len(tiles), dtype=np.float32)
+        for i, (tn, t_lap_sum, t_lap_sq, t_gray_sum, t_gray_sq, t_edges) in enumerate(stats_arr):
+            t_lap_var = t_lap_sq / tn - (t_lap_sum / tn) ** 2
+            t_std = np.sqrt(max(t_gray_sq / tn - (t_gray_sum / tn) ** 2, 0.0))
+            tile_scores[i] = features.artifact_score(t_lap_var, t_edges / tn, t_std)
+        rows, cols = -(-h // tile_size), -(-w // tile_size)
+        return score, tile_scores.reshape(rows, cols)
+    
+    @staticmethod
+    def _tile_stats(gray: np.ndarray, edges: np.ndarray, y: int, x: int, tile_size: int,
+                    scratch: ScratchPool) -> tuple:
+        h, w = gray.shape[:2]
+        y1, x1 = min(y + tile_size, h), min(x + tile_size, w)
+        # One-pixel halo so the Laplacian at tile borders sees the same neighbours as on the whole frame
+        hy0, hx0 = max(y - 1, 0), max(x - 1, 0)
+        hy1, hx1 = min(y1 + 1, h), min(x1 + 1, w)
+        laplacian = cv2.Laplacian(gray[hy0:hy1, hx0:hx1], cv2.CV_32F,
+                                  dst=scratch.get("tile_laplacian", (hy1 - hy0, hx1 - hx0), np.float32))
+        laplacian = laplacian[y - hy0:y1 - hy0, x - hx0:x1 - hx0]
+        lap_mean, lap_std = cv2.meanStdDev(laplacian)
+        gray_mean, gray_std = cv2.meanStdDev(gray[y:y1, x:x1])
+        n = float((y1 - y) * (x1 - x))
+        lap_mean, lap_std = float(lap_mean[0, 0]), float(lap_std[0, 0])
+        gray_mean, gray_std = float(gray_mean[0, 0]), float(gray_std[0, 0])
+        return (n, lap_mean * n, (lap_std ** 2 + lap_mean ** 2) * n,
+                gray_mean * n, (gray_std ** 2 + gray_mean ** 2) * n,
+                float(cv2.countNonZero(edges[y:y1, x:x1])))
+    
+    def _get_tile_pool(self) -> ThreadPoolExecutor:
+        # Sized from the worker's thread budget (launcher.apply_worker_settings); a pool
+        # inherited across fork has no threads, so each process builds its own
+        key = (os.getpid(), max(1, Config.ARTIFACT_TILE_WORKERS))
+        if self._tile_pool_key != key:
+            if self._tile_pool is not None and self._tile_pool_key[0] == key[0]:
+                self._tile_pool.shutdown(wait=False)
+            self._tile_pool = ThreadPoolExecutor(max_workers=key[1], thread_name_prefix="artifact-tile")
+            self._tile_pool_key = key
+        return self._tile_pool
     
-    def is_animal_content(self, images: List[np.ndarray]) -> bool:
+    def is_animal_content(self, images: List[np.ndarray], options: Optional[Dict[str, Any]] = None,
+                          context=None) -> bool:
+        face_results = self._shared(context, "faces")
+        edge_maps = self._shared(context, "edges")
+        densities = features.edge_densities(edge_maps) if features.is_stack(edge_maps) else None
         # Simple heuristic for animal detection
-        for img in images:
-            faces = self._detect_faces_fast(img)
+        for i, img in enumerate(images):
+            self._check(context)
+            faces = face_results[i] if face_results is not None else self._detect_faces_fast(img, options)
             if len(faces) == 0:
                 # No human faces, could be animal or other content
-                gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-                edges = cv2.Canny(gray, 50, 150)
-                edge_density = np.sum(edges > 0) / (gray.shape[0] * gray.shape[1])
+                if densities is not None:
+                    density = densities[i]
+                else:
+                    edges = edge_maps[i] if edge_maps is not None else self._edges(self._gray(img))
+                    density = features.edge_density(edges)
                 
                 # Animals typically have moderate edge density
-                if 0.05 < edge_density < 0.2:
+                if features.is_animal_frame(len(faces), density):
                     return True
         
         return False
     
     def cleanup(self):
-        self.executor.shutdown(wait=False)
\ No newline at end of file
+        self.executor.shutdown(wait=False)
+        if self._tile_pool is not None:
+            self._tile_pool.shutdown(wait=False)
@@ -0,0 +1,170 @@
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Callable
+
+from app.config import Config
+from app.models.registry import AnalysisContext, DetectorRegistry, default_registry
+from app.utils.profiler import profile_stage
+
+logger = logging.getLogger(__name__)
+
+
+class StageExecutor:
+    """Runs the detector DAG for one request, sharing products and overlapping independent nodes."""
+
+    def __init__(self, registry: Optional[DetectorRegistry] = None, max_workers: Optional[int] = None):
+        self.registry = registry or default_registry
+        self.max_workers = max_workers or Config.STAGE_EXECUTOR_WORKERS
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage")
+        return self._pool
+
+    def plan(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, tuple]:
+        return self.registry.build_graph(self.registry.active_stages(options))
+
+    def run(self, model: Any, images: List[Any], options: Optional[Dict[str, Any]] = None,
+            profile=None, context: Optional[AnalysisContext] = None,
+            on_stage_complete: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """Execute all active stages and return {stage_name: result}.
+
+        Raises AnalysisCancelled as soon as the context's cancellation token
+        fires; nodes that have not started yet are never submitted.
+        on_stage_complete(name, result) is called from the worker thread as
+        each stage (not product) finishes.
+        """
+        options = options or {}
+        if context is None:
+            context = AnalysisContext(model, images, options)
+        graph = self.plan(options)
+        results: Dict[str, Any] = {}
+        if not graph:
+            return results
+
+        def execute(node: str) -> None:
+            context.raise_if_cancelled()
+            with profile_stage(profile, node):
+                if node in self.registry.stages:
+                    results[node] = self.registry.stages[node].run(model, context)
+                    if on_stage_complete is not None:
+                        on_stage_complete(node, results[node])
+                else:
+                    context.product(node)
+
+        # cProfile only sees the calling thread, so profiled requests run inline
+        if profile is not None or self.max_workers <= 1:
+            for node in self._topological_order(graph):
+                execute(node)
+            return results
+
+        remaining = {node: set(deps) for node, deps in graph.items()}
+        dependents: Dict[str, List[str]] = {node: [] for node in graph}
+        for node, deps in graph.items():
+            for dep in deps:
+                dependents[dep].append(node)
+
+        pool = self._get_pool()
+        running = {}
+
+        def submit_ready():
+            if context.cancel_token is not None and context.cancel_token.cancelled:
+                return
+            ready = [n for n, deps in remaining.items() if not deps]
+            # Start the most expensive nodes first to shorten the critical path
+            ready.sort(key=self.registry.cost, reverse=True)
+            for node in ready:
+                del remaining[node]
+                running[pool.submit(execute, node)] = node
+
+        submit_ready()
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    future.result()
+                except Exception:
+                    # Let in-flight siblings finish before surfacing the error
+                    wait(list(running))
+                    raise
+                for child in dependents[node]:
+                    remaining[child].discard(node)
+            submit_ready()
+        context.raise_if_cancelled()
+        return results
+
+    def _topological_order(self, graph: Dict[str, tuple]) -> List[str]:
+        order: List[str] = []
+        seen = set()
+
+        def visit(node):
+            if node in seen:
+                return
+            seen.add(node)
+            for dep in graph[node]:
+                visit(dep)
+            order.append(node)
+
+        for node in sorted(graph, key=self.registry.cost, reverse=True):
+            visit(node)
+        return order
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+def build_analysis_details(results: Dict[str, Any],
+                           registry: Optional[DetectorRegistry] = None) -> Dict[str, Any]:
+    """Map stage results onto the response's analysis_details, filling skipped legacy stages."""
+    registry = registry or default_registry
+    details: Dict[str, Any] = {}
+    skipped = []
+    for name, spec in registry.stages.items():
+        if name in results:
+            details[spec.detail_key] = results[name]
+        else:
+            skipped.append(name)
+            if spec.skipped_result is not None:
+                details[spec.detail_key] = copy.copy(spec.skipped_result)
+    details["skipped_stages"] = skipped
+    return details
+
+
+def collect_frame_features(results: Dict[str, Any], context: AnalysisContext) -> List[Dict[str, Any]]:
+    """Per-frame features that were produced as a side effect of this run (nothing is recomputed)."""
+    n_frames = len(context.images)
+    frames: List[Dict[str, Any]] = [{} for _ in range(n_frames)]
+
+    face_counts = (results.get("face_analysis") or {}).get("face_count")
+    if face_counts is not None and len(face_counts) == n_frames:
+        for i, count in enumerate(face_counts):
+            frames[i]["face_count"] = int(count)
+    artifact_scores = (results.get("artifact_analysis") or {}).get("individual_scores")
+    if artifact_scores is not None and len(artifact_scores) == n_frames:
+        for i, score in enumerate(artifact_scores):
+            frames[i]["artifact_score"] = float(score)
+    tile_maps = (results.get("artifact_analysis") or {}).get("tile_scores")
+    if tile_maps is not None and len(tile_maps) == n_frames:
+        import numpy as np
+
+        for i, tile_map in enumerate(tile_maps):
+            if tile_map is not None:
+                frames[i]["artifact_tiles"] = np.asarray(tile_map, dtype=np.float32)
+
+    edges = context.product("edges") if context.has_product("edges") else None
+    if edges is not None:
+        from app.models import features
+
+        for i, density in enumerate(features.edge_densities(edges)):
+            frames[i]["edge_density"] = density
+    thumbnails = context.product("thumbnails") if context.has_product("thumbnails") else None
+    if thumbnails is not None:
+        for i, thumbnail in enumerate(thumbnails):
+            # Copied: the product buffer goes back to the pool when the request finishes
+            frames[i]["thumbnail"] = thumbnail.copy()
+    return frames
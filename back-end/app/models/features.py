@@ -0,0 +1,115 @@
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+
+# Stage results rebuilt from per-frame features (see app.models.executor.collect_frame_features).
+# AIModel uses the same functions, so a result assembled from stored features
+# matches one computed from the decoded frames.
+
+def face_consistency(face_counts: Sequence[int]) -> float:
+    if not face_counts or max(face_counts) == 0:
+        return 0.5  # Neutral score for no faces
+    if len(face_counts) <= 1:
+        return 1.0
+    return float(1.0 - (np.std(face_counts) / max(face_counts)))
+
+
+def temporal_consistency(differences: Sequence[float]) -> Dict[str, Any]:
+    avg_diff = float(np.mean(differences))
+    return {
+        "frame_diff_score": avg_diff,
+        "temporal_consistency": float(1.0 - min(avg_diff / 100.0, 1.0)),
+    }
+
+
+def thumbnail_difference(a: np.ndarray, b: np.ndarray, out: Optional[np.ndarray] = None) -> float:
+    import cv2  # type: ignore
+
+    return float(np.mean(cv2.absdiff(a, b, dst=out)))
+
+
+def edge_density(edges: np.ndarray) -> float:
+    import cv2  # type: ignore
+
+    # countNonZero avoids the full-size boolean temporary of (edges > 0)
+    return cv2.countNonZero(edges) / float(edges.size)
+
+
+def is_stack(frames: Any) -> bool:
+    """True for a contiguous (N, H, W[, C]) array as built by ImageProcessor.stack_frames"""
+    return isinstance(frames, np.ndarray) and frames.ndim >= 3 and frames.flags.c_contiguous
+
+
+def stack_differences(stack: np.ndarray, out: Optional[np.ndarray] = None) -> List[float]:
+    """thumbnail_difference between each pair of consecutive frames, in one pass over the stack
+
+    out, when given, is an (N - 1, H * W * C) uint8 array that receives the differences.
+    """
+    import cv2  # type: ignore
+
+    n = len(stack)
+    if n < 2:
+        return []
+    flat = stack.reshape(n, -1)
+    diff = cv2.absdiff(flat[:-1], flat[1:], dst=out)
+    # Integer sums are exact in float64, so this equals np.mean per pair
+    return (diff.sum(axis=1, dtype=np.float64) / flat.shape[1]).tolist()
+
+
+def edge_densities(edge_maps: Any) -> List[float]:
+    if not is_stack(edge_maps):
+        return [edge_density(e) for e in edge_maps]
+    n = len(edge_maps)
+    # Canny maps hold only 0/255, so row sums count edge pixels without a boolean temporary
+    counts = edge_maps.reshape(n, -1).sum(axis=1, dtype=np.int64) // 255
+    return (counts / float(edge_maps[0].size)).tolist()
+
+
+def gray_stds(stack: np.ndarray) -> List[float]:
+    """Per-frame standard deviation of an (N, H, W) uint8 stack from exact integer sums"""
+    n = len(stack)
+    flat = stack.reshape(n, -1)
+    m = float(flat.shape[1])
+    mean = flat.sum(axis=1, dtype=np.int64) / m
+    squares = np.einsum("ij,ij->i", flat, flat, dtype=np.int64) / m
+    return np.sqrt(np.maximum(squares - mean ** 2, 0.0)).tolist()
+
+
+def artifact_score(laplacian_var: float, edge_density: float, texture_std: float) -> float:
+    blur_score = min(laplacian_var / 500.0, 1.0)
+    edge_score = min(edge_density * 10, 1.0)
+    texture_score = 1.0 - min(texture_std / 100.0, 1.0)
+    return float((blur_score + edge_score + texture_score) / 3.0)
+
+
+def is_animal_frame(face_count: int, edge_density: float) -> bool:
+    # No human faces and a moderate edge density (heuristic)
+    return face_count == 0 and 0.05 < edge_density < 0.2
+
+
+def face_analysis_from_features(frames: List[Dict[str, Any]]) -> Dict[str, Any]:
+    counts = [int(f["face_count"]) for f in frames]
+    return {"face_consistency": face_consistency(counts), "face_count": counts, "analysis_time": 0.0}
+
+
+def frame_analysis_from_features(frames: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if len(frames) < 2:
+        return {"frame_diff_score": 0.0, "temporal_consistency": 1.0}
+    differences = stack_differences(np.stack([f["thumbnail"] for f in frames]))
+    result = temporal_consistency(differences)
+    result["analysis_time"] = 0.0
+    return result
+
+
+def artifact_analysis_from_features(frames: List[Dict[str, Any]]) -> Dict[str, Any]:
+    scores = [float(f["artifact_score"]) for f in frames]
+    result = {"ai_artifact_score": float(np.mean(scores)), "individual_scores": scores, "analysis_time": 0.0}
+    tile_maps = [f.get("artifact_tiles") for f in frames]
+    if any(m is not None for m in tile_maps):
+        result["tile_scores"] = [m.tolist() if m is not None else None for m in tile_maps]
+    return result
+
+
+def animal_check_from_features(frames: List[Dict[str, Any]]) -> bool:
+    return any(is_animal_frame(int(f["face_count"]), float(f["edge_density"])) for f in frames)
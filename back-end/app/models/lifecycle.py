@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Owns the single AI model instance of a worker and its warm-up state.
+
+    States: cold -> loading -> warming -> ready (or failed). get() never
+    builds a second instance; before startup() it lazily creates the model
+    without warm-up so ad-hoc use (tests, scripts) keeps working. defer()
+    is the cold-start path: ready at once, built on the first get().
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._model = None
+        self._lock = threading.RLock()
+        self.state = "cold"
+        self.error: Optional[str] = None
+        self.load_time = 0.0
+        self.warmup_time = 0.0
+
+    def _build(self) -> Any:
+        if self._model is None:
+            deferred = self.state == "deferred"
+            self.state = "loading"
+            start = time.time()
+            try:
+                self._model = self._factory()
+            except Exception as e:
+                if deferred:
+                    self.state = "failed"
+                    self.error = str(e)
+                raise
+            self.load_time = time.time() - start
+            self.state = "ready" if deferred else "loaded"
+        return self._model
+
+    def get(self) -> Any:
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            return self._build()
+
+    def startup(self, warm_up: Optional[Callable[[Any], None]] = None) -> None:
+        """Build the model once and run the warm-up pass; readiness flips only after warm-up.
+
+        A no-op once ready, so forked workers of a preloaded parent (app.launcher) do not
+        warm up again and keep sharing the parent's pages.
+        """
+        with self._lock:
+            if self.state == "ready" and self._model is not None:
+                return
+            try:
+                model = self._build()
+                if warm_up is not None:
+                    self.state = "warming"
+                    start = time.time()
+                    warm_up(model)
+                    self.warmup_time = time.time() - start
+                self.state = "ready"
+                logger.info(f"Model ready (load {self.load_time:.3f}s, warm-up {self.warmup_time:.3f}s)")
+            except Exception as e:
+                self.state = "failed"
+                self.error = str(e)
+                logger.error(f"Model startup failed: {e}")
+
+    def defer(self) -> None:
+        """Report ready without building; the first get() builds the model (no warm-up)."""
+        with self._lock:
+            if self._model is None:
+                self.state = "deferred"
+                logger.info("Model load deferred to first request")
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state in ("ready", "deferred")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "ready": self.is_ready,
+            "model_loaded": self.is_loaded,
+            "load_time": round(self.load_time, 4),
+            "warmup_time": round(self.warmup_time, 4),
+            "error": self.error,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._model is not None:
+                try:
+                    self._model.cleanup()
+                except Exception:
+                    pass
+            self.reset()
+
+    def reset(self) -> None:
+        """Forget the current instance (next get() builds a fresh one)."""
+        with self._lock:
+            self._model = None
+            self.state = "cold"
+            self.error = None
+            self.load_time = 0.0
+            self.warmup_time = 0.0
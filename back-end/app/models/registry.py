@@ -0,0 +1,311 @@
+import threading
+from typing import List, Dict, Any, Optional, Callable, Iterable
+
+from app.config import Config
+
+
+class ProductSpec:
+    """Shared intermediate (gray frames, edge maps, faces, ...) computed once per request."""
+
+    def __init__(self, name: str, inputs: Iterable[str] = (), cost: float = 1.0):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.cost = cost
+
+
+class StageSpec:
+    """Detector stage: declared inputs, relative cost and how its result feeds the score."""
+
+    def __init__(self, name: str, run: Callable[[Any, "AnalysisContext"], Any],
+                 inputs: Iterable[str] = (), cost: float = 1.0, weight: float = 0.0,
+                 score: Optional[Callable[[Any], float]] = None, neutral_score: float = 0.0,
+                 detail_key: Optional[str] = None, skipped_result: Any = None,
+                 frame_features: Iterable[str] = (),
+                 from_features: Optional[Callable[[List[Dict[str, Any]]], Any]] = None):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.cost = cost
+        self.weight = weight
+        self.score = score or (lambda result: neutral_score)
+        self.neutral_score = neutral_score
+        self.detail_key = detail_key or name
+        self.skipped_result = skipped_result
+        # Per-frame feature keys from which from_features() rebuilds the result without the frames
+        self.frame_features = tuple(frame_features)
+        self.from_features = from_features
+
+
+class AnalysisCancelled(Exception):
+    """Raised inside the pipeline once the request's cancellation token fires."""
+
+
+class CancellationToken:
+    """Thread-safe flag checked by the executor and detectors between stages and frames."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise AnalysisCancelled(self.reason or "cancelled")
+
+
+class AnalysisContext:
+    """Per-request state shared between stages: frames, options and memoized products."""
+
+    def __init__(self, model: Any, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                 cancel_token: Optional[CancellationToken] = None):
+        self.model = model
+        self.images = images
+        self.options = options or {}
+        self.cancel_token = cancel_token
+        self._products: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self._buffers: List[Any] = []
+
+    def product(self, name: str) -> Any:
+        """Return a shared product, computing it on first use (None if the model has no provider)."""
+        if name in self._products:
+            return self._products[name]
+        with self._guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._products:
+                compute = getattr(self.model, "compute_product", None)
+                self._products[name] = compute(name, self) if compute is not None else None
+        return self._products[name]
+
+    def has_product(self, name: str) -> bool:
+        return name in self._products
+
+    def buffer(self, shape: tuple, dtype: Any = None) -> Any:
+        """Array for a product, from the model's product_pool when it has one; returned by release()."""
+        import numpy as np
+
+        dtype = dtype or np.uint8
+        pool = getattr(self.model, "product_pool", None)
+        if pool is None:
+            return np.empty(shape, dtype=dtype)
+        buffer = pool.acquire(shape, dtype)
+        with self._guard:
+            self._buffers.append(buffer)
+        return buffer
+
+    def release(self) -> None:
+        """Hand the product buffers back once nothing reads the products any more."""
+        with self._guard:
+            buffers, self._buffers = self._buffers, []
+            self._products.clear()
+        pool = getattr(self.model, "product_pool", None)
+        if pool is not None and buffers:
+            pool.release(buffers)
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+
+class DetectorRegistry:
+    def __init__(self):
+        self.products: Dict[str, ProductSpec] = {}
+        self.stages: Dict[str, StageSpec] = {}
+
+    def register_product(self, spec: ProductSpec) -> ProductSpec:
+        self.products[spec.name] = spec
+        return spec
+
+    def register_stage(self, spec: StageSpec) -> StageSpec:
+        if spec.name in self.products:
+            raise ValueError(f"Stage name '{spec.name}' collides with a product")
+        self.stages[spec.name] = spec
+        return spec
+
+    def stage_weights(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+        """Effective weights: spec default < Config.STAGE_WEIGHTS < execution profile override."""
+        overrides = (options or {}).get("stage_weights") or {}
+        weights = {}
+        for name, spec in self.stages.items():
+            weight = Config.STAGE_WEIGHTS.get(name, spec.weight)
+            weights[name] = float(overrides.get(name, weight))
+        return weights
+
+    def active_stages(self, options: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Stages enabled by the execution profile that carry a non-zero weight."""
+        options = options or {}
+        enabled = options.get("stages")
+        weights = self.stage_weights(options)
+        return [
+            name for name in self.stages
+            if (enabled is None or name in enabled) and weights[name] > 0
+        ]
+
+    def dependencies(self, node: str) -> tuple:
+        if node in self.stages:
+            return self.stages[node].inputs
+        if node in self.products:
+            return self.products[node].inputs
+        raise KeyError(f"Unknown detector node '{node}'")
+
+    def cost(self, node: str) -> float:
+        spec = self.stages.get(node) or self.products.get(node)
+        return spec.cost if spec is not None else 1.0
+
+    def build_graph(self, stage_names: Iterable[str]) -> Dict[str, tuple]:
+        """Dependency graph (node -> inputs) covering the given stages and the products they need."""
+        graph: Dict[str, tuple] = {}
+        pending = list(stage_names)
+        while pending:
+            node = pending.pop()
+            if node in graph:
+                continue
+            deps = self.dependencies(node)
+            graph[node] = deps
+            pending.extend(deps)
+        # Reject cycles early rather than hanging the executor
+        visiting, done = set(), set()
+
+        def visit(n):
+            if n in done:
+                return
+            if n in visiting:
+                raise ValueError(f"Detector dependency cycle through '{n}'")
+            visiting.add(n)
+            for d in graph[n]:
+                visit(d)
+            visiting.discard(n)
+            done.add(n)
+
+        for n in graph:
+            visit(n)
+        return graph
+
+    def frame_feature_keys(self, options: Optional[Dict[str, Any]] = None) -> Optional[set]:
+        """Per-frame features needed to rebuild all active stages, or None if some stage cannot be rebuilt."""
+        keys = set()
+        for name in self.active_stages(options):
+            spec = self.stages[name]
+            if spec.from_features is None:
+                return None
+            keys.update(spec.frame_features)
+        return keys
+
+    def results_from_features(self, frames: List[Dict[str, Any]],
+                              options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Stage results computed from stored per-frame features instead of decoded frames."""
+        return {name: self.stages[name].from_features(frames) for name in self.active_stages(options)}
+
+    def score(self, results: Dict[str, Any], options: Optional[Dict[str, Any]] = None) -> float:
+        """Weighted AI probability over all weighted stages; stages that did not run count as neutral."""
+        weights = self.stage_weights(options)
+        total_weight = sum(w for w in weights.values() if w > 0)
+        if total_weight <= 0:
+            return 0.0
+        probability = 0.0
+        for name, weight in weights.items():
+            if weight <= 0:
+                continue
+            spec = self.stages[name]
+            value = spec.score(results[name]) if name in results else spec.neutral_score
+            probability += weight * value
+        probability /= total_weight
+        return min(max(probability, 0.0), 1.0)
+
+
+def _face_score(result: Dict[str, Any]) -> float:
+    return 1.0 - result.get("face_consistency", 0.5)
+
+
+def _temporal_score(result: Dict[str, Any]) -> float:
+    return result.get("temporal_consistency", 0.5)
+
+
+def _artifact_score(result: Dict[str, Any]) -> float:
+    return result.get("ai_artifact_score", 0.0)
+
+
+def _animal_score(is_animal: bool) -> float:
+    return 0.0 if is_animal else 1.0
+
+
+def _pattern_score(result: Dict[str, Any]) -> float:
+    return min(result.get("pattern_score", 0.0) * 10.0, 1.0)
+
+
+def _texture_score(result: Dict[str, Any]) -> float:
+    return result.get("texture_uniformity", 0.0)
+
+
+def _from_features(name: str) -> Callable[[List[Dict[str, Any]]], Any]:
+    """app.models.features rebuilder, imported on first use so NumPy stays off the import path"""
+    def rebuild(frames: List[Dict[str, Any]]) -> Any:
+        from app.models import features
+
+        return getattr(features, name)(frames)
+    return rebuild
+
+
+def register_builtin_detectors(registry: DetectorRegistry) -> DetectorRegistry:
+    registry.register_product(ProductSpec("gray", cost=0.2))
+    registry.register_product(ProductSpec("thumbnails", cost=0.2))
+    registry.register_product(ProductSpec("edges", inputs=("gray",), cost=0.5))
+    registry.register_product(ProductSpec("faces", inputs=("gray",), cost=3.0))
+
+    registry.register_stage(StageSpec(
+        "face_analysis",
+        run=lambda model, ctx: model.analyze_face_consistency(ctx.images, ctx.options, context=ctx),
+        inputs=("faces",), cost=0.1, weight=0.25,
+        score=_face_score, neutral_score=0.5,
+        skipped_result={"skipped": True},
+        frame_features=("face_count",), from_features=_from_features("face_analysis_from_features"),
+    ))
+    registry.register_stage(StageSpec(
+        "frame_analysis",
+        run=lambda model, ctx: model.analyze_frame_differences(ctx.images, ctx.options, context=ctx),
+        inputs=("thumbnails",), cost=0.3, weight=0.30,
+        score=_temporal_score, neutral_score=0.5,
+        skipped_result={"skipped": True},
+        frame_features=("thumbnail",), from_features=_from_features("frame_analysis_from_features"),
+    ))
+    registry.register_stage(StageSpec(
+        "artifact_analysis",
+        run=lambda model, ctx: model.detect_ai_artifacts(ctx.images, ctx.options, context=ctx),
+        inputs=("gray", "edges"), cost=1.0, weight=0.35,
+        score=_artifact_score, neutral_score=0.0,
+        skipped_result={"skipped": True},
+        frame_features=("artifact_score",), from_features=_from_features("artifact_analysis_from_features"),
+    ))
+    registry.register_stage(StageSpec(
+        "animal_check",
+        run=lambda model, ctx: model.is_animal_content(ctx.images, ctx.options, context=ctx),
+        inputs=("faces", "edges"), cost=0.1, weight=0.10,
+        score=_animal_score, neutral_score=1.0,
+        detail_key="is_animal_content", skipped_result=False,
+        frame_features=("face_count", "edge_density"), from_features=_from_features("animal_check_from_features"),
+    ))
+    registry.register_stage(StageSpec(
+        "pattern_analysis",
+        run=lambda model, ctx: model.analyze_repetitive_patterns(ctx.images, ctx.options, context=ctx),
+        inputs=("gray",), cost=1.5, weight=0.0,
+        score=_pattern_score, neutral_score=0.0,
+    ))
+    registry.register_stage(StageSpec(
+        "texture_analysis",
+        run=lambda model, ctx: model.analyze_texture_patterns(ctx.images, ctx.options, context=ctx),
+        inputs=("gray",), cost=2.0, weight=0.0,
+        score=_texture_score, neutral_score=0.0,
+    ))
+    return registry
+
+
+default_registry = register_builtin_detectors(DetectorRegistry())
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+from app.config import Config
+from app.models.ai_adapter import AIModelInterface
+from app.models.registry import default_registry
+
+DISTRIBUTIONS = ("fixed", "lognormal", "trace")
+MODES = ("sleep", "cpu")
+
+# Cancellation is checked at least this often while spending simulated time
+_SLICE_SECONDS = 0.01
+_BURN_BLOCK = b"\0" * 65536
+
+
+def load_trace(path: str) -> Dict[str, List[float]]:
+    """Per-node durations (seconds) from recorded profiles.
+
+    Accepts /api/debug/profiles/{id} dumps ({"stages": [{"stage", "duration"}, ...]}),
+    a JSON list of them, or JSONL with one profile or stage entry per line.
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        documents = [json.loads(text)]
+    except ValueError:
+        documents = [json.loads(line) for line in text.splitlines() if line.strip()]
+    samples: Dict[str, List[float]] = {}
+
+    def collect(item: Any) -> None:
+        if isinstance(item, list):
+            for entry in item:
+                collect(entry)
+        elif isinstance(item, dict):
+            if "stages" in item:
+                collect(item["stages"])
+            elif "stage" in item and "duration" in item:
+                samples.setdefault(item["stage"], []).append(float(item["duration"]))
+
+    collect(documents)
+    if not samples:
+        raise ValueError(f"No stage durations found in trace {path}")
+    return samples
+
+
+class LatencyModel:
+    """Samples per-node latency (seconds) for a reference-size request.
+
+    fixed/lognormal scale the median by the node's registry cost relative to
+    artifact_analysis; trace draws from recorded durations of the same node.
+    """
+
+    def __init__(self, distribution: str = "lognormal", median_ms: float = 20.0, sigma: float = 0.5,
+                 trace: Optional[Dict[str, List[float]]] = None, seed: Optional[int] = None):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}' (available: {', '.join(DISTRIBUTIONS)})")
+        if distribution == "trace" and not trace:
+            raise ValueError("The trace distribution needs recorded durations")
+        self.distribution = distribution
+        self.median = median_ms / 1000.0
+        self.sigma = sigma
+        self.trace = trace or {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._reference_cost = default_registry.cost("artifact_analysis")
+
+    def median_for(self, node: str) -> float:
+        return self.median * default_registry.cost(node) / self._reference_cost
+
+    def sample(self, node: str) -> float:
+        with self._lock:
+            if self.distribution == "trace" and node in self.trace:
+                return self._rng.choice(self.trace[node])
+            if self.distribution == "lognormal":
+                median = self.median_for(node)
+                return self._rng.lognormvariate(math.log(median), self.sigma) if median > 0 else 0.0
+            # fixed, or a node the trace never recorded
+            return self.median_for(node)
+
+
+class SimulatedAIModelAdapter(AIModelInterface):
+    """Stand-in model that only spends time: mock-like results, sampled per-stage latency.
+
+    Latency scales with frame count and frame area relative to SIM_REFERENCE_FRAMES /
+    SIM_REFERENCE_PIXELS. mode="sleep" idles (I/O-like), mode="cpu" burns a core with a
+    GIL-releasing hash loop like OpenCV would.
+    """
+
+    def __init__(self, latency: Optional[LatencyModel] = None, mode: str = "sleep"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown simulation mode '{mode}' (available: {', '.join(MODES)})")
+        self.latency = latency or LatencyModel()
+        self.mode = mode
+        self.spent: Dict[str, float] = {}
+
+    @classmethod
+    def from_config(cls) -> "SimulatedAIModelAdapter":
+        trace = load_trace(Config.SIM_LATENCY_TRACE) if Config.SIM_LATENCY_TRACE else None
+        distribution = Config.SIM_LATENCY_DISTRIBUTION
+        latency = LatencyModel(distribution, Config.SIM_LATENCY_MEDIAN_MS, Config.SIM_LATENCY_SIGMA,
+                               trace=trace, seed=Config.SIM_SEED)
+        return cls(latency, Config.SIM_LATENCY_MODE)
+
+    @staticmethod
+    def scale(images: Any) -> float:
+        """Cost multiplier for this request's frame count and frame size"""
+        n = len(images)
+        if n == 0:
+            return 0.0
+        shape = getattr(images[0], "shape", None)
+        pixels = shape[0] * shape[1] if shape is not None and len(shape) >= 2 else Config.SIM_REFERENCE_PIXELS
+        return (n / float(Config.SIM_REFERENCE_FRAMES)) * (pixels / float(Config.SIM_REFERENCE_PIXELS))
+
+    def _spend(self, node: str, images: Any, context: Any) -> float:
+        seconds = self.latency.sample(node) * self.scale(images)
+        deadline = time.perf_counter() + seconds
+        while True:
+            if context is not None:
+                context.raise_if_cancelled()
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            if self.mode == "sleep":
+                time.sleep(min(remaining, _SLICE_SECONDS))
+            else:
+                stop = time.perf_counter() + min(remaining, _SLICE_SECONDS)
+                while time.perf_counter() < stop:
+                    hashlib.sha256(_BURN_BLOCK).digest()
+        self.spent[node] = self.spent.get(node, 0.0) + seconds
+        return seconds
+
+    def compute_product(self, name: str, context: Any) -> Any:
+        # Products cost time like in production but carry no data; stages do not need them
+        self._spend(name, context.images, context)
+        return None
+
+    def analyze_face_consistency(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                 context: Any = None) -> Dict[str, Any]:
+        spent = self._spend("face_analysis", images, context)
+        return {"face_consistency": 0.8, "face_count": [1] * len(images), "analysis_time": spent}
+
+    def analyze_frame_differences(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                  context: Any = None) -> Dict[str, Any]:
+        spent = self._spend("frame_analysis", images, context)
+        return {"frame_diff_score": 15.0, "temporal_consistency": 0.85, "analysis_time": spent}
+
+    def detect_ai_artifacts(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                            context: Any = None) -> Dict[str, Any]:
+        spent = self._spend("artifact_analysis", images, context)
+        return {"ai_artifact_score": 0.3, "individual_scores": [0.3] * len(images), "analysis_time": spent}
+
+    def is_animal_content(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                          context: Any = None) -> bool:
+        self._spend("animal_check", images, context)
+        return False
+
+    def analyze_repetitive_patterns(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                    context: Any = None) -> Dict[str, Any]:
+        spent = self._spend("pattern_analysis", images, context)
+        return {"pattern_score": 0.0, "individual_scores": [0.0] * len(images), "analysis_time": spent}
+
+    def analyze_texture_patterns(self, images: List[Any], options: Optional[Dict[str, Any]] = None,
+                                 context: Any = None) -> Dict[str, Any]:
+        spent = self._spend("texture_analysis", images, context)
+        return {"texture_uniformity": 0.0, "individual_scores": [0.0] * len(images), "analysis_time": spent}
@@ -0,0 +1,213 @@
+"""Replay captured /api/analyze traffic (CAPTURE_PATH) against a build and compare versions.
+
+    python -m app.replay capture.db --target http://localhost:8000 --speed 4 --out new.json
+    python -m app.replay capture.db --in-process --speed 0            # drive main.app directly
+    python -m app.replay capture.db --target ... --baseline old.json  # compare two replays
+
+Requests are re-sent in capture order at the original inter-arrival times
+divided by --speed (0 = as fast as --concurrency allows). Without --baseline
+the run is compared with what the capturing server recorded. Latencies are
+the server-side total_processing_time, so they compare like for like with the
+capture. Run the target without RESULT_STORE_PATH, or replays are cache hits,
+and with ADMISSION_RATE=0 when accelerating: a replay otherwise exceeds the
+per-client rate limit.
+
+Each captured client is replayed under its own X-API-Key, which the target
+only honours when it is configured; otherwise every replayed request shares
+the replaying host's address bucket. --in-process configures them itself;
+for --target start the server with
+
+    ADMISSION_API_KEYS=$(python -m app.replay capture.db --print-keys) python main.py
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import List, Dict, Any, Optional
+
+from app.utils.traffic_capture import TrafficCapture
+
+
+def load_requests(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    capture = TrafficCapture(path)
+    try:
+        return list(capture.iter_requests(limit))
+    finally:
+        capture.close()
+
+
+def arrival_offsets(requests: List[Dict[str, Any]], speed: float) -> List[float]:
+    """Seconds after replay start at which each request is sent"""
+    if not requests or speed <= 0:
+        return [0.0] * len(requests)
+    first = requests[0]["captured_at"]
+    return [max(0.0, (r["captured_at"] - first) / speed) for r in requests]
+
+
+def summarize_result(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The verdict fields compared between versions"""
+    if result is None:
+        return None
+    return {
+        "ai_probability": result.get("ai_probability"),
+        "is_ai_generated": result.get("is_ai_generated"),
+        "confidence_level": result.get("confidence_level"),
+        "cached": result.get("cached", False),
+    }
+
+
+def captured_outcomes(requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Outcomes as recorded by the server that served the captured traffic"""
+    return [{"seq": r["seq"], "status_code": r["status_code"], "latency": r["latency"],
+             "result": summarize_result(r["result"])} for r in requests]
+
+
+def replay_key(request: Dict[str, Any]) -> Optional[str]:
+    """X-API-Key a captured request is replayed under (None when it had no client)"""
+    return f"replay-{request['client']}" if request.get("client") else None
+
+
+def replay_keys(requests: List[Dict[str, Any]]) -> List[str]:
+    """Distinct replay keys, for the target's ADMISSION_API_KEYS"""
+    return sorted({key for key in map(replay_key, requests) if key})
+
+
+async def replay(requests: List[Dict[str, Any]], client: Any, speed: float = 1.0,
+                 concurrency: int = 64) -> List[Dict[str, Any]]:
+    """Re-send captured requests through an httpx.AsyncClient; one outcome per request, in capture order"""
+    offsets = arrival_offsets(requests, speed)
+    slots = asyncio.Semaphore(max(1, concurrency))
+    start = time.perf_counter()
+
+    async def send(request: Dict[str, Any], offset: float) -> Dict[str, Any]:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        params = {k: request[k] for k in ("profile", "video_id") if request.get(k)}
+        # Keep captured clients apart so admission fairness behaves as it did live
+        key = replay_key(request)
+        headers = {"X-API-Key": key} if key else {}
+        files = [("files", (name, blob, content_type)) for name, blob, content_type
+                 in zip(request["names"], request["frames"], request["content_types"])]
+        outcome: Dict[str, Any] = {"seq": request["seq"], "offset": offset}
+        async with slots:
+            sent = time.perf_counter()
+            try:
+                response = await client.post(request["endpoint"], params=params, headers=headers, files=files)
+            except Exception as e:
+                outcome.update(status_code=0, error=str(e), latency=None, client_latency=None, result=None)
+                return outcome
+            outcome["client_latency"] = time.perf_counter() - sent
+        body = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+        ok = response.status_code == 200
+        outcome.update(status_code=response.status_code,
+                       latency=body.get("total_processing_time", outcome["client_latency"]) if ok else None,
+                       result=summarize_result(body) if ok else None)
+        return outcome
+
+    return list(await asyncio.gather(*(send(r, o) for r, o in zip(requests, offsets))))
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {"mean": sum(ordered) / len(ordered), "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99),
+            "max": ordered[-1]}
+
+
+def compare(baseline: List[Dict[str, Any]], candidate: List[Dict[str, Any]],
+            tolerance: float = 1e-3) -> Dict[str, Any]:
+    """Latency distribution and verdict differences for the requests both runs have"""
+    base = {o["seq"]: o for o in baseline}
+    pairs = [(base[o["seq"]], o) for o in candidate if o["seq"] in base]
+    latency_base = [b["latency"] for b, c in pairs if b["latency"] is not None and c["latency"] is not None]
+    latency_cand = [c["latency"] for b, c in pairs if b["latency"] is not None and c["latency"] is not None]
+    both = [(c["seq"], b["result"], c["result"]) for b, c in pairs if b["result"] and c["result"]]
+    diffs = [abs(c["ai_probability"] - b["ai_probability"]) for _, b, c in both]
+    mismatches = [seq for (seq, b, c), diff in zip(both, diffs)
+                  if diff > tolerance or c["is_ai_generated"] != b["is_ai_generated"]]
+    report: Dict[str, Any] = {
+        "requests": len(pairs),
+        "errors": {"baseline": sum(1 for b, _ in pairs if b["status_code"] != 200),
+                   "candidate": sum(1 for _, c in pairs if c["status_code"] != 200)},
+        "cached": {"baseline": sum(1 for _, b, _ in both if b.get("cached")),
+                   "candidate": sum(1 for _, _, c in both if c.get("cached"))},
+        "latency": {"baseline": percentiles(latency_base), "candidate": percentiles(latency_cand)},
+        "results": {
+            "compared": len(both),
+            "verdict_changes": sum(1 for _, b, c in both if b["is_ai_generated"] != c["is_ai_generated"]),
+            "probability_max_diff": max(diffs) if diffs else 0.0,
+            "probability_mean_diff": sum(diffs) / len(diffs) if diffs else 0.0,
+            "mismatched_seqs": mismatches,
+        },
+    }
+    lat = report["latency"]
+    if lat["baseline"] and lat["candidate"]:
+        for q in ("p50", "p99"):
+            if lat["baseline"][q] > 0:
+                lat[f"{q}_ratio"] = lat["candidate"][q] / lat["baseline"][q]
+    return report
+
+
+async def _run(args, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    import httpx
+
+    if args.in_process:
+        from main import app
+        from app.config import Config
+
+        Config.ADMISSION_API_KEYS = ",".join(filter(None, [Config.ADMISSION_API_KEYS] + replay_keys(requests)))
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+                return await replay(requests, client, args.speed, args.concurrency)
+        finally:
+            await app.router.shutdown()
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout) as client:
+        return await replay(requests, client, args.speed, args.concurrency)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured traffic and compare latency and results")
+    parser.add_argument("capture", help="Capture database written with CAPTURE_PATH")
+    parser.add_argument("--target", default="http://localhost:8000", help="Base URL of the build under test")
+    parser.add_argument("--in-process", action="store_true", help="Drive main.app in this process instead of --target")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Arrival-rate multiplier (1 = original timing, 0 = no delays)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Maximum requests in flight")
+    parser.add_argument("--limit", type=int, help="Replay only the first N captured requests")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="ai_probability difference reported as a mismatch")
+    parser.add_argument("--baseline", help="Outcomes of an earlier replay (--out) to compare against")
+    parser.add_argument("--out", help="Write this run's outcomes as JSON")
+    parser.add_argument("--print-keys", action="store_true",
+                        help="Print the replay API keys (comma-separated, for the target's ADMISSION_API_KEYS) and exit")
+    args = parser.parse_args(argv)
+
+    requests = load_requests(args.capture, args.limit)
+    if not requests:
+        sys.exit(f"No captured requests in {args.capture}")
+    if args.print_keys:
+        print(",".join(replay_keys(requests)))
+        return
+    outcomes = asyncio.run(_run(args, requests))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(outcomes, f)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    else:
+        baseline = captured_outcomes(requests)
+    print(json.dumps(compare(baseline, outcomes, args.tolerance), indent=2))
+
+
+if __name__ == "__main__":
+    main()
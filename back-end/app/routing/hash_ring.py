@@ -0,0 +1,151 @@
+import bisect
+import hashlib
+import math
+import threading
+import time
+from typing import List, Dict, Optional, Iterator
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes: List[str], vnodes: int = 160):
+        self.vnodes = vnodes
+        self._keys: List[int] = []
+        self._owners: List[str] = []
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            idx = bisect.bisect(self._keys, point)
+            self._keys.insert(idx, point)
+            self._owners.insert(idx, node)
+
+    def remove(self, node: str) -> None:
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        pairs = [(k, o) for k, o in zip(self._keys, self._owners) if o != node]
+        self._keys = [k for k, _ in pairs]
+        self._owners = [o for _, o in pairs]
+
+    def lookup(self, key: str) -> Optional[str]:
+        return next(self.preference_list(key), None)
+
+    def preference_list(self, key: str) -> Iterator[str]:
+        """Distinct nodes in ring order starting at the key's position."""
+        if not self._keys:
+            return
+        start = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        seen = set()
+        for offset in range(len(self._keys)):
+            owner = self._owners[(start + offset) % len(self._keys)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+                if len(seen) == len(self.nodes):
+                    return
+
+
+class BackendState:
+    def __init__(self, url: str):
+        self.url = url
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.requests = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+
+class BackendPool:
+    """Backend health and load tracking on top of a HashRing.
+
+    Selection walks the key's preference list, skipping nodes marked down
+    and nodes above the bounded-load cap ceil(load_factor * average load)
+    (consistent hashing with bounded loads), so a hot videoId spills to
+    its next ring neighbour instead of overloading one node.
+    """
+
+    def __init__(self, backends: List[str], vnodes: int = 160, load_factor: float = 1.25,
+                 failure_threshold: int = 3, down_seconds: float = 10.0):
+        self.ring = HashRing(backends, vnodes)
+        self.backends: Dict[str, BackendState] = {url: BackendState(url) for url in backends}
+        self.load_factor = load_factor
+        self.failure_threshold = failure_threshold
+        self.down_seconds = down_seconds
+        self._lock = threading.Lock()
+        self._round_robin = 0
+
+    def candidates(self, key: Optional[str]) -> List[str]:
+        """Healthy backends in the order they should be tried for this key."""
+        now = time.time()
+        with self._lock:
+            if key:
+                order = list(self.ring.preference_list(key))
+            else:
+                # No routing key: spread requests evenly
+                urls = list(self.backends)
+                self._round_robin = (self._round_robin + 1) % max(len(urls), 1)
+                order = urls[self._round_robin:] + urls[:self._round_robin]
+            healthy = [u for u in order if self.backends[u].is_healthy(now)]
+            if not healthy:
+                # Everything looks down: still try in ring order rather than failing outright
+                return order
+            total = sum(self.backends[u].in_flight for u in healthy)
+            cap = max(1, math.ceil(self.load_factor * (total + 1) / len(healthy)))
+            within = [u for u in healthy if self.backends[u].in_flight < cap]
+            over = [u for u in healthy if self.backends[u].in_flight >= cap]
+            return within + over
+
+    def acquire(self, url: str) -> None:
+        with self._lock:
+            state = self.backends[url]
+            state.in_flight += 1
+            state.requests += 1
+
+    def release(self, url: str) -> None:
+        with self._lock:
+            self.backends[url].in_flight -= 1
+
+    def mark_success(self, url: str) -> None:
+        with self._lock:
+            state = self.backends[url]
+            state.consecutive_failures = 0
+            state.down_until = 0.0
+
+    def mark_failure(self, url: str) -> None:
+        with self._lock:
+            state = self.backends[url]
+            state.consecutive_failures += 1
+            if state.consecutive_failures >= self.failure_threshold:
+                state.down_until = time.time() + self.down_seconds
+
+    def mark_down(self, url: str) -> None:
+        with self._lock:
+            self.backends[url].down_until = time.time() + self.down_seconds
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "url": s.url,
+                    "healthy": s.is_healthy(now),
+                    "in_flight": s.in_flight,
+                    "requests": s.requests,
+                    "consecutive_failures": s.consecutive_failures,
+                }
+                for s in self.backends.values()
+            ]
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from typing import List, Optional, Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.config import Config
+from app.routing.hash_ring import BackendPool
+
+logger = logging.getLogger(__name__)
+
+# Hop-by-hop headers must not be forwarded by a proxy
+_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+
+def routing_key(request: Request) -> Optional[str]:
+    """videoId used for cache-locality routing (query parameter or X-Video-Id header)."""
+    return request.query_params.get("video_id") or request.headers.get("X-Video-Id")
+
+
+def create_router_app(backends: List[str], transport: Any = None,
+                      health_interval: Optional[float] = None) -> FastAPI:
+    """Routing front that consistent-hashes requests on videoId to a set of backend nodes.
+
+    HTTP only: WebSocket clients (/api/ws) connect to a node directly.
+    """
+    import httpx  # type: ignore
+
+    # Connect-phase failures: the request never reached the backend
+    _CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+    backends = [b.rstrip("/") for b in backends]
+    pool = BackendPool(
+        backends,
+        vnodes=Config.ROUTER_VNODES,
+        load_factor=Config.ROUTER_LOAD_FACTOR,
+        failure_threshold=Config.ROUTER_FAILURE_THRESHOLD,
+        down_seconds=Config.ROUTER_DOWN_SECONDS,
+    )
+    interval = Config.ROUTER_HEALTH_INTERVAL if health_interval is None else health_interval
+    app = FastAPI(title="AITUBE Router", docs_url=None, redoc_url=None)
+    app.state.pool = pool
+    app.state.client = None
+
+    async def check_health(client) -> None:
+        for url in backends:
+            try:
+                resp = await client.get(f"{url}{Config.ROUTER_HEALTH_PATH}", timeout=2.0)
+                if resp.status_code == 200 and resp.json().get("ready", True):
+                    pool.mark_success(url)
+                else:
+                    pool.mark_down(url)
+            except Exception:
+                pool.mark_down(url)
+
+    async def health_loop(client) -> None:
+        while True:
+            await check_health(client)
+            await asyncio.sleep(interval)
+
+    @app.on_event("startup")
+    async def startup():
+        app.state.client = httpx.AsyncClient(transport=transport, timeout=Config.ROUTER_TIMEOUT)
+        if interval > 0:
+            app.state.health_task = asyncio.create_task(health_loop(app.state.client))
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        task = getattr(app.state, "health_task", None)
+        if task is not None:
+            task.cancel()
+        if app.state.client is not None:
+            await app.state.client.aclose()
+
+    @app.get("/router/status")
+    async def router_status():
+        return {"backends": pool.snapshot()}
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"])
+    async def proxy(path: str, request: Request):
+        key = routing_key(request)
+        # Buffer the body once so the request can be replayed on failover
+        body = await request.body()
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in _HOP_HEADERS}
+        if request.client is not None:
+            # Backends rate-limit per client (ADMISSION_TRUST_FORWARDED), not per router
+            forwarded = request.headers.get("X-Forwarded-For")
+            headers["X-Forwarded-For"] = f"{forwarded}, {request.client.host}" if forwarded else request.client.host
+        last_error = None
+        for url in pool.candidates(key)[:Config.ROUTER_MAX_ATTEMPTS]:
+            pool.acquire(url)
+            upstream = app.state.client.build_request(
+                request.method, f"{url}/{path}", params=request.query_params,
+                headers=headers, content=body,
+            )
+            try:
+                resp = await app.state.client.send(upstream, stream=True)
+            except _CONNECT_ERRORS as e:
+                # Nothing reached the backend, so another node can safely take the request
+                pool.release(url)
+                pool.mark_failure(url)
+                last_error = e
+                logger.warning(f"Backend {url} unreachable for /{path}: {e}")
+                continue
+            except httpx.TransportError as e:
+                # The backend may already be analyzing; retrying elsewhere would run it twice
+                pool.release(url)
+                pool.mark_failure(url)
+                logger.warning(f"Backend {url} failed for /{path}: {e}")
+                status = 504 if isinstance(e, httpx.TimeoutException) else 502
+                return JSONResponse(status_code=status,
+                                    content={"error": f"Backend {url} failed: {e}", "status_code": status})
+            pool.mark_success(url)
+            out_headers = {k: v for k, v in resp.headers.items() if k.lower() not in _HOP_HEADERS}
+            out_headers["X-Routed-To"] = url
+            # Relay the body as it arrives (SSE from /analyze/stream stays incremental)
+            return StreamingResponse(relay(resp, url), status_code=resp.status_code, headers=out_headers)
+        return JSONResponse(
+            status_code=502,
+            content={"error": f"No backend available: {last_error}", "status_code": 502},
+        )
+
+    async def relay(resp, url: str):
+        try:
+            async for chunk in resp.aiter_raw():
+                yield chunk
+        finally:
+            await resp.aclose()
+            # The node stays loaded until its response has been fully relayed
+            pool.release(url)
+
+    return app
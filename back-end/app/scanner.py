@@ -0,0 +1,220 @@
+# Offline archive scanner: python -m app.scanner /data/archive --out scores.jsonl --workers 8
+# Walks a directory tree, groups images per directory and samples frames from
+# video files, analyzes each group in a process pool and appends one JSON line
+# per group. Re-running with the same --out skips groups already written, so an
+# interrupted scan resumes where it stopped.
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from typing import List, Dict, Any, Optional, Iterator, Set
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = Config.ALLOWED_EXTENSIONS
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.mkv', '.webm', '.avi', '.m4v'}
+
+# Per-process state built once by the pool initializer
+_worker: Dict[str, Any] = {}
+
+
+def spaced_indices(total: int, count: int) -> List[int]:
+    """`count` evenly spaced indices into a sequence of length `total` (all of them if shorter)"""
+    if total <= count:
+        return list(range(total))
+    step = total / float(count)
+    return [int(i * step + step / 2) for i in range(count)]
+
+
+def discover_groups(root: str, frames_per_group: int) -> Iterator[Dict[str, Any]]:
+    """Yield {"key", "kind", "paths"}: one group per image directory and one per video file."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        images = []
+        for name in sorted(filenames):
+            ext = os.path.splitext(name)[1].lower()
+            path = os.path.join(dirpath, name)
+            if ext in VIDEO_EXTENSIONS:
+                yield {"key": os.path.relpath(path, root), "kind": "video", "paths": [path]}
+            elif ext in IMAGE_EXTENSIONS:
+                images.append(path)
+        if images:
+            yield {
+                "key": os.path.relpath(dirpath, root),
+                "kind": "images",
+                "paths": [images[i] for i in spaced_indices(len(images), frames_per_group)],
+            }
+
+
+def sample_video_frames(path: str, count: int) -> List[Any]:
+    """Decode `count` evenly spaced RGB frames from a video file"""
+    import cv2  # type: ignore
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {path}")
+    try:
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        frames = []
+        if total > 0:
+            for index in spaced_indices(total, count):
+                capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+                ok, frame = capture.read()
+                if ok:
+                    frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        else:
+            # Unknown length (some containers): take the first frames
+            while len(frames) < count:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    finally:
+        capture.release()
+    if not frames:
+        raise ValueError(f"No decodable frames in video: {path}")
+    return frames
+
+
+def load_checkpoint(out_path: str) -> Set[str]:
+    """Keys already written to the output; a torn last line from a crash is dropped."""
+    done: Set[str] = set()
+    if not os.path.exists(out_path):
+        return done
+    valid_bytes = 0
+    with open(out_path, "rb") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["key"])
+                valid_bytes += len(line)
+            except (ValueError, KeyError):
+                break
+    if valid_bytes < os.path.getsize(out_path):
+        with open(out_path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return done
+
+
+def _init_worker(profile: Optional[str], use_real: bool, store_path: Optional[str]) -> None:
+    from app.launcher import configure_thread_env
+
+    # One process per core; keep each one single-threaded. Spawned workers have not
+    # imported NumPy/OpenCV yet, so the BLAS/OpenMP pool sizes still apply here.
+    configure_thread_env(1)
+    import cv2  # type: ignore
+
+    cv2.setNumThreads(1)
+    if store_path:
+        Config.RESULT_STORE_PATH = store_path
+    from app.models.ai_adapter import create_ai_model
+    from app.utils.result_store import get_result_store
+
+    _worker["model"] = create_ai_model(use_real=use_real)
+    _worker["options"] = Config.get_execution_profile(profile)
+    _worker["store"] = get_result_store() if store_path else None
+
+
+def scan_group(group: Dict[str, Any]) -> Dict[str, Any]:
+    """Analyze one group inside a pool worker; errors are reported in the record."""
+    from app.api import routes
+
+    start_time = time.time()
+    record: Dict[str, Any] = {"key": group["key"], "kind": group["kind"],
+                              "files": [os.path.basename(p) for p in group["paths"]]}
+    model, options, store = _worker["model"], _worker["options"], _worker["store"]
+    try:
+        if group["kind"] == "video":
+            images = sample_video_frames(group["paths"][0], group["frames"])
+            result, _ = routes.analyze_decoded(model, images, options)
+        else:
+            blobs = []
+            for path in group["paths"]:
+                with open(path, "rb") as f:
+                    blobs.append(f.read())
+            # Same path as the batch API, so --store results are keyed like uploads of these files
+            result = routes.analyze_group(model, store, group["key"], blobs, record["files"], options)
+        record.update(status="ok", ai_probability=result["ai_probability"],
+                      is_ai_generated=result["is_ai_generated"], result=result)
+    except Exception as e:
+        detail = getattr(e, "detail", None) or str(e)
+        record.update(status="error", error=detail)
+    record["processing_time"] = round(time.time() - start_time, 4)
+    return record
+
+
+def scan(root: str, out_path: str, workers: Optional[int] = None, profile: Optional[str] = None,
+         frames_per_group: int = 3, use_real: bool = True, store_path: Optional[str] = None,
+         limit: Optional[int] = None) -> Dict[str, int]:
+    """Scan `root` into the JSONL file `out_path`, skipping groups it already contains"""
+    done = load_checkpoint(out_path)
+    stats = {"skipped": len(done), "ok": 0, "error": 0}
+    pending = (g for g in discover_groups(root, frames_per_group) if g["key"] not in done)
+    if limit:
+        pending = itertools.islice(pending, limit)
+    first = next(pending, None)
+    if first is None:
+        return stats
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    # At most this many groups are queued or in flight, so memory stays flat on huge trees
+    window = workers * 4
+    with open(out_path, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                initializer=_init_worker, initargs=(profile, use_real, store_path)) as pool:
+
+        def write(futures) -> None:
+            for future in futures:
+                record = future.result()
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                stats[record["status"]] += 1
+                if (stats["ok"] + stats["error"]) % 100 == 0:
+                    logger.info(f"Scanned {stats['ok'] + stats['error']} groups")
+
+        running = set()
+        for group in itertools.chain([first], pending):
+            group["frames"] = frames_per_group
+            if len(running) >= window:
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                write(finished)
+            running.add(pool.submit(scan_group, group))
+        write(as_completed(running))
+    return stats
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Score a directory tree of images/videos into JSONL")
+    parser.add_argument("root", help="Directory to scan")
+    parser.add_argument("--out", required=True, help="JSONL output; existing entries are skipped (resume)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--profile", default=None, help="Execution profile (fast|balanced|standard|thorough)")
+    parser.add_argument("--frames", type=int, default=3, help="Frames per image directory / video")
+    parser.add_argument("--store", default=None,
+                        help="Also write image-group results to this result store (warms the API cache)")
+    parser.add_argument("--mock", action="store_true", help="Use the mock model (pipeline testing)")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many new groups")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=Config.LOG_LEVEL,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not os.path.isdir(args.root):
+        sys.exit(f"Not a directory: {args.root}")
+    if not 1 <= args.frames <= 5:
+        sys.exit("--frames must be between 1 and 5")
+    Config.get_execution_profile(args.profile)  # fail fast on unknown profiles
+    start = time.time()
+    stats = scan(args.root, args.out, args.workers, args.profile, args.frames,
+                 use_real=not args.mock, store_path=args.store, limit=args.limit)
+    logger.info(f"Done in {time.time() - start:.1f}s: {stats['ok']} ok, {stats['error']} errors, "
+                f"{stats['skipped']} already scanned")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# Offline weight/threshold tuning without re-running the detectors:
+#
+#   python -m app.tuning build scores.jsonl --labels labels.csv --out stages.npz
+#   python -m app.tuning evaluate stages.npz --weights face_analysis=0.3,artifact_analysis=0.5 --sweep
+#
+# `build` turns analysis results (scanner JSONL) into a columnar table of per-stage
+# score components; `evaluate` recomputes probabilities, the confusion matrix and a
+# threshold sweep for the whole table with a few NumPy operations (no OpenCV).
+import argparse
+import csv
+import json
+import sys
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+
+from app.config import Config, _parse_weights
+from app.models.registry import DetectorRegistry, default_registry
+
+UNLABELED = -1
+
+
+class StageTable:
+    """Columnar per-item stage scores: scores/ran are (items, stages), labels 1 = AI, 0 = real, -1 = unknown."""
+
+    def __init__(self, keys: np.ndarray, stages: List[str], scores: np.ndarray, ran: np.ndarray,
+                 labels: np.ndarray):
+        self.keys = keys
+        self.stages = list(stages)
+        self.scores = scores
+        self.ran = ran
+        self.labels = labels
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_results(cls, items: Iterable[Dict[str, Any]], labels: Optional[Dict[str, int]] = None,
+                     registry: Optional[DetectorRegistry] = None) -> "StageTable":
+        """Build from {"key", "result"} records (e.g. app.scanner output); failed items are skipped."""
+        registry = registry or default_registry
+        stages = list(registry.stages)
+        labels = labels or {}
+        keys, rows, ran_rows, label_col = [], [], [], []
+        for item in items:
+            result = item.get("result")
+            if item.get("status", "ok") != "ok" or not result:
+                continue
+            details = result.get("analysis_details", {})
+            skipped = set(details.get("skipped_stages", []))
+            row, ran_row = [], []
+            for name in stages:
+                spec = registry.stages[name]
+                ran = name not in skipped and spec.detail_key in details
+                row.append(spec.score(details[spec.detail_key]) if ran else spec.neutral_score)
+                ran_row.append(ran)
+            keys.append(item["key"])
+            rows.append(row)
+            ran_rows.append(ran_row)
+            label_col.append(labels.get(item["key"], item.get("label", UNLABELED)))
+        return cls(
+            np.array(keys, dtype=str),
+            stages,
+            np.array(rows, dtype=np.float32).reshape(len(keys), len(stages)),
+            np.array(ran_rows, dtype=bool).reshape(len(keys), len(stages)),
+            np.array(label_col, dtype=np.int8),
+        )
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, keys=self.keys, stages=np.array(self.stages, dtype=str),
+                            scores=self.scores, ran=self.ran, labels=self.labels)
+
+    @classmethod
+    def load(cls, path: str) -> "StageTable":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["keys"], [str(s) for s in data["stages"]], data["scores"], data["ran"],
+                       data["labels"])
+
+
+def probabilities(table: StageTable, weights: Optional[Dict[str, float]] = None,
+                  registry: Optional[DetectorRegistry] = None) -> np.ndarray:
+    """Vectorized DetectorRegistry.score over every row; weights override the configured ones.
+
+    Raises ValueError when `weights` gives a positive weight to a stage that ran in no
+    row (zero-weight and profile-disabled stages are skipped at analysis time and stored
+    as their neutral score, so re-weighting them would measure nothing).
+    """
+    registry = registry or default_registry
+    weights = weights or {}
+    never_ran = [name for i, name in enumerate(table.stages)
+                 if weights.get(name, 0.0) > 0 and len(table) and not table.ran[:, i].any()]
+    if never_ran:
+        raise ValueError(f"Stages {', '.join(never_ran)} did not run for any item in this table; "
+                         f"rebuild it from results of a profile and STAGE_WEIGHTS that run them")
+    effective = registry.stage_weights({"stage_weights": weights})
+    w = np.array([max(effective.get(name, 0.0), 0.0) for name in table.stages], dtype=np.float64)
+    total = w.sum()
+    if total <= 0:
+        return np.zeros(len(table))
+    neutral = np.array([registry.stages[name].neutral_score if name in registry.stages else 0.0
+                        for name in table.stages], dtype=np.float64)
+    values = np.where(table.ran, table.scores, neutral)
+    return np.clip(values @ w / total, 0.0, 1.0)
+
+
+def confusion_matrix(probs: np.ndarray, labels: np.ndarray,
+                     threshold: Optional[float] = None) -> Dict[str, Any]:
+    """Counts and rates over labeled rows; positive means is_ai_generated (probability > threshold)."""
+    threshold = Config.AI_DETECTION_THRESHOLD if threshold is None else threshold
+    labeled = labels >= 0
+    predicted = probs[labeled] > threshold
+    actual = labels[labeled] == 1
+    tp = int(np.sum(predicted & actual))
+    fp = int(np.sum(predicted & ~actual))
+    fn = int(np.sum(~predicted & actual))
+    tn = int(np.sum(~predicted & ~actual))
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "threshold": threshold,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "accuracy": (tp + tn) / max(tp + fp + fn + tn, 1),
+    }
+
+
+def threshold_sweep(probs: np.ndarray, labels: np.ndarray,
+                    thresholds: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Confusion counts for many thresholds at once: (thresholds, labeled items) comparison."""
+    thresholds = np.linspace(0.0, 1.0, 101) if thresholds is None else np.asarray(thresholds)
+    labeled = labels >= 0
+    actual = labels[labeled] == 1
+    predicted = probs[labeled][None, :] > thresholds[:, None]
+    tp = (predicted & actual).sum(axis=1)
+    fp = (predicted & ~actual).sum(axis=1)
+    fn = actual.sum() - tp
+    tn = (~actual).sum() - fp
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {"threshold": thresholds, "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+            "precision": precision, "recall": recall, "f1": f1}
+
+
+def read_labels(path: str) -> Dict[str, int]:
+    """CSV rows of key,label where label is 1/ai/fake or 0/real"""
+    labels = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or row[0] == "key":
+                continue
+            labels[row[0]] = 1 if row[1].strip().lower() in ("1", "ai", "fake", "true") else 0
+    return labels
+
+
+def read_jsonl(path: str) -> Iterable[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Re-score stored stage outputs for weight/threshold tuning")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build a columnar stage table from analysis JSONL")
+    build.add_argument("jsonl", help="app.scanner output (one {key, result} record per line)")
+    build.add_argument("--labels", default=None, help="CSV of key,label (1/ai/fake or 0/real)")
+    build.add_argument("--out", required=True, help="Output .npz table")
+    evaluate = sub.add_parser("evaluate", help="Recompute probabilities and metrics for a table")
+    evaluate.add_argument("table", help=".npz table from 'build'")
+    evaluate.add_argument("--weights", default="", help="Stage weight overrides: name=w,name=w")
+    evaluate.add_argument("--threshold", type=float, default=None,
+                          help="Decision threshold (default: AI_DETECTION_THRESHOLD)")
+    evaluate.add_argument("--sweep", action="store_true", help="Print precision/recall/F1 per threshold")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        labels = read_labels(args.labels) if args.labels else None
+        table = StageTable.from_results(read_jsonl(args.jsonl), labels)
+        table.save(args.out)
+        print(f"{len(table)} items, {int((table.labels >= 0).sum())} labeled -> {args.out}")
+        return
+
+    table = StageTable.load(args.table)
+    weights = _parse_weights(args.weights)
+    unknown = set(weights) - set(default_registry.stages)
+    if unknown:
+        sys.exit(f"Unknown stages: {', '.join(sorted(unknown))}")
+    try:
+        probs = probabilities(table, weights)
+    except ValueError as e:
+        sys.exit(str(e))
+    report = {"items": len(table), "mean_probability": float(probs.mean()) if len(table) else 0.0,
+              "weights": default_registry.stage_weights({"stage_weights": weights}),
+              "confusion": confusion_matrix(probs, table.labels, args.threshold)}
+    print(json.dumps(report, indent=2))
+    if args.sweep:
+        sweep = threshold_sweep(probs, table.labels)
+        best = int(np.argmax(sweep["f1"]))
+        print("threshold  precision  recall  f1")
+        for i in range(0, len(sweep["threshold"]), 5):
+            print(f"{sweep['threshold'][i]:9.2f}  {sweep['precision'][i]:9.3f}  "
+                  f"{sweep['recall'][i]:6.3f}  {sweep['f1'][i]:.3f}")
+        print(f"best F1 {sweep['f1'][best]:.3f} at threshold {sweep['threshold'][best]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,41 @@
 import cv2
 import numpy as np
 from PIL import Image
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
 class ImageProcessor:
+    @staticmethod
+    def stack_frames(images: List[np.ndarray], max_side: Optional[int] = None) -> Union[np.ndarray, List[np.ndarray]]:
+        """Normalize RGB frames into one contiguous (N, H, W, C) uint8 stack.
+
+        Each frame's longest side is capped at max_side. Frames that then differ
+        in size are not forced to a common H×W (that would squash other aspect
+        ratios); they come back as a list of separately resized frames instead.
+        """
+        sizes = [ImageProcessor._capped_size(img.shape[:2], max_side) for img in images]
+        if any(size != sizes[0] or img.shape[2:] != images[0].shape[2:] for img, size in zip(images, sizes)):
+            return [img if img.shape[:2] == (h, w) else cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+                    for img, (h, w) in zip(images, sizes)]
+        h, w = sizes[0]
+        stack = np.empty((len(images), h, w) + images[0].shape[2:], dtype=np.uint8)
+        for i, img in enumerate(images):
+            if img.shape[:2] == (h, w):
+                stack[i] = img
+            else:
+                cv2.resize(img, (w, h), dst=stack[i], interpolation=cv2.INTER_AREA)
+        return stack
+    
+    @staticmethod
+    def _capped_size(shape: Tuple[int, int], max_side: Optional[int]) -> Tuple[int, int]:
+        h, w = shape
+        scale = max_side / float(max(h, w)) if max_side else 1.0
+        if scale < 1.0:
+            h, w = max(1, int(h * scale)), max(1, int(w * scale))
+        return h, w
+    
     @staticmethod
     def load_image(image_path: str) -> np.ndarray:
         try:
@@ -55,25 +84,31 @@ class ImageProcessor:
     @staticmethod
     def extract_texture_features(image: np.ndarray) -> np.ndarray:
         gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-        
-        # LBP (Local Binary Pattern) for texture analysis
+        return ImageProcessor.lbp_histogram(gray)
+    
+    @staticmethod
+    def lbp_histogram(gray: np.ndarray) -> np.ndarray:
+        # LBP (Local Binary Pattern) for texture analysis, vectorized over the interior pixels
         lbp = np.zeros_like(gray)
-        for i in range(1, gray.shape[0]-1):
-            for j in range(1, gray.shape[1]-1):
-                center = gray[i, j]
-                binary = 0
-                for k in range(8):
-                    x, y = i + [0, -1, -1, -1, 0, 1, 1, 1][k], j + [-1, -1, 0, 1, 1, 1, 0, -1][k]
-                    if gray[x, y] >= center:
-                        binary |= (1 << k)
-                lbp[i, j] = binary
+        if gray.shape[0] > 2 and gray.shape[1] > 2:
+            center = gray[1:-1, 1:-1]
+            h, w = gray.shape
+            code = np.zeros(center.shape, dtype=np.uint8)
+            offsets = zip([0, -1, -1, -1, 0, 1, 1, 1], [-1, -1, 0, 1, 1, 1, 0, -1])
+            for k, (dy, dx) in enumerate(offsets):
+                neighbour = gray[1 + dy:h - 1 + dy, 1 + dx:w - 1 + dx]
+                code |= (neighbour >= center).astype(np.uint8) << k
+            lbp[1:-1, 1:-1] = code
         
         return np.histogram(lbp, bins=256)[0]
     
     @staticmethod
     def detect_repetitive_patterns(image: np.ndarray) -> float:
         gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-        
+        return ImageProcessor.repetitive_pattern_score(gray)
+    
+    @staticmethod
+    def repetitive_pattern_score(gray: np.ndarray) -> float:
         # FFT to detect periodic patterns
         fft = np.fft.fft2(gray)
         fft_shift = np.fft.fftshift(fft)
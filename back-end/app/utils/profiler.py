@@ -0,0 +1,188 @@
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+from app.config import Config
+
+
+class RequestProfile:
+    """Stage timeline, CPU profile and peak memory captured for one request."""
+
+    def __init__(self, label: str = "analyze"):
+        self.profile_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.created_at = time.time()
+        self.stages: List[Dict[str, Any]] = []
+        self.metadata: Dict[str, Any] = {}
+        self.peak_memory_bytes = 0
+        self.total_time = 0.0
+        self._profiler = cProfile.Profile()
+        self._thread_profilers: List[cProfile.Profile] = []
+        self._started_tracemalloc = False
+        self._t0 = 0.0
+        self._cpu_stats: List[Dict[str, Any]] = []
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._t0 = time.perf_counter()
+        self._profiler.enable()
+
+    def stop(self) -> None:
+        self._profiler.disable()
+        self.total_time = time.perf_counter() - self._t0
+        self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        self._cpu_stats = self._collect_cpu_stats(Config.PROFILING_TOP_FUNCTIONS)
+        # Drop the raw profilers so ring entries stay small
+        self._profiler = None
+        self._thread_profilers = []
+
+    @contextmanager
+    def thread(self):
+        """CPU-profile work this request runs on another thread.
+
+        cProfile only sees the thread that enabled it, so each worker thread
+        gets its own profiler; their stats are merged into cpu_profile.
+        """
+        thread_profiler = cProfile.Profile()
+        self._thread_profilers.append(thread_profiler)
+        thread_profiler.enable()
+        try:
+            yield
+        finally:
+            thread_profiler.disable()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.stages.append({
+                "stage": name,
+                "start": round(start - self._t0, 6),
+                "duration": round(end - start, 6),
+            })
+
+    def _collect_cpu_stats(self, top_n: int) -> List[Dict[str, Any]]:
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        for thread_profiler in self._thread_profilers:
+            stats.add(thread_profiler)
+        rows = []
+        for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                "function": func,
+                "file": filename,
+                "line": line,
+                "calls": ncalls,
+                "total_time": round(tottime, 6),
+                "cumulative_time": round(cumtime, 6),
+            })
+        rows.sort(key=lambda r: r["cumulative_time"], reverse=True)
+        return rows[:top_n]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "label": self.label,
+            "created_at": self.created_at,
+            "total_time": round(self.total_time, 6),
+            "peak_memory_bytes": self.peak_memory_bytes,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.summary()
+        data["metadata"] = self.metadata
+        data["stages"] = list(self.stages)
+        data["cpu_profile"] = self._cpu_stats
+        return data
+
+
+class ProfileStore:
+    """Bounded in-memory ring of finished request profiles."""
+
+    def __init__(self, capacity: int = 32):
+        self._profiles: deque = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.profile_id == profile_id:
+                    return profile
+        return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._profiles)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore(capacity=Config.PROFILING_RING_SIZE)
+
+# cProfile and tracemalloc are process-wide, so only one request is profiled at a time
+_active_lock = threading.Lock()
+
+
+def should_profile(header_value: Optional[str]) -> bool:
+    """Decide whether the current request is profiled (header opt-in or sampling)."""
+    if not Config.PROFILING_ENABLED:
+        return False
+    if header_value and header_value.strip().lower() in ("1", "true", "yes"):
+        return True
+    return Config.PROFILING_SAMPLE_RATE > 0 and random.random() < Config.PROFILING_SAMPLE_RATE
+
+
+def begin_profile(label: str = "analyze") -> Optional[RequestProfile]:
+    """Start a profile, or return None if another request is being profiled."""
+    if not _active_lock.acquire(blocking=False):
+        return None
+    profile = RequestProfile(label)
+    profile.start()
+    return profile
+
+
+def end_profile(profile: RequestProfile) -> None:
+    try:
+        profile.stop()
+        profile_store.add(profile)
+    finally:
+        _active_lock.release()
+
+
+def call_profiled(profile: Optional[RequestProfile], fn, /, *args, **kwargs):
+    """Call fn on the current thread, CPU-profiled for the request when profile is set."""
+    if profile is None:
+        return fn(*args, **kwargs)
+    with profile.thread():
+        return fn(*args, **kwargs)
+
+
+@contextmanager
+def profile_stage(profile: Optional[RequestProfile], name: str):
+    """Record a timeline stage when profiling, no-op otherwise."""
+    if profile is None:
+        yield
+        return
+    with profile.stage(name):
+        yield
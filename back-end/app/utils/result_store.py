@@ -0,0 +1,353 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    content_hash TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    video_id TEXT,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (content_hash, profile)
+);
+CREATE INDEX IF NOT EXISTS idx_results_video ON results(video_id);
+CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed_at);
+CREATE TABLE IF NOT EXISTS frame_features (
+    frame_hash TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    video_id TEXT,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (frame_hash, profile)
+);
+CREATE INDEX IF NOT EXISTS idx_features_accessed ON frame_features(accessed_at);
+"""
+
+
+def content_hash(blobs: Iterable[bytes]) -> str:
+    """Hash of the ordered frame hashes, so it can also be built from client-sent frame hashes."""
+    return combine_frame_hashes(frame_hash(b) for b in blobs)
+
+
+def frame_hash(blob: bytes) -> str:
+    return hashlib.sha256(blob).hexdigest()
+
+
+def combine_frame_hashes(hashes: Iterable[str]) -> str:
+    digest = hashlib.sha256()
+    for h in hashes:
+        digest.update(h.encode("ascii"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def encode_features(features: Dict[str, Any]) -> bytes:
+    """Serialize a per-frame feature dict; numpy arrays are stored natively, the rest as JSON."""
+    import numpy as np
+
+    arrays = {k: v for k, v in features.items() if isinstance(v, np.ndarray)}
+    meta = {k: v for k, v in features.items() if not isinstance(v, np.ndarray)}
+    buf = io.BytesIO()
+    np.savez_compressed(buf, __meta__=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+                        **arrays)
+    return buf.getvalue()
+
+
+def decode_features(payload: bytes) -> Dict[str, Any]:
+    import numpy as np
+
+    with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+        features = json.loads(data["__meta__"].tobytes().decode("utf-8"))
+        for key in data.files:
+            if key != "__meta__":
+                features[key] = data[key]
+    return features
+
+
+class ResultCache:
+    """Small in-process LRU in front of the persistent store."""
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._items: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: tuple, value: Dict[str, Any]) -> None:
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class ResultStore:
+    """SQLite (WAL mode) store for analysis results and per-frame features.
+
+    Every worker process opens its own connection to the same file; WAL lets
+    readers proceed while one writer appends. Hit/access bookkeeping is
+    batched so cache hits do not turn into a write per request.
+    """
+
+    TOUCH_FLUSH_THRESHOLD = 64
+    COMPACT_CHECK_INTERVAL = 50
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024, cache_size: int = 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.cache = ResultCache(cache_size)
+        self._local = threading.local()
+        self._touch_lock = threading.Lock()
+        self._pending_touches: Dict[tuple, int] = {}
+        self._writes_since_check = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    # -- analysis results -------------------------------------------------
+
+    def get_result(self, content_hash: str, profile: str) -> Optional[Dict[str, Any]]:
+        key = (content_hash, profile)
+        cached = self.cache.get(key)
+        if cached is None:
+            row = self._conn().execute(
+                "SELECT payload FROM results WHERE content_hash = ? AND profile = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            cached = json.loads(row[0])
+            self.cache.put(key, cached)
+        self._touch("results", key)
+        return cached
+
+    def put_result(self, video_id: Optional[str], content_hash: str, profile: str,
+                   result: Dict[str, Any]) -> None:
+        payload = json.dumps(result)
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO results (content_hash, profile, video_id, payload, size, created_at, accessed_at, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE((SELECT hits FROM results WHERE content_hash = ? AND profile = ?), 0))",
+            (content_hash, profile, video_id, payload, len(payload), now, now, content_hash, profile),
+        )
+        # Cache what was stored, not the caller's dict: handlers keep adding request fields to it
+        self.cache.put((content_hash, profile), json.loads(payload))
+        self._after_write()
+
+    # -- per-frame features ----------------------------------------------
+
+    def get_frame_features(self, hashes: List[str], profile: str) -> Dict[str, Dict[str, Any]]:
+        if not hashes:
+            return {}
+        found: Dict[str, Dict[str, Any]] = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn().execute(
+                f"SELECT frame_hash, payload FROM frame_features WHERE profile = ? AND frame_hash IN ({placeholders})",
+                [profile] + chunk,
+            ).fetchall()
+            for frame_hash_, payload in rows:
+                found[frame_hash_] = decode_features(payload)
+                self._touch("frame_features", (frame_hash_, profile))
+        return found
+
+    def known_frames(self, hashes: List[str], profile: str) -> List[str]:
+        """Subset of hashes that already have stored features (order preserved)."""
+        if not hashes:
+            return []
+        unique = list(dict.fromkeys(hashes))
+        known = set()
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn().execute(
+                f"SELECT frame_hash FROM frame_features WHERE profile = ? AND frame_hash IN ({placeholders})",
+                [profile] + chunk,
+            ).fetchall()
+            known.update(r[0] for r in rows)
+        return [h for h in unique if h in known]
+
+    def put_frame_features(self, video_id: Optional[str], profile: str,
+                           features: Dict[str, Dict[str, Any]]) -> None:
+        if not features:
+            return
+        now = time.time()
+        rows = []
+        for frame_hash_, feature in features.items():
+            payload = encode_features(feature)
+            rows.append((frame_hash_, profile, video_id, payload, len(payload), now, now))
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO frame_features (frame_hash, profile, video_id, payload, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows,
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._after_write()
+
+    # -- bookkeeping, compaction and warm start ---------------------------
+
+    def _touch(self, table: str, key: tuple) -> None:
+        with self._touch_lock:
+            self._pending_touches[(table,) + key] = self._pending_touches.get((table,) + key, 0) + 1
+            should_flush = len(self._pending_touches) >= self.TOUCH_FLUSH_THRESHOLD
+        if should_flush:
+            self.flush_touches()
+
+    def flush_touches(self) -> None:
+        with self._touch_lock:
+            pending, self._pending_touches = self._pending_touches, {}
+        if not pending:
+            return
+        now = time.time()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN")
+            for (table, key_hash, profile), count in pending.items():
+                column = "content_hash" if table == "results" else "frame_hash"
+                conn.execute(
+                    f"UPDATE {table} SET hits = hits + ?, accessed_at = ? WHERE {column} = ? AND profile = ?",
+                    (count, now, key_hash, profile),
+                )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            # Access statistics are best effort; never fail a request over them
+            logger.warning(f"Result store touch flush failed: {e}")
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    def _after_write(self) -> None:
+        self._writes_since_check += 1
+        if self._writes_since_check >= self.COMPACT_CHECK_INTERVAL:
+            self._writes_since_check = 0
+            if self.total_bytes() > self.max_bytes:
+                self.compact()
+
+    def total_bytes(self) -> int:
+        conn = self._conn()
+        results = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        features = conn.execute("SELECT COALESCE(SUM(size), 0) FROM frame_features").fetchone()[0]
+        return int(results + features)
+
+    def compact(self, target_bytes: Optional[int] = None) -> int:
+        """Evict least recently accessed entries until the store is under target (90% of max)."""
+        self.flush_touches()
+        target = target_bytes if target_bytes is not None else int(self.max_bytes * 0.9)
+        excess = self.total_bytes() - target
+        removed = 0
+        if excess <= 0:
+            return removed
+        conn = self._conn()
+        candidates = conn.execute(
+            "SELECT 'results', content_hash, profile, size, accessed_at FROM results "
+            "UNION ALL SELECT 'frame_features', frame_hash, profile, size, accessed_at FROM frame_features "
+            "ORDER BY accessed_at ASC"
+        ).fetchall()
+        conn.execute("BEGIN")
+        try:
+            for table, key_hash, profile, size, _ in candidates:
+                if excess <= 0:
+                    break
+                column = "content_hash" if table == "results" else "frame_hash"
+                conn.execute(f"DELETE FROM {table} WHERE {column} = ? AND profile = ?", (key_hash, profile))
+                excess -= size
+                removed += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logger.info(f"Result store compacted: removed {removed} entries")
+        return removed
+
+    def warm_start(self, limit: int) -> int:
+        """Load the most popular results into the in-process cache."""
+        if limit <= 0:
+            return 0
+        rows = self._conn().execute(
+            "SELECT content_hash, profile, payload FROM results ORDER BY hits DESC, accessed_at DESC LIMIT ?",
+            (min(limit, self.cache.capacity),),
+        ).fetchall()
+        # Least popular first so the most popular end up most recently used
+        for content_hash_, profile, payload in reversed(rows):
+            self.cache.put((content_hash_, profile), json.loads(payload))
+        return len(rows)
+
+    def close(self) -> None:
+        self.flush_touches()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> Optional[ResultStore]:
+    """Process-wide store configured by RESULT_STORE_PATH (None when disabled)."""
+    global _store
+    if not Config.RESULT_STORE_PATH:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResultStore(Config.RESULT_STORE_PATH, Config.RESULT_STORE_MAX_BYTES,
+                                     Config.RESULT_CACHE_SIZE)
+    return _store
+
+
+def close_result_store() -> None:
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
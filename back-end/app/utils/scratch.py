@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config import Config
+
+
+class ScratchPool:
+    """Per-thread reusable work arrays keyed by (tag, shape, dtype).
+
+    A buffer stays valid until the same thread asks for the same key again, so
+    callers use it as a `dst=` target for the duration of one call and never keep it.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes or Config.SCRATCH_POOL_BYTES
+        self._local = threading.local()
+        # Approximate under concurrency; used for monitoring and tests
+        self.allocations = 0
+        self.reuses = 0
+
+    def get(self, tag: str, shape: tuple, dtype=np.uint8) -> np.ndarray:
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = OrderedDict()
+            self._local.nbytes = 0
+        key = (tag, tuple(shape), np.dtype(dtype).str)
+        buffer = buffers.get(key)
+        if buffer is not None:
+            buffers.move_to_end(key)
+            self.reuses += 1
+            return buffer
+        buffer = np.empty(shape, dtype=dtype)
+        self.allocations += 1
+        if buffer.nbytes > self.max_bytes:
+            # Larger than the whole pool: hand it out without keeping it
+            return buffer
+        buffers[key] = buffer
+        self._local.nbytes += buffer.nbytes
+        # Bounded per thread by bytes: odd frame sizes evict the least recently used buffers
+        while self._local.nbytes > self.max_bytes:
+            _, evicted = buffers.popitem(last=False)
+            self._local.nbytes -= evicted.nbytes
+        return buffer
+
+    def nbytes(self) -> int:
+        """Bytes held by this thread's buffers."""
+        return getattr(self._local, "nbytes", 0)
+
+    def clear(self) -> None:
+        """Drop this thread's buffers."""
+        self._local.buffers = OrderedDict()
+        self._local.nbytes = 0
+
+
+class BufferPool:
+    """Shared free lists of arrays keyed by (shape, dtype) for per-request products.
+
+    Unlike ScratchPool buffers these outlive one call and cross threads: a request
+    acquires them (see AnalysisContext.buffer) and releases them all once its
+    analysis is finished. Free buffers are bounded by total bytes.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes or Config.PRODUCT_POOL_BYTES
+        self._free: Dict[tuple, List[np.ndarray]] = {}
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, shape: tuple, dtype=np.uint8) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                buffer = free.pop()
+                self._nbytes -= buffer.nbytes
+                self.reuses += 1
+                return buffer
+            self.allocations += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, buffers: List[np.ndarray]) -> None:
+        with self._lock:
+            for buffer in buffers:
+                if self._nbytes + buffer.nbytes > self.max_bytes:
+                    continue
+                self._free.setdefault((buffer.shape, buffer.dtype.str), []).append(buffer)
+                self._nbytes += buffer.nbytes
+
+    def nbytes(self) -> int:
+        """Bytes held by free buffers."""
+        return self._nbytes
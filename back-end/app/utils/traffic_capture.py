@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import zlib
+from typing import List, Dict, Any, Optional, Iterator
+
+from app.config import Config
+from app.utils.result_store import frame_hash
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    captured_at REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    profile TEXT,
+    video_id TEXT,
+    client TEXT,
+    frames TEXT NOT NULL,
+    latency REAL NOT NULL,
+    status_code INTEGER NOT NULL,
+    result BLOB,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frames (
+    frame_hash TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def client_token(client: Optional[str]) -> Optional[str]:
+    """Stable pseudonym for an admission key, so replays keep per-client fairness without storing IPs/API keys"""
+    if not client:
+        return None
+    return hashlib.sha256(client.encode("utf-8")).hexdigest()[:16]
+
+
+class TrafficCapture:
+    """Bounded on-disk ring (SQLite, WAL) of sampled analysis requests for replay.
+
+    Frames are kept as the uploaded encoded bytes and stored once per content
+    hash however many requests reference them; results are zlib-compressed
+    JSON. When the ring grows past max_bytes the oldest requests are dropped
+    (and frames no longer referenced with them).
+    """
+
+    COMPACT_CHECK_INTERVAL = 16
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, sample_rate: float = 0.01,
+                 seed: Optional[int] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self._rng = random.Random(seed)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._writes_since_check = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def should_sample(self) -> bool:
+        return self.sample_rate >= 1.0 or (self.sample_rate > 0 and self._rng.random() < self.sample_rate)
+
+    def record(self, endpoint: str, blobs: List[bytes], names: List[str], content_types: List[str],
+               profile: Optional[str], video_id: Optional[str], client: Optional[str],
+               captured_at: float, latency: float, status_code: int,
+               result: Optional[Dict[str, Any]]) -> int:
+        """Append one request to the ring and return its sequence number"""
+        hashes = [frame_hash(blob) for blob in blobs]
+        frames = json.dumps([{"hash": h, "name": n, "content_type": t}
+                             for h, n, t in zip(hashes, names, content_types)])
+        payload = zlib.compress(json.dumps(result).encode("utf-8")) if result is not None else None
+        size = len(frames) + (len(payload) if payload else 0)
+        conn = self._conn()
+        with self._write_lock:
+            conn.execute("BEGIN")
+            try:
+                for h, blob in zip(hashes, blobs):
+                    conn.execute("INSERT OR IGNORE INTO frames (frame_hash, payload, size) VALUES (?, ?, ?)",
+                                 (h, blob, len(blob)))
+                    conn.execute("UPDATE frames SET refs = refs + 1 WHERE frame_hash = ?", (h,))
+                seq = conn.execute(
+                    "INSERT INTO requests (captured_at, endpoint, profile, video_id, client, frames, latency, "
+                    "status_code, result, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (captured_at, endpoint, profile, video_id, client_token(client), frames, latency,
+                     status_code, payload, size),
+                ).lastrowid
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._writes_since_check += 1
+            if self._writes_since_check >= self.COMPACT_CHECK_INTERVAL:
+                self._writes_since_check = 0
+                if self.total_bytes() > self.max_bytes:
+                    self.compact()
+        return seq
+
+    def total_bytes(self) -> int:
+        conn = self._conn()
+        requests = conn.execute("SELECT COALESCE(SUM(size), 0) FROM requests").fetchone()[0]
+        frames = conn.execute("SELECT COALESCE(SUM(size), 0) FROM frames").fetchone()[0]
+        return int(requests + frames)
+
+    def compact(self, target_bytes: Optional[int] = None) -> int:
+        """Drop the oldest requests until the ring is under target (90% of max); returns requests removed"""
+        target = target_bytes if target_bytes is not None else int(self.max_bytes * 0.9)
+        excess = self.total_bytes() - target
+        removed = 0
+        if excess <= 0:
+            return removed
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            for seq, frames, size in conn.execute("SELECT seq, frames, size FROM requests ORDER BY seq ASC").fetchall():
+                if excess <= 0:
+                    break
+                conn.execute("DELETE FROM requests WHERE seq = ?", (seq,))
+                excess -= size
+                for entry in json.loads(frames):
+                    conn.execute("UPDATE frames SET refs = refs - 1 WHERE frame_hash = ?", (entry["hash"],))
+                    row = conn.execute("SELECT refs, size FROM frames WHERE frame_hash = ?",
+                                       (entry["hash"],)).fetchone()
+                    if row is not None and row[0] <= 0:
+                        conn.execute("DELETE FROM frames WHERE frame_hash = ?", (entry["hash"],))
+                        excess -= row[1]
+                removed += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logger.info(f"Traffic capture compacted: removed {removed} requests")
+        return removed
+
+    def __len__(self) -> int:
+        return int(self._conn().execute("SELECT COUNT(*) FROM requests").fetchone()[0])
+
+    def iter_requests(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Captured requests in arrival order, frames loaded"""
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT seq, captured_at, endpoint, profile, video_id, client, frames, latency, status_code, result "
+            "FROM requests ORDER BY seq ASC LIMIT ?", (-1 if limit is None else limit,)
+        ).fetchall()
+        for seq, captured_at, endpoint, profile, video_id, client, frames, latency, status_code, result in rows:
+            entries = json.loads(frames)
+            payloads = dict(conn.execute(
+                f"SELECT frame_hash, payload FROM frames WHERE frame_hash IN ({','.join('?' * len(entries))})",
+                [e["hash"] for e in entries],
+            ).fetchall()) if entries else {}
+            yield {
+                "seq": seq,
+                "captured_at": captured_at,
+                "endpoint": endpoint,
+                "profile": profile,
+                "video_id": video_id,
+                "client": client,
+                "names": [e["name"] for e in entries],
+                "content_types": [e["content_type"] for e in entries],
+                "frames": [bytes(payloads[e["hash"]]) for e in entries],
+                "latency": latency,
+                "status_code": status_code,
+                "result": json.loads(zlib.decompress(result)) if result is not None else None,
+            }
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_capture: Optional[TrafficCapture] = None
+_capture_lock = threading.Lock()
+
+
+def get_traffic_capture() -> Optional[TrafficCapture]:
+    """Process-wide capture ring configured by CAPTURE_PATH (None when disabled)."""
+    global _capture
+    if not Config.CAPTURE_PATH:
+        return None
+    if _capture is None:
+        with _capture_lock:
+            if _capture is None:
+                _capture = TrafficCapture(Config.CAPTURE_PATH, Config.CAPTURE_MAX_BYTES, Config.CAPTURE_SAMPLE_RATE)
+    return _capture
+
+
+def close_traffic_capture() -> None:
+    global _capture
+    with _capture_lock:
+        if _capture is not None:
+            _capture.close()
+            _capture = None
@@ -2,8 +2,6 @@ import logging
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-import uvicorn
-import os
 
 from app.config import Config
 
@@ -34,18 +32,16 @@ app.add_middleware(
 
 # Include API routes
 try:
-    from app.api.routes import router as api_router
-    from app.models.ai_adapter import create_ai_model
-    ai_model = create_ai_model(use_real=Config.USE_REAL_AI_MODEL)
+    from app.api.routes import router as api_router, model_registry, stage_executor, warm_up_model
     app.include_router(api_router, prefix="/api")
     logger.info("API routes loaded successfully")
 except Exception as e:
     logger.error(f"Could not import API routes - using mock endpoints: {e}")
-    ai_model = None
+    model_registry = None
     
     @app.get("/api/health")
     async def health_check():
-        return {"status": "healthy", "model_loaded": False}
+        return {"status": "healthy", "ready": False, "model_loaded": False}
     
     @app.get("/api/")
     async def api_root():
@@ -64,7 +60,8 @@ async def http_exception_handler(request, exc):
     logger.warning(f"HTTP exception: {exc.status_code} - {exc.detail}")
     return JSONResponse(
         status_code=exc.status_code,
-        content={"error": exc.detail, "status_code": exc.status_code}
+        content={"error": exc.detail, "status_code": exc.status_code},
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
@@ -82,21 +79,72 @@ async def startup_event():
     logger.info(f"Debug mode: {Config.DEBUG}")
     logger.info(f"AI Detection threshold: {Config.AI_DETECTION_THRESHOLD}")
     logger.info(f"Analysis timeout: {Config.ANALYSIS_TIMEOUT}s")
+    if model_registry is not None:
+        if Config.LAZY_STARTUP:
+            # Cold-start mode: accept traffic now, build the model on the first request
+            model_registry.defer()
+        else:
+            # Build the one model instance and warm every stage before reporting ready
+            model_registry.startup(warm_up=warm_up_model if Config.MODEL_WARMUP else None)
+    try:
+        from app.utils.result_store import get_result_store
+        store = get_result_store()
+        if store is not None:
+            loaded = store.warm_start(Config.RESULT_STORE_WARM_START)
+            logger.info(f"Result store warm start: {loaded} results loaded from {Config.RESULT_STORE_PATH}")
+    except Exception as e:
+        logger.error(f"Result store warm start failed: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("AITUBE AI Detection API shutting down...")
     try:
-        if ai_model:
-            ai_model.cleanup()
+        if model_registry is not None:
+            model_registry.shutdown()
+            stage_executor.shutdown()
     except:
         pass
+    try:
+        from app.utils.result_store import close_result_store
+        close_result_store()
+    except Exception:
+        pass
+    try:
+        from app.utils.traffic_capture import close_traffic_capture
+        close_traffic_capture()
+    except Exception:
+        pass
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="AITUBE AI Detection API server")
+    parser.add_argument("--router", action="store_true",
+                        help="Run as a consistent-hash routing front instead of an analysis node")
+    parser.add_argument("--backends", default=",".join(Config.ROUTER_BACKENDS),
+                        help="Comma-separated backend base URLs for --router")
+    parser.add_argument("--host", default=Config.HOST)
+    parser.add_argument("--port", type=int, default=Config.PORT)
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host=Config.HOST,
-        port=Config.PORT,
-        reload=Config.DEBUG,
-        log_level="info" if not Config.DEBUG else "debug"
-    )
\ No newline at end of file
+    import uvicorn
+
+    args = parse_args()
+    if args.router:
+        from app.routing.proxy import create_router_app
+
+        backends = [b for b in args.backends.split(",") if b]
+        if not backends:
+            raise SystemExit("--router requires --backends or ROUTER_BACKENDS")
+        uvicorn.run(create_router_app(backends), host=args.host, port=args.port,
+                    log_level="info" if not Config.DEBUG else "debug")
+    else:
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            reload=Config.DEBUG,
+            log_level="info" if not Config.DEBUG else "debug"
+        )
\ No newline at end of file
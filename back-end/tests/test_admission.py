@@ -0,0 +1,183 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app.api import routes
+from app.api.admission import FairAdmission, client_key
+from app.config import Config
+from app.models.registry import AnalysisCancelled, CancellationToken
+
+client = TestClient(app)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_limits_and_refills():
+    clock = FakeClock()
+    admission = FairAdmission(capacity=1, rate=2.0, burst=2, clock=clock)
+    admission.take_token("a")
+    admission.take_token("a")
+    with pytest.raises(HTTPException) as exc:
+        admission.take_token("a")
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "1"
+    admission.take_token("b")  # other clients have their own bucket
+    clock.now = 0.5
+    admission.take_token("a")
+
+
+def test_fair_queue_serves_light_client_before_heavy_backlog():
+    async def scenario():
+        admission = FairAdmission(capacity=1, rate=0, max_queued=10)
+        order = []
+
+        async def analysis(key):
+            async with admission.slot(key):
+                order.append(key)
+                await asyncio.sleep(0)
+
+        first = await admission.acquire("heavy")
+        tasks = [asyncio.create_task(analysis("heavy")) for _ in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(analysis("light")))
+        await asyncio.sleep(0)
+        admission.release(first)
+        await asyncio.gather(*tasks)
+        return order, admission
+
+    order, admission = asyncio.run(scenario())
+    assert order[0] == "light"
+    assert admission.active == 0 and all(s.queued == 0 for s in admission.clients.values())
+
+
+def test_weights_give_proportional_share():
+    async def scenario():
+        admission = FairAdmission(capacity=1, rate=0, max_queued=20, weights={"gold": 2.0})
+        order = []
+
+        async def analysis(key):
+            async with admission.slot(key):
+                order.append(key)
+                await asyncio.sleep(0)
+
+        first = await admission.acquire("blocker")
+        tasks = [asyncio.create_task(analysis(key)) for key in ["gold"] * 6 + ["basic"] * 6]
+        await asyncio.sleep(0)
+        admission.release(first)
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(scenario())
+    assert order[:6].count("gold") == 4
+
+
+def test_queue_limits_timeouts_and_lru_eviction():
+    async def scenario():
+        admission = FairAdmission(capacity=1, rate=0, max_queued=1, queue_timeout=0.05, max_clients=2)
+        held = await admission.acquire("a")
+        waiter = asyncio.create_task(admission.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as full:
+            await admission.acquire("b")
+        with pytest.raises(HTTPException) as timed_out:
+            await waiter
+        admission.client("c")
+        admission.client("d")
+        keys = list(admission.clients)
+        admission.release(held)
+        return full.value, timed_out.value, keys, admission
+
+    full, timed_out, keys, admission = asyncio.run(scenario())
+    assert full.status_code == 429
+    assert timed_out.status_code == 503 and "Retry-After" in timed_out.headers
+    # "a" holds a slot so it survives; idle "b" and "c" were evicted
+    assert keys == ["a", "d"]
+    assert admission.active == 0
+
+
+def test_client_key_prefers_configured_api_key(monkeypatch):
+    monkeypatch.setattr(Config, "ADMISSION_API_KEYS", "k1")
+    monkeypatch.setattr(Config, "ADMISSION_CLIENT_WEIGHTS", "key:k2=2")
+    assert client_key({"X-API-Key": "k1"}, "10.0.0.1") == "key:k1"
+    assert client_key({"X-API-Key": "k2"}, "10.0.0.1") == "key:k2"
+    # Made-up keys do not get a bucket of their own
+    assert client_key({"X-API-Key": "fresh"}, "10.0.0.1") == "ip:10.0.0.1"
+    assert client_key({}, "10.0.0.1") == "ip:10.0.0.1"
+
+
+def test_client_key_trusts_only_router_appended_forwarded_entry(monkeypatch):
+    monkeypatch.setattr(Config, "ADMISSION_TRUST_FORWARDED", True)
+    spoofed = {"X-Forwarded-For": "1.1.1.1, 203.0.113.7"}
+    assert client_key(spoofed, "10.0.0.2") == "ip:203.0.113.7"
+
+
+def test_charge_larger_than_burst_is_rejected():
+    admission = FairAdmission(capacity=1, rate=1.0, burst=2, clock=FakeClock())
+    with pytest.raises(HTTPException) as exc:
+        admission.take_token("a", 3)
+    # Waiting would never help, so no Retry-After invites the client to try again
+    assert exc.value.status_code == 413
+    assert not exc.value.headers
+    admission.take_token("a", 2)
+
+
+def test_cancelled_waiter_leaves_the_queue_and_skips_its_slot():
+    async def scenario():
+        admission = FairAdmission(capacity=1, rate=0, queue_timeout=5.0)
+        held = await admission.acquire("a")
+        token = CancellationToken()
+        entered = []
+
+        async def analysis():
+            async with admission.slot("b", 1, token):
+                entered.append("b")
+
+        waiter = asyncio.create_task(analysis())
+        await asyncio.sleep(0.01)
+        token.cancel("client disconnected")
+        with pytest.raises(AnalysisCancelled):
+            await waiter
+        queued_after_cancel = admission.clients["b"].queued
+        admission.release(held)
+
+        # Granted a slot after its token fired: the slot is handed straight back
+        late = CancellationToken()
+        late.cancel()
+        with pytest.raises(AnalysisCancelled):
+            async with admission.slot("c", 1, late):
+                entered.append("c")
+        return admission, entered, queued_after_cancel
+
+    admission, entered, queued_after_cancel = asyncio.run(scenario())
+    assert entered == []
+    assert queued_after_cancel == 0
+    assert admission.active == 0
+    assert admission.stats["cancelled"] == 1
+
+
+def _upload():
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), color=(10, 20, 30)).save(buf, format="JPEG")
+    return [("files", ("f.jpg", buf.getvalue(), "image/jpeg"))]
+
+
+def test_api_returns_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(routes, "admission", FairAdmission(capacity=2, rate=0.5, burst=1))
+    assert client.post("/api/analyze", files=_upload()).status_code == 200
+    limited = client.post("/api/analyze", files=_upload())
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "2"
+    monkeypatch.setattr(Config, "ADMISSION_API_KEYS", "other")
+    assert client.post("/api/analyze", files=_upload(), headers={"X-API-Key": "other"}).status_code == 200
+    assert client.post("/api/analyze", files=_upload(), headers={"X-API-Key": "unknown"}).status_code == 429
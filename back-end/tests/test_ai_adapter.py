@@ -14,13 +14,13 @@ def test_mock_adapter_basics():
 def test_real_adapter_with_dummy_dependency(monkeypatch):
     # Create a dummy AIModel to be used by RealAIModelAdapter
     class DummyAIModel:
-        def analyze_face_consistency(self, images):
+        def analyze_face_consistency(self, images, options=None, context=None):
             return {"face_consistency": 0.5, "face_count": [0], "analysis_time": 0.01}
-        def analyze_frame_differences(self, images):
+        def analyze_frame_differences(self, images, options=None, context=None):
             return {"frame_diff_score": 1.0, "temporal_consistency": 0.9, "analysis_time": 0.01}
-        def detect_ai_artifacts(self, images):
+        def detect_ai_artifacts(self, images, options=None, context=None):
             return {"ai_artifact_score": 0.1, "individual_scores": [0.1], "analysis_time": 0.01}
-        def is_animal_content(self, images):
+        def is_animal_content(self, images, options=None, context=None):
             return False
         def cleanup(self):
             self.cleaned = True
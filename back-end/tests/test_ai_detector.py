@@ -5,6 +5,9 @@ from PIL import Image
 import io
 import tempfile
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
 
 from app.models.ai_detector import AIModel
 from app.utils.image_processor import ImageProcessor
@@ -51,6 +54,60 @@ class TestAIModel:
         assert isinstance(result["ai_artifact_score"], float)
         assert isinstance(result["individual_scores"], list)
     
+    def test_tiled_artifacts_match_whole_frame(self):
+        rng = np.random.default_rng(0)
+        image = rng.integers(0, 255, (300, 410, 3), dtype=np.uint8)
+        image[:150, :200] = 128  # flat region shows up in the tile map
+        whole = self.ai_model.detect_ai_artifacts([image])
+        tiled = self.ai_model.detect_ai_artifacts([image], {"artifact_tile_size": 100})
+        
+        assert "tile_scores" not in whole
+        assert tiled["ai_artifact_score"] == pytest.approx(whole["ai_artifact_score"], abs=1e-9)
+        tile_map = np.array(tiled["tile_scores"][0])
+        assert tile_map.shape == (3, 5)
+        assert tile_map[0, 0] < tile_map[2, 4]
+    
+    def test_tile_pool_follows_the_worker_thread_budget(self, monkeypatch):
+        from app.config import Config
+        monkeypatch.setattr(Config, "ARTIFACT_TILE_WORKERS", 4)
+        first = self.ai_model._get_tile_pool()
+        assert first._max_workers == 4
+        assert self.ai_model._get_tile_pool() is first
+        # launcher.apply_worker_settings lowers the budget in a forked worker
+        monkeypatch.setattr(Config, "ARTIFACT_TILE_WORKERS", 2)
+        assert self.ai_model._get_tile_pool()._max_workers == 2
+        # A pool built before fork is not reused by the child
+        monkeypatch.setattr(os, "getpid", lambda: -1)
+        assert self.ai_model._get_tile_pool() is not first
+        self.ai_model.cleanup()
+    
+    def test_scratch_buffers_reused_across_calls(self):
+        def run():
+            self.ai_model.detect_ai_artifacts(self.test_images)
+            self.ai_model.analyze_frame_differences(self.test_images, {"diff_size": 64})
+            self.ai_model.is_animal_content(self.test_images)
+        
+        run()
+        allocations = self.ai_model.scratch.allocations
+        for _ in range(3):
+            run()
+        assert self.ai_model.scratch.allocations == allocations
+        assert self.ai_model.scratch.reuses > 0
+    
+    def test_frame_stack_matches_frame_list(self):
+        from app.models.registry import default_registry
+        from app.models.executor import StageExecutor
+        
+        stack = np.ascontiguousarray(np.stack(self.test_images))
+        options = {"stages": None, "stage_weights": {name: 1.0 for name in default_registry.stages}}
+        executor = StageExecutor(default_registry, max_workers=1)
+        from_stack = executor.run(self.ai_model, stack, options)
+        from_list = executor.run(self.ai_model, self.test_images, options)
+        assert from_stack["frame_analysis"]["frame_diff_score"] == from_list["frame_analysis"]["frame_diff_score"]
+        assert from_stack["animal_check"] == from_list["animal_check"]
+        assert from_stack["artifact_analysis"]["individual_scores"] == pytest.approx(
+            from_list["artifact_analysis"]["individual_scores"], abs=1e-9)
+    
     def test_is_animal_content(self):
         result = self.ai_model.is_animal_content(self.test_images)
         assert isinstance(result, bool)
@@ -106,6 +163,39 @@ class TestIntegration:
         assert isinstance(is_animal, bool)
         
         ai_model.cleanup()
+    
+    def test_concurrent_face_detection_matches_sequential(self):
+        ai_model = AIModel()
+        frame_sets = [[_drawn_faces(seed * 2 + k) for k in range(2)] for seed in range(8)]
+        options = {"face_scale_factor": 1.1, "face_min_neighbors": 3, "face_min_size": 24}
+        
+        sequential = [ai_model.analyze_face_consistency(frames, options)["face_count"] for frames in frame_sets]
+        assert any(any(counts) for counts in sequential)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for _ in range(3):
+                concurrent = list(pool.map(
+                    lambda frames: ai_model.analyze_face_consistency(frames, options)["face_count"], frame_sets))
+                assert concurrent == sequential
+        
+        ai_model.cleanup()
+
+
+def _drawn_faces(seed, size=(240, 320)):
+    """Frame with a few cartoon faces the Haar cascade picks up"""
+    rng = np.random.default_rng(seed)
+    img = np.full(size + (3,), 200, np.uint8)
+    for _ in range(4):
+        r = int(rng.integers(25, 50))
+        cy, cx = int(rng.integers(r, size[0] - r)), int(rng.integers(r, size[1] - r))
+        cv2.ellipse(img, (cx, cy), (int(r * 0.8), r), 0, 0, 360, (180, 150, 130), -1)
+        for dx in (-0.35, 0.35):
+            eye_x = int(cx + dx * r)
+            cv2.ellipse(img, (eye_x, int(cy - 0.25 * r)), (int(0.18 * r), int(0.08 * r)), 0, 0, 360, (40, 30, 30), -1)
+            cv2.line(img, (int(eye_x - 0.2 * r), int(cy - 0.45 * r)), (int(eye_x + 0.2 * r), int(cy - 0.45 * r)),
+                     (60, 40, 40), max(1, r // 12))
+        cv2.line(img, (cx, int(cy - 0.1 * r)), (cx, int(cy + 0.2 * r)), (140, 110, 100), max(1, r // 15))
+        cv2.ellipse(img, (cx, int(cy + 0.45 * r)), (int(0.3 * r), int(0.08 * r)), 0, 0, 360, (90, 50, 50), -1)
+    return cv2.GaussianBlur(img, (3, 3), 0)
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
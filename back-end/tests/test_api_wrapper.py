@@ -10,13 +10,13 @@ from main import app
 client = TestClient(app)
 
 class DummyAdapter:
-    def analyze_face_consistency(self, images):
+    def analyze_face_consistency(self, images, options=None, context=None):
         return {"face_consistency": 0.2, "face_count": [0, 0], "analysis_time": 0.01}
-    def analyze_frame_differences(self, images):
+    def analyze_frame_differences(self, images, options=None, context=None):
         return {"frame_diff_score": 0.5, "temporal_consistency": 0.95, "analysis_time": 0.01}
-    def detect_ai_artifacts(self, images):
+    def detect_ai_artifacts(self, images, options=None, context=None):
         return {"ai_artifact_score": 0.1, "individual_scores": [0.1, 0.2], "analysis_time": 0.01}
-    def is_animal_content(self, images):
+    def is_animal_content(self, images, options=None, context=None):
         return False
     def cleanup(self):
         pass
@@ -26,9 +26,8 @@ def test_api_uses_ai_adapter_wrapper(monkeypatch):
     # Patch the factory in the API route to return DummyAdapter
     import app.api.routes as routes
     monkeypatch.setattr(routes, 'create_ai_model', lambda use_real=False: DummyAdapter())
-    # Reset internal lazy model so wrapper is recreated
-    if hasattr(routes, '_ai_model'):
-        routes._ai_model = None
+    # Reset the worker's model registry so the wrapper is recreated
+    routes.model_registry.reset()
 
     # Create a tiny valid image and POST
     img = Image.new('RGB', (64, 64), color=(10, 20, 30))
@@ -44,3 +43,5 @@ def test_api_uses_ai_adapter_wrapper(monkeypatch):
     assert 'ai_probability' in data
     assert 'analysis_details' in data
     assert data['analysis_details'].get('face_analysis') is not None
+    assert data['analysis_details']['face_analysis']['face_consistency'] == 0.2
+    routes.model_registry.reset()
@@ -0,0 +1,70 @@
+import io
+import json
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app.batch import analyze_batch
+
+client = TestClient(app)
+
+
+def _jpeg(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_batch_endpoint_returns_per_item_results_and_errors():
+    manifest = [{"video_id": "a", "frames": 2}, {"video_id": "b", "frames": 1}, {"video_id": "c", "frames": 2}]
+    files = [
+        ("files", ("a0.jpg", _jpeg((10, 20, 30)), "image/jpeg")),
+        ("files", ("a1.jpg", _jpeg((40, 50, 60)), "image/jpeg")),
+        ("files", ("b0.txt", b"not an image", "text/plain")),
+        ("files", ("c0.jpg", _jpeg((70, 80, 90)), "image/jpeg")),
+        ("files", ("c1.jpg", b"broken jpeg", "image/jpeg")),
+    ]
+    response = client.post("/api/analyze/batch", data={"manifest": json.dumps(manifest)}, files=files)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 3 and body["failed"] == 2
+    a, b, c = body["items"]
+    assert a["status"] == "ok" and a["video_id"] == "a"
+    assert 0.0 <= a["result"]["ai_probability"] <= 1.0
+    assert b["status"] == "error" and b["status_code"] == 400
+    assert c["status"] == "error" and "c1.jpg" in c["error"]
+
+
+def test_batch_manifest_must_match_files():
+    files = [("files", ("a0.jpg", _jpeg((1, 2, 3)), "image/jpeg"))]
+    response = client.post("/api/analyze/batch", data={"manifest": json.dumps([{"frames": 2}])}, files=files)
+    assert response.status_code == 400
+
+
+def test_python_api_keeps_input_order():
+    groups = [{"video_id": f"v{i}", "frames": [_jpeg((i * 20, 0, 0)), _jpeg((0, i * 20, 0))]} for i in range(6)]
+    groups.append({"video_id": "empty", "frames": []})
+    items = analyze_batch(groups, profile="fast")
+    assert [item["video_id"] for item in items] == [g["video_id"] for g in groups]
+    assert all(item["status"] == "ok" for item in items[:-1])
+    assert items[-1]["status"] == "error"
+
+
+def test_item_results_use_total_processing_time():
+    manifest = [{"video_id": "a", "frames": 1}]
+    files = [("files", ("a0.jpg", _jpeg((10, 20, 30)), "image/jpeg"))]
+    response = client.post("/api/analyze/batch", data={"manifest": json.dumps(manifest)}, files=files)
+    result = response.json()["items"][0]["result"]
+    assert "total_processing_time" in result and "processing_time" not in result
+
+
+def test_batch_rejects_requests_over_the_total_upload_limit(monkeypatch):
+    from app.config import Config
+
+    frame = _jpeg((10, 20, 30))
+    monkeypatch.setattr(Config, "MAX_REQUEST_SIZE", len(frame) * 2)
+    manifest = [{"video_id": "a", "frames": 2}, {"video_id": "b", "frames": 1}]
+    files = [("files", (f"f{i}.jpg", frame, "image/jpeg")) for i in range(3)]
+    response = client.post("/api/analyze/batch", data={"manifest": json.dumps(manifest)}, files=files)
+    assert response.status_code == 413
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import httpx
+import numpy as np
+import pytest
+
+from main import app
+from app.api import routes
+from app.models.ai_adapter import MockAIModelAdapter
+from app.models.ai_detector import AIModel
+from app.models.executor import StageExecutor
+from app.models.lifecycle import ModelRegistry
+from app.models.registry import (
+    AnalysisCancelled, AnalysisContext, CancellationToken, DetectorRegistry, ProductSpec, StageSpec,
+)
+
+
+def test_executor_stops_scheduling_after_cancel():
+    ran = []
+    registry = DetectorRegistry()
+    registry.register_product(ProductSpec("base"))
+    registry.register_stage(StageSpec("first", run=lambda m, ctx: ran.append("first") or token.cancel(),
+                                      inputs=("base",), cost=5.0, weight=1.0))
+    registry.register_stage(StageSpec("second", run=lambda m, ctx: ran.append("second"),
+                                      inputs=("first",), weight=1.0))
+    for workers in (1, 4):
+        ran.clear()
+        token = CancellationToken()
+        context = AnalysisContext(object(), [], {}, cancel_token=token)
+        with pytest.raises(AnalysisCancelled):
+            StageExecutor(registry, max_workers=workers).run(object(), [], {}, context=context)
+        assert ran == ["first"]
+
+
+def test_detectors_check_token_between_frames():
+    model = AIModel()
+    token = CancellationToken()
+    token.cancel()
+    frames = [np.zeros((32, 32, 3), dtype=np.uint8)] * 2
+    try:
+        with pytest.raises(AnalysisCancelled):
+            model.detect_ai_artifacts(frames, {}, context=AnalysisContext(model, frames, {}, cancel_token=token))
+        # Without a context the detectors behave as before
+        assert "ai_artifact_score" in model.detect_ai_artifacts(frames)
+    finally:
+        model.cleanup()
+
+
+def test_perform_analysis_raises_when_cancelled():
+    token = CancellationToken()
+    token.cancel("client disconnected")
+    frames = [np.zeros((32, 32, 3), dtype=np.uint8)] * 2
+    with pytest.raises(AnalysisCancelled):
+        asyncio.run(routes.perform_analysis(frames, cancel_token=token))
+
+
+class SlowModel(MockAIModelAdapter):
+    def __init__(self):
+        self.cancelled = False
+
+    def detect_ai_artifacts(self, images, options=None, context=None):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if context is not None and context.cancel_token.cancelled:
+                self.cancelled = True
+                context.raise_if_cancelled()
+            time.sleep(0.01)
+        return super().detect_ai_artifacts(images, options, context)
+
+
+def test_disconnect_cancels_in_flight_analysis(monkeypatch):
+    model = SlowModel()
+    monkeypatch.setattr(routes, "model_registry", ModelRegistry(lambda: model))
+    request = httpx.Request("POST", "http://test/api/analyze",
+                            files={"files": ("a.png", _png_bytes(), "image/png")})
+    body = request.read()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/api/analyze", "raw_path": b"/api/analyze", "query_string": b"",
+        "root_path": "", "server": ("test", 80), "client": ("127.0.0.1", 1234),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in request.headers.items()],
+    }
+    sent = []
+
+    async def drive():
+        body_sent = False
+        hang_up_at = time.time() + 0.2
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # The client hangs up shortly after uploading
+            while time.time() < hang_up_at:
+                await asyncio.sleep(0.01)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        await app(scope, receive, send)
+
+    start = time.time()
+    asyncio.run(drive())
+    assert time.time() - start < 3
+    assert model.cancelled
+    assert sent[0]["status"] == routes.CLIENT_CLOSED_REQUEST
+
+
+def _png_bytes():
+    from PIL import Image
+    import io
+
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), color=(120, 30, 200)).save(buf, format="PNG")
+    return buf.getvalue()
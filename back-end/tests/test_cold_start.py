@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import coldstart
+from app.config import Config
+from app.models.lifecycle import ModelRegistry
+
+
+@pytest.fixture(scope="module")
+def lazy_report():
+    env = dict(os.environ, USE_REAL_AI_MODEL="false", SIMULATED_MODEL="false", RESULT_STORE_PATH="")
+    return coldstart.measure(lazy=True, env=env)
+
+
+def test_lazy_startup_defers_heavy_imports(lazy_report):
+    assert lazy_report["status_code"] == 200
+    assert lazy_report["heavy_after_import"] == []
+    assert lazy_report["heavy_after_startup"] == []
+    assert lazy_report["imports"]
+
+
+# Wall-clock budget depends on the machine, so it only runs on request (RUN_SLOW_TESTS=1)
+@pytest.mark.skipif(not os.getenv("RUN_SLOW_TESTS"), reason="timing test; set RUN_SLOW_TESTS=1 to run")
+def test_cold_start_within_budget(lazy_report):
+    assert lazy_report["time_to_first_request"] < Config.COLD_START_BUDGET_SECONDS, \
+        coldstart.format_report(lazy_report)
+
+
+def test_deferred_registry_is_ready_and_builds_on_first_get():
+    built = []
+    registry = ModelRegistry(lambda: built.append(object()) or built[-1])
+
+    registry.defer()
+    assert registry.is_ready and not registry.is_loaded
+    model = registry.get()
+    assert registry.state == "ready"
+    assert registry.get() is model and len(built) == 1
+
+
+def test_parse_importtime_sums_self_time_per_package():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |   numpy.core",
+        "import time:       400 |        500 | numpy",
+        "import time:      1000 |       1000 | cv2",
+    ])
+    assert coldstart.parse_importtime(stderr) == {"numpy": 0.0005, "cv2": 0.001}
@@ -0,0 +1,89 @@
+import threading
+import numpy as np
+import pytest
+
+from app.config import Config
+from app.models.ai_detector import AIModel
+from app.models.executor import StageExecutor, build_analysis_details
+from app.models.registry import (
+    DetectorRegistry, ProductSpec, StageSpec, default_registry, register_builtin_detectors,
+)
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def compute_product(self, name, context):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if name == "base":
+            return 2
+        if name == "double":
+            return context.product("base") * 2
+        return None
+
+
+def _registry():
+    registry = DetectorRegistry()
+    registry.register_product(ProductSpec("base"))
+    registry.register_product(ProductSpec("double", inputs=("base",)))
+    registry.register_stage(StageSpec("a", run=lambda m, ctx: ctx.product("double") + 1,
+                                      inputs=("double",), weight=1.0, score=lambda r: r / 10.0))
+    registry.register_stage(StageSpec("b", run=lambda m, ctx: ctx.product("base"),
+                                      inputs=("base",), weight=1.0, score=lambda r: r / 10.0))
+    registry.register_stage(StageSpec("unused", run=lambda m, ctx: 1 / 0, weight=0.0))
+    return registry
+
+
+def test_products_shared_and_zero_weight_stages_skipped():
+    model = CountingModel()
+    executor = StageExecutor(_registry(), max_workers=4)
+    try:
+        results = executor.run(model, images=[])
+    finally:
+        executor.shutdown()
+    assert results == {"a": 5, "b": 2}
+    assert model.calls == {"base": 1, "double": 1}
+
+
+def test_profile_stage_list_limits_execution():
+    results = StageExecutor(_registry(), max_workers=1).run(CountingModel(), [], {"stages": ["b"]})
+    assert set(results) == {"b"}
+
+
+def test_cycle_is_rejected():
+    registry = DetectorRegistry()
+    registry.register_product(ProductSpec("x", inputs=("y",)))
+    registry.register_product(ProductSpec("y", inputs=("x",)))
+    registry.register_stage(StageSpec("s", run=lambda m, ctx: None, inputs=("x",), weight=1.0))
+    with pytest.raises(ValueError):
+        registry.build_graph(["s"])
+
+
+def test_score_treats_missing_stages_as_neutral():
+    weights = dict(Config.STAGE_WEIGHTS)
+    # Only artifact analysis ran: face/temporal neutral (0.5), no animal detected (penalty 1.0)
+    expected = (0.5 * weights["face_analysis"] + 0.5 * weights["frame_analysis"]
+                + 0.2 * weights["artifact_analysis"] + 1.0 * weights["animal_check"])
+    score = default_registry.score({"artifact_analysis": {"ai_artifact_score": 0.2}})
+    assert score == pytest.approx(expected)
+
+
+def test_real_model_dag_matches_direct_calls():
+    model = AIModel()
+    images = [np.random.randint(0, 255, (120, 160, 3), dtype=np.uint8) for _ in range(3)]
+    options = Config.get_execution_profile("balanced")
+    executor = StageExecutor(register_builtin_detectors(DetectorRegistry()), max_workers=3)
+    try:
+        results = executor.run(model, images, options)
+        direct = model.detect_ai_artifacts(images, options)
+        assert results["artifact_analysis"]["individual_scores"] == direct["individual_scores"]
+        assert results["animal_check"] == model.is_animal_content(images, options)
+        details = build_analysis_details(results)
+        assert "pattern_analysis" in details["skipped_stages"]
+        assert "is_animal_content" in details
+    finally:
+        executor.shutdown()
+        model.cleanup()
@@ -0,0 +1,108 @@
+import asyncio
+import io
+import os
+import sys
+import numpy as np
+import pytest
+from PIL import Image
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import app
+from app.config import Config
+from app.api.routes import perform_analysis, prepare_images
+from app.models.ai_detector import AIModel
+
+client = TestClient(app)
+
+
+def _files(n, size=(200, 200)):
+    files = []
+    for i in range(n):
+        img = Image.new('RGB', size, color=(i * 40, 60, 120))
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG')
+        buf.seek(0)
+        files.append(('files', (f'frame_{i}.jpg', buf, 'image/jpeg')))
+    return files
+
+
+def test_get_execution_profile_returns_copy():
+    fast = Config.get_execution_profile("fast")
+    fast["max_frames"] = 99
+    assert Config.EXECUTION_PROFILES["fast"]["max_frames"] != 99
+    assert Config.get_execution_profile()["name"] == Config.DEFAULT_EXECUTION_PROFILE
+    with pytest.raises(ValueError):
+        Config.get_execution_profile("does-not-exist")
+
+
+def test_prepare_images_caps_frames_and_resolution():
+    images = [np.zeros((1080, 1920, 3), dtype=np.uint8) for _ in range(4)]
+    prepared = prepare_images(images, {"max_frames": 2, "analysis_size": 320})
+    assert len(prepared) == 2
+    assert all(max(img.shape[:2]) == 320 for img in prepared)
+
+
+def test_prepare_images_builds_contiguous_stack():
+    images = [np.zeros((480, 640, 3), dtype=np.uint8), np.full((240, 320, 3), 9, dtype=np.uint8)]
+    stack = prepare_images(images, {"analysis_size": 320})
+    assert stack.shape == (2, 240, 320, 3)
+    assert stack.flags.c_contiguous and stack.dtype == np.uint8
+    assert int(stack[1].max()) == 9
+
+
+def test_prepare_images_keeps_aspect_ratio_of_mixed_frames():
+    images = [np.zeros((480, 640, 3), dtype=np.uint8), np.zeros((640, 360, 3), dtype=np.uint8)]
+    prepared = prepare_images(images, {"analysis_size": 320})
+    assert isinstance(prepared, list)
+    assert [img.shape for img in prepared] == [(240, 320, 3), (320, 180, 3)]
+
+
+def test_mixed_aspect_ratio_upload_is_analyzed():
+    files = _files(1, size=(320, 240)) + _files(1, size=(180, 320))
+    resp = client.post("/api/analyze", files=files)
+    assert resp.status_code == 200
+    assert 0.0 <= resp.json()["ai_probability"] <= 1.0
+
+
+def test_default_profile_scores_like_the_unprofiled_pipeline():
+    rng = np.random.default_rng(7)
+    images = [rng.integers(0, 255, (720, 960, 3), dtype=np.uint8) for _ in range(3)]
+    default = asyncio.run(perform_analysis(list(images)))
+    # Detector defaults with the original four stages and no downscaling
+    baseline = asyncio.run(perform_analysis(list(images), options={
+        "stages": ["face_analysis", "frame_analysis", "artifact_analysis", "animal_check"]}))
+    assert Config.get_execution_profile()["analysis_size"] is None
+    assert default["ai_probability"] == baseline["ai_probability"]
+
+
+def test_fast_profile_skips_stages():
+    resp = client.post("/api/analyze?profile=fast", files=_files(3))
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["execution_profile"] == "fast"
+    assert "animal_check" in data["analysis_details"]["skipped_stages"]
+
+
+def test_thorough_profile_runs_every_listed_stage():
+    resp = client.post("/api/analyze?profile=thorough", files=_files(3))
+    assert resp.status_code == 200
+    details = resp.json()["analysis_details"]
+    assert details["skipped_stages"] == []
+    assert "pattern_analysis" in details and "texture_analysis" in details
+
+
+def test_unknown_profile_rejected():
+    resp = client.post("/api/analyze?profile=turbo", files=_files(1))
+    assert resp.status_code == 400
+
+
+def test_detector_honours_profile_options():
+    model = AIModel()
+    images = [np.random.randint(0, 255, (120, 120, 3), dtype=np.uint8) for _ in range(2)]
+    options = Config.get_execution_profile("fast")
+    try:
+        assert "frame_diff_score" in model.analyze_frame_differences(images, options)
+        assert isinstance(model.analyze_face_consistency(images, options)["face_count"], list)
+    finally:
+        model.cleanup()
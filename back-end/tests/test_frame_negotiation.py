@@ -0,0 +1,165 @@
+import io
+
+import numpy as np
+from PIL import Image
+from fastapi.testclient import TestClient
+
+from main import app
+from app.api import routes
+from app.config import Config
+from app.models.ai_adapter import create_ai_model
+from app.models.lifecycle import ModelRegistry
+from app.models.executor import collect_frame_features
+from app.models.registry import AnalysisContext, default_registry
+from app.utils import result_store
+from app.utils.result_store import frame_hash
+
+client = TestClient(app)
+
+
+def _frames(seeds):
+    blobs = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        pixels = np.clip(rng.normal(128, 40, (120, 160, 3)), 0, 255).astype(np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(pixels).save(buf, format="JPEG")
+        blobs.append(buf.getvalue())
+    return blobs
+
+
+def _upload(blobs):
+    return [("files", (f"f{i}.jpg", blob, "image/jpeg")) for i, blob in enumerate(blobs)]
+
+
+def _use_real_model_and_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "RESULT_STORE_PATH", str(tmp_path / "store.db"))
+    monkeypatch.setattr(result_store, "_store", None)
+    monkeypatch.setattr(routes, "model_registry", ModelRegistry(lambda: create_ai_model(use_real=True)))
+
+
+def test_results_from_features_match_direct_analysis():
+    model = create_ai_model(use_real=True)
+    options = Config.get_execution_profile()
+    images = routes.decode_upload_images(_frames([1, 2, 3]), ["a", "b", "c"], options["analysis_size"])
+    images = routes.prepare_images(images, options)
+    context = AnalysisContext(model, images, options)
+    direct = routes.stage_executor.run(model, images, options, context=context)
+    frames = collect_frame_features(direct, context)
+    rebuilt = default_registry.results_from_features(frames, options)
+    try:
+        assert set(rebuilt) == set(direct)
+        for name, result in direct.items():
+            if isinstance(result, dict):
+                result = {k: v for k, v in result.items() if k != "analysis_time"}
+                assert {k: v for k, v in rebuilt[name].items() if k != "analysis_time"} == result
+            else:
+                assert rebuilt[name] == result
+    finally:
+        model.cleanup()
+
+
+def test_negotiate_then_upload_only_missing_frames(tmp_path, monkeypatch):
+    _use_real_model_and_store(tmp_path, monkeypatch)
+    seen = _frames([1, 2, 3])
+    fresh = _frames([4])[0]
+    try:
+        assert client.post("/api/analyze?video_id=v1", files=_upload(seen)).status_code == 200
+
+        hashes = [frame_hash(seen[0]), frame_hash(seen[1]), frame_hash(fresh)]
+        negotiation = client.post("/api/analyze/negotiate", json={"video_id": "v1", "hashes": hashes}).json()
+        assert negotiation["result"] is None
+        assert negotiation["known"] == hashes[:2]
+        assert negotiation["missing"] == hashes[2:]
+
+        assembled = client.post("/api/analyze/assemble?video_id=v1", data={"hashes": ",".join(hashes)},
+                                files=[("files", ("new.jpg", fresh, "image/jpeg"))])
+        assert assembled.status_code == 200
+        body = assembled.json()
+        assert body["reused_frames"] == 2
+
+        # Same verdict as uploading all three frames
+        result_store.close_result_store()
+        monkeypatch.setattr(Config, "RESULT_STORE_PATH", "")
+        direct = client.post("/api/analyze", files=_upload([seen[0], seen[1], fresh])).json()
+        assert body["ai_probability"] == direct["ai_probability"]
+        assert body["analysis_details"]["face_analysis"]["face_count"] == \
+            direct["analysis_details"]["face_analysis"]["face_count"]
+    finally:
+        result_store.close_result_store()
+
+
+def test_negotiate_returns_full_result_and_assemble_reports_unknown(tmp_path, monkeypatch):
+    _use_real_model_and_store(tmp_path, monkeypatch)
+    seen = _frames([5, 6])
+    hashes = [frame_hash(b) for b in seen]
+    try:
+        client.post("/api/analyze", files=_upload(seen))
+        negotiation = client.post("/api/analyze/negotiate", json={"hashes": hashes}).json()
+        assert negotiation["result"]["cached"] is True
+        assert negotiation["missing"] == []
+
+        unknown = "0" * 64
+        response = client.post("/api/analyze/assemble", data={"hashes": f"{hashes[0]},{unknown}"})
+        assert response.status_code == 409
+        assert response.json()["error"]["missing"] == [unknown]
+
+        assert client.post("/api/analyze/negotiate", json={"hashes": ["xyz"]}).status_code == 400
+    finally:
+        result_store.close_result_store()
+
+
+def test_frames_past_the_cap_do_not_change_the_store_key(tmp_path, monkeypatch):
+    _use_real_model_and_store(tmp_path, monkeypatch)
+    seen = _frames([7, 8, 9])
+    try:
+        # The fast profile analyzes two frames; the third upload must not split the cache key
+        assert client.post("/api/analyze?profile=fast", files=_upload(seen)).json()["cached"] is False
+        negotiation = client.post("/api/analyze/negotiate?profile=fast",
+                                  json={"hashes": [frame_hash(b) for b in seen]}).json()
+        assert negotiation["result"]["cached"] is True
+        assert client.post("/api/analyze?profile=fast", files=_upload(seen[:2])).json()["cached"] is True
+    finally:
+        result_store.close_result_store()
+
+
+def test_assemble_decodes_off_the_event_loop_and_honours_cancellation(tmp_path, monkeypatch):
+    import asyncio
+    import pytest
+    from app.models.registry import AnalysisCancelled, CancellationToken
+
+    _use_real_model_and_store(tmp_path, monkeypatch)
+    seen = _frames([5, 6])
+    fresh = _frames([7])[0]
+    on_loop = []
+    decode = routes.decode_upload_images
+
+    def tracking_decode(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(routes, "decode_upload_images", tracking_decode)
+    try:
+        assert client.post("/api/analyze?video_id=v2", files=_upload(seen)).status_code == 200
+        on_loop.clear()
+        hashes = [frame_hash(seen[0]), frame_hash(seen[1]), frame_hash(fresh)]
+        assembled = client.post("/api/analyze/assemble?video_id=v2", data={"hashes": ",".join(hashes)},
+                                files=[("files", ("new.jpg", fresh, "image/jpeg"))])
+        assert assembled.status_code == 200 and assembled.json()["reused_frames"] == 2
+        assert on_loop == [False]
+
+        # A client that has already gone away costs no decode
+        on_loop.clear()
+        token = CancellationToken()
+        token.cancel("client disconnected")
+        other = _frames([8])[0]
+        with pytest.raises(AnalysisCancelled):
+            asyncio.run(routes.assemble_frames(hashes[:2] + [frame_hash(other)], {frame_hash(other): other},
+                                               Config.get_execution_profile(), "v2", None, token))
+        assert on_loop == []
+    finally:
+        result_store.close_result_store()
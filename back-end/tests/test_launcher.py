@@ -0,0 +1,77 @@
+import os
+
+from app import launcher
+from app.config import Config
+
+
+def test_plan_splits_core_budget_into_workers():
+    plan = launcher.plan_workers(cores=8, threads_per_worker=2, cpus=list(range(8)))
+    assert len(plan) == 4
+    assert all(w["threads"] == 2 for w in plan)
+    assert [w["cpus"] for w in plan] == [[0, 1], [2, 3], [4, 5], [6, 7]]
+
+
+def test_plan_with_explicit_worker_count():
+    plan = launcher.plan_workers(cores=6, workers=3, cpus=list(range(12)))
+    assert len(plan) == 3
+    assert all(w["threads"] == 2 for w in plan)
+
+
+def test_plan_never_exceeds_available_cpus():
+    plan = launcher.plan_workers(cores=64, threads_per_worker=1, cpus=[0, 1])
+    assert len(plan) == 2
+
+
+def test_configure_thread_env(monkeypatch):
+    for var in launcher.THREAD_ENV_VARS:
+        monkeypatch.delenv(var, raising=False)
+    launcher.configure_thread_env(3)
+    assert all(os.environ[var] == "3" for var in launcher.THREAD_ENV_VARS)
+
+
+def test_apply_worker_settings_pins_cpus(monkeypatch):
+    import cv2
+
+    pinned = []
+    monkeypatch.setattr(Config, "STAGE_EXECUTOR_WORKERS", Config.STAGE_EXECUTOR_WORKERS)
+    monkeypatch.setattr(Config, "ARTIFACT_TILE_WORKERS", Config.ARTIFACT_TILE_WORKERS)
+    monkeypatch.setattr(os, "sched_setaffinity", lambda pid, cpus: pinned.append(cpus), raising=False)
+    original = cv2.getNumThreads()
+    try:
+        launcher.apply_worker_settings({"index": 0, "threads": 2, "cpus": [4, 5]}, pin=True)
+        assert cv2.getNumThreads() == 2
+        assert Config.STAGE_EXECUTOR_WORKERS == Config.ARTIFACT_TILE_WORKERS == 2
+        assert pinned == [{4, 5}]
+    finally:
+        cv2.setNumThreads(original)
+
+
+def test_size_worker_pools_follows_the_thread_budget(monkeypatch):
+    from app.api import routes
+    from app.api.admission import FairAdmission
+    from app.models.executor import StageExecutor
+
+    # As imported in the preloading parent, before the worker's budget is known
+    monkeypatch.setattr(routes, "stage_executor", StageExecutor(max_workers=4))
+    monkeypatch.setattr(routes, "admission", FairAdmission(capacity=4))
+    monkeypatch.setattr(Config, "ADMISSION_CONCURRENCY", 0)
+    launcher.size_worker_pools({"index": 0, "threads": 2, "cpus": [0, 1]})
+    assert routes.stage_executor.max_workers == 2
+    assert routes.admission.capacity == 2
+
+    # An explicit ADMISSION_CONCURRENCY still wins
+    monkeypatch.setattr(Config, "ADMISSION_CONCURRENCY", 6)
+    launcher.size_worker_pools({"index": 0, "threads": 2, "cpus": [0, 1]})
+    assert routes.admission.capacity == 6
+
+
+def test_restart_delay_backs_off_and_gives_up_on_crash_loops(monkeypatch):
+    monkeypatch.setattr(Config, "LAUNCH_MIN_UPTIME", 10.0)
+    monkeypatch.setattr(Config, "LAUNCH_MAX_RESTARTS", 3)
+    monkeypatch.setattr(Config, "LAUNCH_RESTART_BACKOFF_MAX", 1.5)
+    worker = {"index": 0, "started": 100.0}
+    assert [launcher.restart_delay(worker, 101.0) for _ in range(3)] == [0.5, 1.0, 1.5]
+    assert launcher.restart_delay(worker, 101.0) is None
+    # A worker that stayed up for a while starts over
+    worker = {"index": 1, "started": 100.0, "failures": 3}
+    assert launcher.restart_delay(worker, 200.0) == 0.5
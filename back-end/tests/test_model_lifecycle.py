@@ -0,0 +1,62 @@
+import os
+import sys
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import app
+from app.api import routes
+from app.models.ai_detector import AIModel
+from app.models.lifecycle import ModelRegistry
+
+
+def test_registry_builds_single_instance_and_readies_after_warmup():
+    built = []
+    warmed = []
+    registry = ModelRegistry(lambda: built.append(object()) or built[-1])
+
+    lazy = registry.get()
+    assert registry.state == "loaded" and not registry.is_ready
+    registry.startup(warm_up=warmed.append)
+    assert registry.get() is lazy
+    assert len(built) == 1
+    assert warmed == [lazy]
+    assert registry.status()["ready"] is True
+
+
+def test_registry_reports_failed_warmup():
+    registry = ModelRegistry(object)
+
+    def broken(model):
+        raise RuntimeError("boom")
+
+    registry.startup(warm_up=broken)
+    assert registry.state == "failed"
+    assert registry.status()["error"] == "boom"
+    assert not registry.is_ready
+
+
+def test_warm_up_runs_every_stage_on_real_model():
+    model = AIModel()
+    try:
+        routes.warm_up_model(model)
+    finally:
+        model.cleanup()
+
+
+def test_health_reports_ready_after_startup():
+    routes.model_registry.reset()
+    with TestClient(app) as client:
+        data = client.get("/api/health").json()
+        assert data["status"] == "healthy"
+        assert data["ready"] is True
+        assert data["model_state"] == "ready"
+
+
+def test_startup_is_idempotent_once_ready():
+    warmed = []
+    registry = ModelRegistry(object)
+    registry.startup(warm_up=warmed.append)
+    model = registry.get()
+    # e.g. a forked worker's lifespan startup after the launcher preloaded the model
+    registry.startup(warm_up=warmed.append)
+    assert len(warmed) == 1 and registry.get() is model and registry.is_ready
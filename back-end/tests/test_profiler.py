@@ -0,0 +1,96 @@
+import io
+import os
+import sys
+from PIL import Image
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import app
+from app.config import Config
+from app.utils import profiler
+
+client = TestClient(app)
+
+
+def _jpeg(color):
+    img = Image.new('RGB', (120, 120), color=color)
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG')
+    buf.seek(0)
+    return buf
+
+
+def test_profile_records_stages_and_memory():
+    profile = profiler.begin_profile("unit")
+    assert profile is not None
+    # A second concurrent profile is refused while one is active
+    assert profiler.begin_profile("other") is None
+    with profiler.profile_stage(profile, "work"):
+        _ = [bytearray(1024) for _ in range(100)]
+    profiler.end_profile(profile)
+
+    data = profile.to_dict()
+    assert [s["stage"] for s in data["stages"]] == ["work"]
+    assert data["peak_memory_bytes"] > 0
+    assert isinstance(data["cpu_profile"], list)
+    assert profiler.profile_store.get(profile.profile_id) is profile
+
+
+def test_profile_store_is_bounded():
+    store = profiler.ProfileStore(capacity=2)
+    for _ in range(3):
+        store.add(profiler.RequestProfile())
+    assert len(store.list()) == 2
+
+
+def test_profiling_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(Config, "PROFILING_ENABLED", False)
+    assert profiler.should_profile("1") is False
+    assert client.get("/api/debug/profiles").status_code == 404
+
+
+def test_header_opt_in_exposes_profile(monkeypatch):
+    monkeypatch.setattr(Config, "PROFILING_ENABLED", True)
+    files = [('files', (f'p_{i}.jpg', _jpeg((i * 60, 30, 90)), 'image/jpeg')) for i in range(2)]
+    resp = client.post("/api/analyze", files=files, headers={Config.PROFILING_HEADER: "1"})
+    assert resp.status_code == 200
+    profile_id = resp.json()["profile_id"]
+
+    listing = client.get("/api/debug/profiles").json()["profiles"]
+    assert any(p["profile_id"] == profile_id for p in listing)
+
+    detail = client.get(f"/api/debug/profiles/{profile_id}").json()
+    stages = [s["stage"] for s in detail["stages"]]
+    assert stages[0] == "read" and "decode" in stages
+    assert "face_analysis" in stages and "scoring" in stages
+    assert detail["metadata"]["frame_count"] == 2
+
+
+def test_profiled_stages_run_off_the_event_loop_and_are_profiled(monkeypatch):
+    import asyncio
+    from app.api import routes
+
+    monkeypatch.setattr(Config, "PROFILING_ENABLED", True)
+    # Lazy imports on a cold process can crowd the executor out of the default top rows
+    monkeypatch.setattr(Config, "PROFILING_TOP_FUNCTIONS", 1000)
+    on_loop = []
+    original_run = routes.stage_executor.run
+
+    def run(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return original_run(*args, **kwargs)
+
+    monkeypatch.setattr(routes.stage_executor, "run", run)
+    files = [('files', (f'q_{i}.jpg', _jpeg((i * 50, 90, 30)), 'image/jpeg')) for i in range(2)]
+    resp = client.post("/api/analyze", files=files, headers={Config.PROFILING_HEADER: "1"})
+    assert resp.status_code == 200
+    assert on_loop == [False]
+
+    detail = client.get(f"/api/debug/profiles/{resp.json()['profile_id']}").json()
+    assert "face_analysis" in [s["stage"] for s in detail["stages"]]
+    # Worker-thread CPU time is merged into the request's profile
+    assert any(row["file"].endswith("executor.py") for row in detail["cpu_profile"])
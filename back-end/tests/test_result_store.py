@@ -0,0 +1,105 @@
+import io
+import os
+import sys
+import threading
+import numpy as np
+from PIL import Image
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import app
+from app.config import Config
+from app.utils import result_store
+from app.utils.result_store import ResultStore, content_hash, combine_frame_hashes, frame_hash
+
+client = TestClient(app)
+
+
+def test_cached_result_is_not_the_callers_dict(tmp_path):
+    store = ResultStore(str(tmp_path / "store.db"))
+    result = {"ai_probability": 0.42}
+    store.put_result("vid1", "hash1", "balanced", result)
+    result["profile_id"] = "abc"
+    assert store.get_result("hash1", "balanced") == {"ai_probability": 0.42}
+
+
+def test_result_roundtrip_and_shared_across_connections(tmp_path):
+    path = str(tmp_path / "store.db")
+    store = ResultStore(path)
+    store.put_result("vid1", "hash1", "balanced", {"ai_probability": 0.42})
+    assert store.get_result("hash1", "balanced") == {"ai_probability": 0.42}
+    assert store.get_result("hash1", "fast") is None
+
+    # A second store (another worker) reads the same file
+    other = ResultStore(path, cache_size=0)
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(other.get_result("hash1", "balanced")))
+    thread.start()
+    thread.join()
+    assert seen == [{"ai_probability": 0.42}]
+
+
+def test_frame_features_roundtrip(tmp_path):
+    store = ResultStore(str(tmp_path / "store.db"))
+    thumb = np.arange(12, dtype=np.uint8).reshape(2, 2, 3)
+    store.put_frame_features("vid", "balanced", {"f1": {"face_count": 2, "thumbnail": thumb}})
+    assert store.known_frames(["f0", "f1"], "balanced") == ["f1"]
+    features = store.get_frame_features(["f1"], "balanced")["f1"]
+    assert features["face_count"] == 2
+    assert np.array_equal(features["thumbnail"], thumb)
+
+
+def test_content_hash_matches_client_side_hashes():
+    blobs = [b"a", b"b"]
+    assert content_hash(blobs) == combine_frame_hashes([frame_hash(b) for b in blobs])
+    assert content_hash(blobs) != content_hash(list(reversed(blobs)))
+
+
+def test_compaction_evicts_least_recently_used(tmp_path):
+    store = ResultStore(str(tmp_path / "store.db"), max_bytes=10_000, cache_size=0)
+    for i in range(20):
+        store.put_result(f"v{i}", f"h{i}", "balanced", {"pad": "x" * 900})
+    store.get_result("h0", "balanced")
+    store.flush_touches()
+    store.compact()
+    assert store.total_bytes() <= 9_000
+    assert store.get_result("h0", "balanced") is not None
+    assert store.get_result("h1", "balanced") is None
+
+
+def test_warm_start_loads_popular_results(tmp_path):
+    path = str(tmp_path / "store.db")
+    store = ResultStore(path)
+    store.put_result("a", "ha", "balanced", {"v": "a"})
+    store.put_result("b", "hb", "balanced", {"v": "b"})
+    for _ in range(3):
+        store.get_result("hb", "balanced")
+    store.close()
+
+    restarted = ResultStore(path, cache_size=1)
+    assert restarted.warm_start(10) == 1
+    assert restarted.cache.get(("hb", "balanced")) == {"v": "b"}
+
+
+def test_api_serves_repeat_upload_from_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "RESULT_STORE_PATH", str(tmp_path / "api.db"))
+    monkeypatch.setattr(result_store, "_store", None)
+
+    def files():
+        out = []
+        for i in range(2):
+            buf = io.BytesIO()
+            Image.new('RGB', (80, 80), color=(i * 90, 20, 40)).save(buf, format='JPEG')
+            buf.seek(0)
+            out.append(('files', (f'f{i}.jpg', buf, 'image/jpeg')))
+        return out
+
+    try:
+        first = client.post("/api/analyze?video_id=abc", files=files())
+        second = client.post("/api/analyze?video_id=abc", files=files())
+        assert first.status_code == 200 and second.status_code == 200
+        assert first.json()["cached"] is False
+        assert second.json()["cached"] is True
+        assert second.json()["ai_probability"] == first.json()["ai_probability"]
+    finally:
+        result_store.close_result_store()
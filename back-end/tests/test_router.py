@@ -0,0 +1,174 @@
+import socket
+import threading
+import time
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routing.hash_ring import HashRing, BackendPool
+from app.routing.proxy import create_router_app
+
+
+def test_ring_spreads_keys_and_moves_few_on_resize():
+    nodes = ["http://n1", "http://n2", "http://n3"]
+    ring = HashRing(nodes)
+    keys = [f"video{i}" for i in range(3000)]
+    before = {k: ring.lookup(k) for k in keys}
+    counts = Counter(before.values())
+    assert all(700 < c < 1300 for c in counts.values())
+
+    ring.add("http://n4")
+    moved = sum(1 for k in keys if ring.lookup(k) != before[k])
+    # Only keys claimed by the new node should move (~1/4)
+    assert moved < len(keys) * 0.4
+    assert all(ring.lookup(k) in (before[k], "http://n4") for k in keys)
+
+
+def test_pool_fails_over_unhealthy_node():
+    pool = BackendPool(["http://a", "http://b", "http://c"], failure_threshold=1)
+    primary = pool.candidates("video-x")[0]
+    pool.mark_failure(primary)
+    assert pool.candidates("video-x")[0] != primary
+    pool.mark_success(primary)
+    assert pool.candidates("video-x")[0] == primary
+
+
+def test_pool_bounded_load_spills_hot_key():
+    pool = BackendPool(["http://a", "http://b"], load_factor=1.0)
+    primary = pool.candidates("hot")[0]
+    for _ in range(3):
+        pool.acquire(primary)
+    assert pool.candidates("hot")[0] != primary
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_backend(name):
+    backend = FastAPI()
+
+    @backend.get("/api/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @backend.post("/api/analyze")
+    async def analyze():
+        return {"node": name}
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(backend, host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 5
+    while not server.started and time.time() < deadline:
+        time.sleep(0.02)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def test_router_against_local_uvicorn_instances():
+    servers = [_start_backend(name) for name in ("one", "two", "three")]
+    urls = [url for _, _, url in servers]
+    try:
+        with TestClient(create_router_app(urls, health_interval=0)) as router:
+            # The same videoId always lands on the same node
+            nodes = {router.post("/api/analyze?video_id=abc").json()["node"] for _ in range(5)}
+            assert len(nodes) == 1
+            served_by = router.post("/api/analyze?video_id=abc").headers["X-Routed-To"]
+
+            # Stop that node: requests fail over to a live one
+            for server, thread, url in servers:
+                if url == served_by:
+                    server.should_exit = True
+                    thread.join(timeout=5)
+            resp = router.post("/api/analyze", headers={"X-Video-Id": "abc"})
+            assert resp.status_code == 200
+            assert resp.headers["X-Routed-To"] != served_by
+
+            status = router.get("/router/status").json()["backends"]
+            assert len(status) == 3
+    finally:
+        for server, thread, _ in servers:
+            server.should_exit = True
+            thread.join(timeout=5)
+
+
+def _mock_router(handler):
+    import httpx
+
+    return create_router_app(["http://a", "http://b", "http://c"], transport=httpx.MockTransport(handler),
+                             health_interval=0)
+
+
+def test_router_fails_over_only_before_the_backend_got_the_request():
+    import httpx
+
+    calls = []
+
+    def refused(request):
+        calls.append(request.url.host)
+        raise httpx.ConnectError("refused", request=request)
+
+    with TestClient(_mock_router(refused)) as router:
+        assert router.post("/api/analyze?video_id=v").status_code == 502
+    assert len(calls) == 3  # every candidate was tried
+
+    calls.clear()
+
+    def slow(request):
+        calls.append(request.url.host)
+        raise httpx.ReadTimeout("slow", request=request)
+
+    with TestClient(_mock_router(slow)) as router:
+        assert router.post("/api/analyze?video_id=v").status_code == 504
+    assert len(calls) == 1  # the analysis may be running; it is not sent to a second node
+
+
+def test_router_relays_stream_incrementally():
+    import asyncio
+    import httpx
+
+    async def scenario():
+        first_chunk_sent = asyncio.Event()
+
+        async def events():
+            yield b"event: stage\ndata: {}\n\n"
+            # Only continues once the router has passed the first event on to its client
+            await asyncio.wait_for(first_chunk_sent.wait(), 5)
+            yield b"event: result\ndata: {}\n\n"
+
+        def handler(request):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=events())
+
+        app = _mock_router(handler)
+        await app.router.startup()
+        body = []
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.sleep(10)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                body.append(message["body"])
+                first_chunk_sent.set()
+
+        scope = {"type": "http", "method": "POST", "path": "/api/analyze/stream", "raw_path": b"/api/analyze/stream",
+                 "query_string": b"", "headers": [], "client": ("127.0.0.1", 5000),
+                 "server": ("testserver", 80), "scheme": "http", "root_path": "", "http_version": "1.1"}
+        try:
+            await app(scope, receive, send)
+        finally:
+            await app.router.shutdown()
+        return b"".join(body)
+
+    assert asyncio.run(scenario()).count(b"event:") == 2
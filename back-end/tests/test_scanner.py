@@ -0,0 +1,72 @@
+import json
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from app import launcher, scanner
+
+
+def _write_image(path, value):
+    cv2.imwrite(str(path), np.full((48, 64, 3), value, dtype=np.uint8))
+
+
+def _write_video(path, frames=12):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+    writer.release()
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    for var in launcher.THREAD_ENV_VARS:
+        monkeypatch.delenv(var, raising=False)
+    root = tmp_path / "archive"
+    (root / "video_a").mkdir(parents=True)
+    (root / "video_b").mkdir()
+    for i in range(6):
+        _write_image(root / "video_a" / f"{i:03d}.jpg", i * 30)
+    _write_image(root / "video_b" / "0.png", 100)
+    (root / "video_b" / "broken.jpg").write_bytes(b"not a jpeg")
+    _write_video(root / "clip.avi")
+    return root
+
+
+def test_discover_groups_samples_frames(archive):
+    groups = {g["key"]: g for g in scanner.discover_groups(str(archive), 3)}
+    assert set(groups) == {"video_a", "video_b", "clip.avi"}
+    assert [os.path.basename(p) for p in groups["video_a"]["paths"]] == ["001.jpg", "003.jpg", "005.jpg"]
+    assert groups["clip.avi"]["kind"] == "video"
+    assert len(scanner.sample_video_frames(groups["clip.avi"]["paths"][0], 3)) == 3
+
+
+def test_scan_writes_jsonl_and_resumes(archive, tmp_path):
+    out = tmp_path / "scores.jsonl"
+    stats = scanner.scan(str(archive), str(out), workers=2, use_real=False, limit=2)
+    assert stats["ok"] + stats["error"] == 2
+
+    # Simulate a crash mid-write: the torn line is dropped and the rest resumes
+    with open(out, "a") as f:
+        f.write('{"key": "torn')
+    stats = scanner.scan(str(archive), str(out), workers=2, use_real=False)
+    assert stats["skipped"] == 2 and stats["ok"] + stats["error"] == 1
+
+    records = {r["key"]: r for r in map(json.loads, out.read_text().splitlines())}
+    assert set(records) == {"video_a", "video_b", "clip.avi"}
+    assert records["video_a"]["status"] == "ok"
+    assert 0.0 <= records["clip.avi"]["ai_probability"] <= 1.0
+    assert records["video_b"]["status"] == "error"
+    assert scanner.scan(str(archive), str(out), use_real=False) == {"skipped": 3, "ok": 0, "error": 0}
+
+
+def test_scan_leaves_the_callers_environment_alone(archive, tmp_path, monkeypatch):
+    from app.launcher import THREAD_ENV_VARS
+
+    for var in THREAD_ENV_VARS:
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("OMP_NUM_THREADS", "8")
+    scanner.scan(str(archive), str(tmp_path / "scores.jsonl"), workers=1, use_real=False, limit=1)
+    assert os.environ["OMP_NUM_THREADS"] == "8"
+    assert all(var not in os.environ for var in THREAD_ENV_VARS if var != "OMP_NUM_THREADS")
@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+
+from app.utils.scratch import ScratchPool
+
+
+def test_buffers_keyed_by_tag_shape_and_dtype():
+    pool = ScratchPool(max_bytes=1024)
+    a = pool.get("gray", (4, 5))
+    assert pool.get("gray", (4, 5)) is a
+    assert pool.get("edges", (4, 5)) is not a
+    assert pool.get("gray", (4, 5), np.float32).dtype == np.float32
+    assert pool.get("gray", (5, 4)).shape == (5, 4)
+    assert (pool.allocations, pool.reuses) == (4, 1)
+
+
+def test_pool_is_bounded_and_per_thread():
+    pool = ScratchPool(max_bytes=8)
+    first = pool.get("a", (2, 2))
+    pool.get("b", (2, 2))
+    pool.get("c", (2, 2))
+    assert pool.get("a", (2, 2)) is not first  # least recently used was evicted
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.get("c", (2, 2))))
+    thread.start()
+    thread.join()
+    assert other[0] is not pool.get("c", (2, 2))
+
+
+def test_pool_evicts_by_bytes_not_count():
+    pool = ScratchPool(max_bytes=1000)
+    small = [pool.get(f"s{i}", (10, 10)) for i in range(5)]
+    assert pool.nbytes() == 500
+    pool.get("big", (20, 30))  # 600 bytes: the oldest small buffer makes room
+    assert pool.nbytes() == 1000
+    assert pool.get("s0", (10, 10)) is not small[0]
+    assert pool.get("s4", (10, 10)) is small[4]
+    assert pool.nbytes() <= 1000
+
+    huge = pool.get("huge", (2000,))
+    assert pool.get("huge", (2000,)) is not huge  # never retained
+    assert pool.nbytes() <= 1000
+
+
+def test_product_buffers_reused_across_requests_through_the_executor():
+    from app.api.routes import prepare_images
+    from app.config import Config
+    from app.models.ai_detector import AIModel
+    from app.models.executor import StageExecutor
+    from app.models.registry import AnalysisContext, default_registry
+
+    model = AIModel()
+    executor = StageExecutor(default_registry, max_workers=2)
+    options = Config.get_execution_profile("standard")
+    rng = np.random.default_rng(3)
+    images = prepare_images([rng.integers(0, 255, (120, 160, 3), dtype=np.uint8) for _ in range(3)], options)
+
+    def request():
+        context = AnalysisContext(model, images, options)
+        try:
+            results = executor.run(model, images, options, context=context)
+        finally:
+            context.release()
+        return {name: {k: v for k, v in r.items() if k != "analysis_time"} if isinstance(r, dict) else r
+                for name, r in results.items()}
+
+    first = request()
+    allocations = model.product_pool.allocations
+    assert allocations > 0 and model.product_pool.nbytes() > 0
+    for _ in range(3):
+        assert request() == first
+    assert model.product_pool.allocations == allocations
+    assert model.product_pool.reuses >= 3 * allocations
+    executor.shutdown()
+    model.cleanup()
+
+
+def test_buffer_pool_is_bounded_by_bytes():
+    from app.utils.scratch import BufferPool
+
+    pool = BufferPool(max_bytes=250)
+    buffers = [pool.acquire((10, 10)) for _ in range(3)]
+    pool.release(buffers)
+    assert pool.nbytes() == 200
+    reused = pool.acquire((10, 10))
+    assert any(reused is b for b in buffers[:2])
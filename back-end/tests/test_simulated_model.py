@@ -0,0 +1,87 @@
+import json
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.api import routes
+from app.config import Config
+from app.models.ai_adapter import create_ai_model
+from app.models.lifecycle import ModelRegistry
+from app.models.registry import AnalysisCancelled, AnalysisContext, CancellationToken
+from app.models.simulated import LatencyModel, SimulatedAIModelAdapter, load_trace
+
+
+def _frames(n, h=360, w=640):
+    return [np.zeros((h, w, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def _png():
+    import io
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_create_ai_model_returns_simulator(monkeypatch):
+    monkeypatch.setattr(Config, "SIM_LATENCY_DISTRIBUTION", "fixed")
+    model = create_ai_model(use_real=True, simulated=True)
+    assert isinstance(model, SimulatedAIModelAdapter)
+    assert model.latency.distribution == "fixed"
+
+
+def test_latency_scales_with_frames_and_size():
+    model = SimulatedAIModelAdapter(LatencyModel("fixed", median_ms=20.0))
+    assert model.scale(_frames(3)) == pytest.approx(1.0)
+    assert model.scale(_frames(6, 720, 1280)) == pytest.approx(8.0)
+
+    start = time.perf_counter()
+    result = model.detect_ai_artifacts(_frames(3))
+    assert time.perf_counter() - start >= 0.02
+    assert result["analysis_time"] == pytest.approx(0.02)
+    assert len(result["individual_scores"]) == 3
+    # Registry cost sets the relative latency of the other nodes
+    assert model.latency.median_for("faces") == pytest.approx(0.06)
+
+
+def test_lognormal_is_seeded_and_trace_samples_recorded_durations(tmp_path):
+    a = [LatencyModel("lognormal", 20.0, 0.8, seed=7).sample("artifact_analysis") for _ in range(2)]
+    b = [LatencyModel("lognormal", 20.0, 0.8, seed=7).sample("artifact_analysis") for _ in range(2)]
+    assert a == b
+
+    profile = {"profile_id": "p", "stages": [{"stage": "faces", "start": 0.0, "duration": 0.5},
+                                             {"stage": "faces", "start": 0.5, "duration": 0.7}]}
+    path = tmp_path / "trace.jsonl"
+    path.write_text(json.dumps(profile) + "\n" + json.dumps({"stage": "gray", "duration": 0.1}) + "\n")
+    trace = load_trace(str(path))
+    assert trace == {"faces": [0.5, 0.7], "gray": [0.1]}
+    latency = LatencyModel("trace", 20.0, trace=trace, seed=1)
+    assert latency.sample("faces") in (0.5, 0.7)
+    assert latency.sample("artifact_analysis") == pytest.approx(0.02)  # unrecorded node: median
+    with pytest.raises(ValueError):
+        LatencyModel("trace")
+
+
+def test_cpu_mode_stops_when_cancelled():
+    model = SimulatedAIModelAdapter(LatencyModel("fixed", median_ms=5000.0), mode="cpu")
+    token = CancellationToken()
+    token.cancel("client disconnected")
+    context = AnalysisContext(model, _frames(3), {}, cancel_token=token)
+    start = time.perf_counter()
+    with pytest.raises(AnalysisCancelled):
+        model.detect_ai_artifacts(context.images, context=context)
+    assert time.perf_counter() - start < 1.0
+
+
+def test_api_serves_simulated_model(monkeypatch):
+    model = SimulatedAIModelAdapter(LatencyModel("fixed", median_ms=1.0))
+    monkeypatch.setattr(routes, "model_registry", ModelRegistry(lambda: model))
+    files = [("files", (f"f{i}.png", _png(), "image/png")) for i in range(2)]
+    response = TestClient(app).post("/api/analyze", files=files)
+    assert response.status_code == 200
+    assert response.json()["analysis_details"]["face_analysis"]["face_count"] == [1, 1]
+    assert "faces" in model.spent and "artifact_analysis" in model.spent
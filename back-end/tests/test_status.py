@@ -0,0 +1,80 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app.api import routes
+from app.api.admission import ServiceTimes
+from app.config import Config
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _jpeg(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_service_times_track_in_flight_and_ewma():
+    clock = FakeClock()
+    times = ServiceTimes(alpha=0.5, clock=clock)
+    with times.track(2):
+        assert times.in_flight == 1
+        clock.now = 1.0
+    times.record(3.0, 3)
+    snapshot = times.snapshot()
+    assert snapshot["in_flight"] == 0 and snapshot["completed"] == 2
+    assert snapshot["service_time_ewma"] == 2.0
+    assert snapshot["frame_time_ewma"] == 0.75
+
+    with pytest.raises(RuntimeError):
+        with times.track(1):
+            raise RuntimeError("boom")
+    assert times.in_flight == 0 and times.completed == 2
+
+
+def test_status_not_ready_before_startup():
+    routes.model_registry.reset()
+    response = TestClient(app).get("/api/analyze/status")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_status_reports_load_after_analysis(monkeypatch):
+    monkeypatch.setattr(routes, "service_times", ServiceTimes())
+    monkeypatch.setattr(Config, "RESULT_STORE_PATH", "")
+    routes.model_registry.reset()
+    with TestClient(app) as client:
+        idle = client.get("/api/analyze/status").json()
+        assert idle["ready"] is True and idle["saturated"] is False
+        assert idle["suggested_backoff"] == 0.0
+        assert idle["suggested_frames"] == Config.get_execution_profile()["max_frames"]
+
+        files = [("files", (f"f{i}.jpg", _jpeg((10 * i, 80, 160)), "image/jpeg")) for i in range(3)]
+        assert client.post("/api/analyze", files=files).status_code == 200
+        data = client.get("/api/analyze/status").json()
+        assert data["completed"] == 1
+        assert data["service_time_ewma"] > 0 and data["in_flight"] == 0
+
+
+def test_status_suggests_backoff_and_fewer_frames_when_saturated(monkeypatch):
+    times = ServiceTimes()
+    times.record(0.5, 2)
+    times.in_flight = routes.admission.capacity
+    monkeypatch.setattr(routes, "service_times", times)
+    routes.model_registry.reset()
+    with TestClient(app) as client:
+        data = client.get("/api/analyze/status").json()
+    assert data["saturated"] is True
+    assert data["suggested_backoff"] >= 0.5
+    assert data["suggested_frames"] == Config.STATUS_MIN_FRAMES
@@ -0,0 +1,60 @@
+import io
+import json
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app.models.executor import StageExecutor
+from app.models.registry import DetectorRegistry, StageSpec
+
+client = TestClient(app)
+
+
+def _png(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), color=color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_executor_reports_each_stage():
+    registry = DetectorRegistry()
+    registry.register_stage(StageSpec("a", run=lambda m, ctx: 1, weight=1.0))
+    registry.register_stage(StageSpec("b", run=lambda m, ctx: 2, inputs=("a",), weight=1.0))
+    seen = []
+    results = StageExecutor(registry, max_workers=2).run(object(), [], {},
+                                                         on_stage_complete=lambda n, r: seen.append((n, r)))
+    assert seen == [("a", 1), ("b", 2)]
+    assert results == {"a": 1, "b": 2}
+
+
+def test_stream_emits_stage_events_then_final_result():
+    files = [("files", (f"f{i}.png", _png((i * 60, 20, 90)), "image/png")) for i in range(2)]
+    response = client.post("/api/analyze/stream", files=files)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_events(response.text)
+    stages = [data for event, data in events if event == "stage"]
+    assert {s["stage"] for s in stages} == {"face_analysis", "frame_analysis", "artifact_analysis", "animal_check"}
+    assert [s["completed"] for s in stages] == [1, 2, 3, 4]
+    assert all(0.0 <= s["ai_probability"] <= 1.0 for s in stages)
+
+    event, result = events[-1]
+    assert event == "result"
+    assert result["ai_probability"] == stages[-1]["ai_probability"]
+    assert "total_processing_time" in result
+
+
+def test_stream_rejects_bad_input_before_streaming():
+    files = [("files", ("a.txt", b"not an image", "text/plain"))]
+    response = client.post("/api/analyze/stream", files=files)
+    assert response.status_code == 400
@@ -0,0 +1,98 @@
+import asyncio
+import io
+
+import httpx
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app import replay
+from app.config import Config
+from app.utils.traffic_capture import TrafficCapture, client_token, close_traffic_capture, get_traffic_capture
+
+
+def _jpeg(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _record(capture, blobs, at, probability=0.5):
+    return capture.record("/api/analyze", blobs, [f"f{i}.jpg" for i in range(len(blobs))],
+                          ["image/jpeg"] * len(blobs), "balanced", "vid", "ip:1.2.3.4", at, 0.1, 200,
+                          {"ai_probability": probability, "is_ai_generated": False, "confidence_level": "low"})
+
+
+def test_ring_dedupes_frames_and_drops_oldest(tmp_path):
+    capture = TrafficCapture(str(tmp_path / "capture.db"), max_bytes=1 << 20)
+    shared, first, second = b"s" * 4000, b"a" * 4000, b"b" * 4000
+    _record(capture, [shared, first], 1.0, 0.1)
+    _record(capture, [shared, second], 2.0, 0.2)
+    assert capture.total_bytes() < 4 * 4000  # shared frame stored once
+
+    capture.compact(target_bytes=capture.total_bytes() - 1)
+    requests = list(capture.iter_requests())
+    assert [r["result"]["ai_probability"] for r in requests] == [0.2]
+    assert requests[0]["frames"] == [shared, second]
+    assert requests[0]["client"] == client_token("ip:1.2.3.4") != "ip:1.2.3.4"
+    frames = capture._conn().execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+    assert frames == 2  # `first` went with the dropped request, `shared` is still referenced
+    capture.close()
+
+
+def test_ring_stays_bounded(tmp_path):
+    capture = TrafficCapture(str(tmp_path / "capture.db"), max_bytes=50_000)
+    capture.COMPACT_CHECK_INTERVAL = 1
+    for i in range(40):
+        _record(capture, [bytes([i]) * 5000], float(i))
+    assert capture.total_bytes() <= 50_000
+    seqs = [r["seq"] for r in capture.iter_requests()]
+    assert seqs == sorted(seqs) and seqs[-1] == 40 and len(seqs) < 40
+    capture.close()
+
+
+def test_analyze_requests_are_captured_and_replayed(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CAPTURE_PATH", str(tmp_path / "capture.db"))
+    monkeypatch.setattr(Config, "CAPTURE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(Config, "RESULT_STORE_PATH", "")
+    close_traffic_capture()
+    try:
+        client = TestClient(app)
+        blobs = [_jpeg((30 * i, 90, 150)) for i in range(3)]
+        files = [("files", (f"f{i}.jpg", blob, "image/jpeg")) for i, blob in enumerate(blobs)]
+        response = client.post("/api/analyze?video_id=abc", files=files)
+        assert response.status_code == 200
+        captured = list(get_traffic_capture().iter_requests())
+    finally:
+        close_traffic_capture()
+    assert len(captured) == 1
+    assert captured[0]["frames"] == blobs and captured[0]["video_id"] == "abc"
+    assert captured[0]["result"]["ai_probability"] == response.json()["ai_probability"]
+
+    monkeypatch.setattr(Config, "CAPTURE_PATH", "")
+    requests = replay.load_requests(str(tmp_path / "capture.db"))
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay") as http:
+            return await replay.replay(requests, http, speed=0)
+
+    outcomes = asyncio.run(run())
+    assert outcomes[0]["status_code"] == 200
+    report = replay.compare(replay.captured_outcomes(requests), outcomes)
+    assert report["requests"] == 1 and report["results"]["verdict_changes"] == 0
+    assert report["results"]["mismatched_seqs"] == []
+    assert report["latency"]["candidate"]["p50"] > 0
+
+
+def test_replay_keys_are_distinct_per_captured_client():
+    requests = [{"client": "aaa"}, {"client": None}, {"client": "bbb"}, {"client": "aaa"}]
+    assert [replay.replay_key(r) for r in requests] == ["replay-aaa", None, "replay-bbb", "replay-aaa"]
+    assert replay.replay_keys(requests) == ["replay-aaa", "replay-bbb"]
+
+
+def test_arrival_offsets_scale_with_speed():
+    requests = [{"captured_at": 10.0}, {"captured_at": 12.0}, {"captured_at": 16.0}]
+    assert replay.arrival_offsets(requests, 1.0) == [0.0, 2.0, 6.0]
+    assert replay.arrival_offsets(requests, 2.0) == [0.0, 1.0, 3.0]
+    assert replay.arrival_offsets(requests, 0) == [0.0, 0.0, 0.0]
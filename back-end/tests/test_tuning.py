@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+import pytest
+
+from app import tuning
+from app.api import routes
+from app.config import Config, _parse_weights
+from app.models.ai_adapter import create_ai_model
+from app.models.registry import default_registry
+from app.tuning import StageTable, confusion_matrix, probabilities, threshold_sweep
+
+
+def _records():
+    model = create_ai_model(use_real=True)
+    options = Config.get_execution_profile()
+    rng = np.random.default_rng(0)
+    records = []
+    try:
+        for i in range(4):
+            images = [np.clip(rng.normal(60 * i + 40, 30, (96, 128, 3)), 0, 255).astype(np.uint8)
+                      for _ in range(3)]
+            result, _ = routes.analyze_decoded(model, images, options)
+            records.append({"key": f"g{i}", "status": "ok", "result": result, "label": i % 2})
+    finally:
+        model.cleanup()
+    records.append({"key": "broken", "status": "error", "error": "bad file"})
+    return records
+
+
+def test_vectorized_probabilities_match_registry_score(tmp_path):
+    records = _records()
+    table = StageTable.from_results(records)
+    assert list(table.keys) == ["g0", "g1", "g2", "g3"]
+    path = str(tmp_path / "stages.npz")
+    table.save(path)
+    table = StageTable.load(path)
+
+    weights = {"face_analysis": 0.1, "artifact_analysis": 0.4}
+    probs = probabilities(table, weights)
+    for record, prob in zip(records, probs):
+        details = record["result"]["analysis_details"]
+        stage_results = {name: details[spec.detail_key] for name, spec in default_registry.stages.items()
+                         if name not in details["skipped_stages"]}
+        assert prob == pytest.approx(default_registry.score(stage_results, {"stage_weights": weights}), abs=1e-6)
+    assert probabilities(table) == pytest.approx([r["result"]["ai_probability"] for r in records[:4]], abs=1e-3)
+
+
+def test_weighting_a_stage_that_never_ran_is_rejected(tmp_path, capsys):
+    table = StageTable.from_results(_records())
+    # The default profile never runs pattern_analysis (zero weight), so its column is constant
+    assert not table.ran[:, table.stages.index("pattern_analysis")].any()
+    with pytest.raises(ValueError, match="pattern_analysis"):
+        probabilities(table, {"pattern_analysis": 0.4})
+    # Keeping its default (zero) weight reproduces the live scores
+    probabilities(table, {"face_analysis": 0.2})
+
+    path = str(tmp_path / "stages.npz")
+    table.save(path)
+    with pytest.raises(SystemExit, match="pattern_analysis"):
+        tuning.main(["evaluate", path, "--weights", "pattern_analysis=0.4"])
+
+
+def test_confusion_matrix_and_sweep_agree():
+    probs = np.array([0.9, 0.7, 0.55, 0.2, 0.65, 0.1])
+    labels = np.array([1, 1, 1, 0, 0, -1], dtype=np.int8)
+    report = confusion_matrix(probs, labels, threshold=0.6)
+    assert (report["tp"], report["fp"], report["fn"], report["tn"]) == (2, 1, 1, 1)
+    assert report["precision"] == pytest.approx(2 / 3)
+    assert report["accuracy"] == pytest.approx(0.6)
+
+    sweep = threshold_sweep(probs, labels, np.array([0.0, 0.6, 0.7, 1.0]))
+    assert sweep["tp"].tolist() == [3, 2, 1, 0]
+    assert sweep["fp"].tolist() == [2, 1, 0, 0]
+    # Strict comparison, like is_ai_generated
+    assert sweep["tp"][2] == confusion_matrix(probs, labels, 0.7)["tp"]
+
+
+def test_cli_build_and_evaluate(tmp_path, capsys):
+    jsonl = tmp_path / "scores.jsonl"
+    jsonl.write_text("\n".join(json.dumps(r) for r in _records()[:2]) + "\n")
+    (tmp_path / "labels.csv").write_text("key,label\ng0,real\ng1,ai\n")
+    out = str(tmp_path / "stages.npz")
+    tuning.main(["build", str(jsonl), "--labels", str(tmp_path / "labels.csv"), "--out", out])
+    assert StageTable.load(out).labels.tolist() == [0, 1]
+    capsys.readouterr()
+
+    tuning.main(["evaluate", out, "--weights", "face_analysis=0.5", "--threshold", "0.4"])
+    report = json.loads(capsys.readouterr().out)
+    assert report["items"] == 2
+    assert report["weights"]["face_analysis"] == 0.5
+    assert report["confusion"]["threshold"] == 0.4
+    with pytest.raises(SystemExit):
+        tuning.main(["evaluate", out, "--weights", "nope=1"])
+
+
+def test_parse_weights():
+    assert _parse_weights("face_analysis=0.3, frame_analysis = 0") == {"face_analysis": 0.3, "frame_analysis": 0.0}
+    assert _parse_weights("") == {}
@@ -0,0 +1,107 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app.api.frame_channel import (
+    FrameChannelSession, encode_frame_message, parse_frame_message,
+)
+
+client = TestClient(app)
+
+
+def _jpeg(color, size=(96, 64)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_frame_message_roundtrip_and_validation():
+    message = encode_frame_message({"video_id": "v1", "frame": 0, "count": 1}, b"\xff\xd8jpeg")
+    header, payload = parse_frame_message(message)
+    assert header["video_id"] == "v1"
+    assert bytes(payload) == b"\xff\xd8jpeg"
+    with pytest.raises(ValueError):
+        parse_frame_message(b"\x00\x00\x00\x40{}")
+    with pytest.raises(ValueError):
+        FrameChannelSession().add_frame(encode_frame_message({"video_id": "v", "frame": 3, "count": 2}, b"x"))
+
+
+def test_session_assembles_frames_and_reuses_buffers():
+    session = FrameChannelSession()
+    frames = [_jpeg((10 * i, 50, 90)) for i in range(2)]
+    assert session.add_frame(encode_frame_message({"request_id": "r", "frame": 1, "count": 2}, frames[1])) is None
+    analysis = session.add_frame(encode_frame_message({"request_id": "r", "frame": 0, "count": 2}, frames[0]))
+    assert analysis.blobs == frames
+    assert not session.pending
+
+    for _ in range(3):
+        lease = session.lease()
+        images = lease.decode(analysis.blobs, analysis.names)
+        assert images[0].shape == (64, 96, 3)
+        lease.release()
+    assert session.pool.allocations == 2
+    assert session.pool.reuses == 4
+
+
+def test_websocket_runs_interleaved_analyses_on_one_connection():
+    with client.websocket_connect("/api/ws") as ws:
+        for index in range(2):
+            for request_id in ("a", "b"):
+                header = {"request_id": request_id, "video_id": f"video-{request_id}", "frame": index, "count": 2}
+                ws.send_bytes(encode_frame_message(header, _jpeg((index * 100, 40, 200))))
+        replies = {}
+        for _ in range(2):
+            reply = ws.receive_json()
+            replies[reply["request_id"]] = reply
+        assert set(replies) == {"a", "b"}
+        for request_id, reply in replies.items():
+            assert reply["type"] == "result"
+            assert reply["video_id"] == f"video-{request_id}"
+            assert 0.0 <= reply["result"]["ai_probability"] <= 1.0
+
+        ws.send_bytes(b"\x00")
+        error = ws.receive_json()
+        assert error["type"] == "error" and error["status_code"] == 400
+
+
+def test_websocket_disconnect_cancels_and_awaits_in_flight_analyses(monkeypatch):
+    import asyncio
+    from app.api import routes
+
+    header = {"request_id": "slow", "frame": 0, "count": 1}
+    frame = encode_frame_message(header, _jpeg((10, 20, 30)))
+    scope = {"type": "websocket", "path": "/api/ws", "raw_path": b"/api/ws", "query_string": b"",
+             "headers": [], "client": ("127.0.0.1", 5000), "server": ("testserver", 80),
+             "scheme": "ws", "root_path": "", "subprotocols": []}
+
+    async def scenario():
+        started = asyncio.Event()
+        finished = []
+        messages = [{"type": "websocket.connect"}, {"type": "websocket.receive", "bytes": frame}]
+
+        async def slow_analysis(*args, **kwargs):
+            started.set()
+            try:
+                await asyncio.sleep(30)
+            finally:
+                await asyncio.sleep(0.01)  # e.g. sending the error and releasing the buffer lease
+                finished.append(kwargs["cancel_token"].cancelled)
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await started.wait()
+            return {"type": "websocket.disconnect", "code": 1000}
+
+        async def send(message):
+            pass
+
+        monkeypatch.setattr(routes, "analyze_blobs", slow_analysis)
+        await app(scope, receive, send)
+        # The handler returns only after its analysis task has unwound
+        return finished
+
+    assert asyncio.run(scenario()) == [True]